@@ -0,0 +1,270 @@
+import time
+
+from kivy.clock import Clock
+from kivy.properties import BooleanProperty, NumericProperty, ObjectProperty, StringProperty
+from kivy.uix.boxlayout import BoxLayout
+from kivy.uix.button import Button
+from kivy.uix.label import Label
+from kivy.uix.recycleboxlayout import RecycleBoxLayout
+from kivy.uix.recycleview import RecycleView
+from kivy.uix.textinput import TextInput
+
+from admin import PAGE_SIZE, delete_user, search_page, update_user
+from database import get_database
+from db_worker import run_in_background
+
+ROW_HEIGHT = 52
+# How close to the end of the list (as a fraction) scrolling starts fetching the next page
+PREFETCH = 0.15
+# Pause after the last keystroke before searching
+SEARCH_DELAY = 0.25
+
+
+# 👤 One recycled user row
+class AdminRow(BoxLayout):
+    user_id = NumericProperty(0)
+    title = StringProperty("")
+    details = StringProperty("")
+    status = StringProperty("")
+    is_self = BooleanProperty(False)
+    console = ObjectProperty(None, allownone=True)
+
+    def __init__(self, **kwargs):
+        super().__init__(orientation='horizontal', size_hint_y=None, height=ROW_HEIGHT, spacing=6, **kwargs)
+        text = BoxLayout(orientation='vertical', size_hint_x=0.5)
+        self.title_label = Label(font_size=15, bold=True, color=(0.18, 0.49, 0.2, 1), halign='left', shorten=True)
+        self.details_label = Label(font_size=13, color=(0.3, 0.3, 0.3, 1), halign='left', shorten=True)
+        for label in (self.title_label, self.details_label):
+            label.bind(size=lambda instance, value: setattr(instance, 'text_size', value))
+            text.add_widget(label)
+        self.add_widget(text)
+        self.status_label = Label(font_size=13, color=(0.2, 0.2, 0.2, 1), size_hint_x=0.3)
+        self.add_widget(self.status_label)
+        self.edit_btn = Button(text="Edit", size_hint_x=0.1, background_color=(0.18, 0.49, 0.2, 1),
+                               color=(1, 1, 1, 1), font_size=13)
+        self.delete_btn = Button(text="Delete", size_hint_x=0.1, background_color=(0.72, 0.11, 0.11, 1),
+                                 color=(1, 1, 1, 1), font_size=13)
+        self.edit_btn.bind(on_release=lambda instance: self.console.edit_user(self.user_id))
+        self.delete_btn.bind(on_release=lambda instance: self.console.confirm_delete(self.user_id))
+        self.add_widget(self.edit_btn)
+        self.add_widget(self.delete_btn)
+
+    def on_title(self, instance, value):
+        self.title_label.text = value
+
+    def on_details(self, instance, value):
+        self.details_label.text = value
+
+    def on_status(self, instance, value):
+        self.status_label.text = value
+
+    def on_is_self(self, instance, value):
+        # Administrators cannot delete their own account from here
+        self.delete_btn.disabled = value
+
+
+# 🛠️ Administrator console: search, status and edit/delete for every user
+class AdminView(BoxLayout):
+    """Pages of users come from :func:`admin.search_page` on the database worker, keyed on the user id."""
+
+    def __init__(self, admin_id, **kwargs):
+        super().__init__(orientation='vertical', spacing=8, **kwargs)
+        self.admin_id = admin_id
+        self.users = []
+        self.statuses = {}
+        self.query = ""
+        # Bumped on every new search so pages for old searches are ignored
+        self.generation = 0
+        self.loading = False
+        self.has_more = False
+
+        self.search_input = TextInput(hint_text="Search username, name or email", multiline=False,
+                                      font_size=15, size_hint=(1, None), height=38)
+        self.search_trigger = Clock.create_trigger(self.search, SEARCH_DELAY)
+        self.search_input.bind(text=lambda instance, value: self.search_trigger())
+        self.search_input.bind(on_text_validate=self.search)
+        self.add_widget(self.search_input)
+
+        self.status_label = Label(text="Loading users...", font_size=14, color=(0.3, 0.5, 0.3, 1),
+                                  size_hint=(1, None), height=24)
+        self.add_widget(self.status_label)
+
+        self.list = RecycleView(viewclass=AdminRow, bar_width=8, scroll_type=['bars', 'content'])
+        layout = RecycleBoxLayout(orientation='vertical', default_size=(None, ROW_HEIGHT),
+                                  default_size_hint=(1, None), size_hint_y=None)
+        layout.bind(minimum_height=layout.setter("height"))
+        self.list.add_widget(layout)
+        self.list.bind(scroll_y=self.on_scroll)
+        self.add_widget(self.list)
+
+        self.search()
+
+    # 🔎 Search and paging
+
+    def search(self, *args):
+        self.search_trigger.cancel()
+        self.query = self.search_input.text.strip()
+        self.generation += 1
+        self.loading = False
+        self.users = []
+        self.statuses = {}
+        self.list.data = []
+        self.list.scroll_y = 1
+        self.status_label.text = "Searching..."
+        self.fetch()
+
+    def fetch(self):
+        self.loading = True
+        generation = self.generation
+        after = self.users[-1].id if self.users else None
+
+        def loaded(page):
+            if generation == self.generation:
+                rows, statuses = page
+                self.loading = False
+                self.has_more = len(rows) == PAGE_SIZE
+                self.users.extend(rows)
+                self.statuses.update(statuses)
+                self.list.data.extend(self.row_data(row) for row in rows)
+                self.update_status()
+
+        def failed(error):
+            if generation == self.generation:
+                self.loading = False
+                self.status_label.text = "Search failed, please try again."
+
+        run_in_background(search_page, get_database(), self.query, after, on_result=loaded, on_error=failed)
+
+    def on_scroll(self, instance, scroll_y):
+        if not self.loading and self.has_more and scroll_y <= PREFETCH:
+            self.fetch()
+
+    def update_status(self):
+        if not self.users:
+            self.status_label.text = "No users match." if self.query else "No users yet."
+        else:
+            more = ", scroll for more" if self.has_more else ""
+            self.status_label.text = f"{len(self.users):,} users shown{more}"
+
+    def row_data(self, row):
+        status = self.statuses.get(row.id, {})
+        summary = status.get("status", "")
+        if status.get("readings"):
+            summary += f" · {status['readings']:,} readings"
+        if status.get("open_anomalies"):
+            summary += f" · {status['open_anomalies']} alerts"
+        last = status.get("last_reading")
+        details = row.email or ""
+        if last:
+            details += f"  ·  last reading {time.strftime('%d %b %Y', time.localtime(last))}"
+        return {"user_id": row.id, "title": f"{row.username}{'  (admin)' if row.is_admin else ''} - {row.name or ''}",
+                "details": details, "status": summary, "is_self": row.id == self.admin_id, "console": self}
+
+    def find(self, user_id):
+        for index, row in enumerate(self.users):
+            if row.id == user_id:
+                return index, row
+        return None, None
+
+    # ✏️ Edit and delete
+
+    def edit_user(self, user_id):
+        from kivy.uix.checkbox import CheckBox
+        from kivy.uix.popup import Popup
+
+        index, row = self.find(user_id)
+        if row is None:
+            return
+        content = BoxLayout(orientation='vertical', padding=12, spacing=8)
+        inputs = {}
+        for field, hint in (("username", "Username"), ("name", "Full name"), ("email", "Email")):
+            inputs[field] = TextInput(text=getattr(row, field) or "", hint_text=hint, multiline=False,
+                                      size_hint=(1, None), height=38)
+            content.add_widget(inputs[field])
+        admin_row = BoxLayout(size_hint=(1, None), height=32)
+        admin_box = CheckBox(active=bool(row.is_admin), size_hint_x=None, width=40,
+                             disabled=user_id == self.admin_id)
+        admin_row.add_widget(admin_box)
+        admin_row.add_widget(Label(text="Administrator", font_size=15, halign='left'))
+        content.add_widget(admin_row)
+        error = Label(text="", font_size=14, color=(1, 0.4, 0.4, 1), size_hint=(1, None), height=22)
+        content.add_widget(error)
+
+        btns = BoxLayout(size_hint=(1, None), height=44, spacing=8)
+        save_btn = Button(text="Save", background_color=(0.18, 0.49, 0.2, 1), color=(1, 1, 1, 1))
+        cancel_btn = Button(text="Cancel", background_color=(0.72, 0.11, 0.11, 1), color=(1, 1, 1, 1))
+        btns.add_widget(save_btn)
+        btns.add_widget(cancel_btn)
+        content.add_widget(btns)
+        popup = Popup(title=f"Edit {row.username}", content=content, size_hint=(None, None), size=(400, 340))
+
+        def saved(ok, edited):
+            save_btn.disabled = False
+            if not ok:
+                error.text = "That username is taken."
+                return
+            popup.dismiss()
+            index, _row = self.find(user_id)
+            if index is not None:
+                self.users[index] = edited
+                self.list.data[index] = self.row_data(edited)
+                self.list.refresh_from_data()
+
+        def failed(exc):
+            save_btn.disabled = False
+            error.text = "Could not save, please try again."
+
+        def save(*args):
+            username = inputs["username"].text.strip()
+            if not username:
+                error.text = "Username cannot be empty."
+                return
+            edited = row._replace(username=username, name=inputs["name"].text.strip(),
+                                  email=inputs["email"].text.strip(), is_admin=int(admin_box.active))
+            save_btn.disabled = True
+            run_in_background(update_user, get_database(), user_id, edited.username, edited.name, edited.email,
+                              bool(edited.is_admin), on_result=lambda ok: saved(ok, edited), on_error=failed)
+
+        save_btn.bind(on_release=save)
+        cancel_btn.bind(on_release=popup.dismiss)
+        popup.open()
+
+    def confirm_delete(self, user_id):
+        from kivy.uix.popup import Popup
+
+        index, row = self.find(user_id)
+        if row is None or user_id == self.admin_id:
+            return
+        content = BoxLayout(orientation='vertical', padding=12, spacing=8)
+        message = Label(text=f"Delete {row.username} and all of their readings? This cannot be undone.",
+                        font_size=16, halign='center')
+        message.bind(width=lambda instance, value: setattr(instance, 'text_size', (value, None)))
+        content.add_widget(message)
+        btns = BoxLayout(spacing=12, size_hint=(1, None), height=44)
+        yes_btn = Button(text="Delete", background_color=(0.72, 0.11, 0.11, 1), color=(1, 1, 1, 1))
+        no_btn = Button(text="Cancel", background_color=(0.18, 0.49, 0.2, 1), color=(1, 1, 1, 1))
+        btns.add_widget(yes_btn)
+        btns.add_widget(no_btn)
+        content.add_widget(btns)
+        popup = Popup(title="Delete User", content=content, size_hint=(None, None), size=(360, 190))
+
+        def deleted(_):
+            popup.dismiss()
+            index, _row = self.find(user_id)
+            if index is not None:
+                del self.users[index]
+                del self.list.data[index]
+                self.update_status()
+
+        def failed(error):
+            yes_btn.disabled = False
+            message.text = "Could not delete, please try again."
+
+        def delete(*args):
+            yes_btn.disabled = True
+            message.text = "Deleting..."
+            run_in_background(delete_user, get_database(), user_id, on_result=deleted, on_error=failed)
+
+        yes_btn.bind(on_release=delete)
+        no_btn.bind(on_release=popup.dismiss)
+        popup.open()
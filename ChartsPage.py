@@ -0,0 +1,156 @@
+import time
+
+from kivy.graphics import Color, Rectangle
+from kivy.uix.boxlayout import BoxLayout
+from kivy.uix.button import Button
+from kivy.uix.gridlayout import GridLayout
+from kivy.uix.label import Label
+from kivy.uix.widget import Widget
+
+from cache import VersionedLRUCache, user_version
+from charts import load_charts
+from database import get_database
+from db_worker import run_in_background
+
+# Pixel size charts are rendered at; the widget stretches the texture to fit
+CHART_SIZE = (640, 140)
+PADDING = 6
+
+# Analysis Time spinner value -> seconds shown before zooming
+PERIOD_SPANS = {"Daily": 86400, "Weekly": 7 * 86400, "Monthly": 30 * 86400}
+MIN_SPAN = 3600
+MAX_SPAN = 5 * 365 * 86400
+# Range ends are rounded up to this, so re-opening the charts within it hits the cache
+SNAP = 300
+
+# Rendered textures per (user, range, size), dropped when the user's data changes
+chart_textures = VersionedLRUCache(maxsize=32)
+
+
+def render_chart(series, start, end, size=CHART_SIZE):
+    """Draw one series into an offscreen framebuffer; must run on the UI thread."""
+    from kivy.graphics import ClearBuffers, ClearColor, Fbo, Line
+
+    width, height = size
+    low = min(0.0, float(series.value.min()))
+    high = float(series.value.max())
+    if high <= low:
+        high = low + 1.0
+    xs = PADDING + (series.ts - start) / (end - start) * (width - 2 * PADDING)
+    ys = PADDING + (series.value - low) / (high - low) * (height - 2 * PADDING)
+    points = [float(v) for pair in zip(xs, ys) for v in pair]
+
+    fbo = Fbo(size=size)
+    with fbo:
+        ClearColor(1, 1, 1, 1)
+        ClearBuffers()
+        Color(0.85, 0.92, 0.86, 1)
+        Line(points=[PADDING, PADDING, width - PADDING, PADDING], width=1)
+        Color(0.18, 0.49, 0.2, 1)
+        if len(points) >= 4:
+            Line(points=points, width=1.1)
+    fbo.draw()
+    return fbo
+
+
+def describe_span(seconds):
+    if seconds < 2 * 86400:
+        return f"Last {seconds / 3600:g} hours"
+    return f"Last {seconds / 86400:g} days"
+
+
+# 📊 One chart: a cached texture stretched over the widget
+class ChartImage(Widget):
+    def __init__(self, texture, **kwargs):
+        super().__init__(**kwargs)
+        with self.canvas:
+            Color(1, 1, 1, 1)
+            self.rect = Rectangle(texture=texture, pos=self.pos, size=self.size)
+        self.bind(pos=self.update_rect, size=self.update_rect)
+
+    def update_rect(self, *args):
+        self.rect.pos = self.pos
+        self.rect.size = self.size
+
+
+# 📈 Consumption charts per resource for the selected analysis period
+class ChartsView(BoxLayout):
+    """Series come downsampled from :mod:`charts` on the database worker; the rendered textures are cached."""
+
+    def __init__(self, user_id, analysis_time="Daily", resource_labels=None, **kwargs):
+        super().__init__(orientation='vertical', spacing=8, **kwargs)
+        self.user_id = user_id
+        self.resource_labels = resource_labels or {}
+        self.span = PERIOD_SPANS[analysis_time]
+        # Bumped on every range change so results for old ranges are ignored
+        self.generation = 0
+
+        controls = BoxLayout(orientation='horizontal', size_hint=(1, None), height=36, spacing=6)
+        self.range_label = Label(font_size=16, bold=True, color=(0.18, 0.49, 0.2, 1), size_hint=(0.5, 1))
+        controls.add_widget(self.range_label)
+        for text, factor in (("Zoom in", 0.5), ("Zoom out", 2.0)):
+            btn = Button(text=text, size_hint=(0.25, 1), background_color=(0.18, 0.49, 0.2, 1),
+                         color=(1, 1, 1, 1), font_size=14)
+            btn.bind(on_release=lambda instance, factor=factor: self.zoom(factor))
+            controls.add_widget(btn)
+        self.add_widget(controls)
+
+        self.status = Label(font_size=14, color=(0.3, 0.5, 0.3, 1), size_hint=(1, None), height=24)
+        self.add_widget(self.status)
+
+        from kivy.uix.scrollview import ScrollView
+
+        scroll = ScrollView()
+        self.grid = GridLayout(cols=1, spacing=10, size_hint_y=None)
+        self.grid.bind(minimum_height=self.grid.setter("height"))
+        scroll.add_widget(self.grid)
+        self.add_widget(scroll)
+
+        self.refresh()
+
+    def zoom(self, factor):
+        span = min(max(int(self.span * factor), MIN_SPAN), MAX_SPAN)
+        if span != self.span:
+            self.span = span
+            self.refresh()
+
+    def refresh(self):
+        self.generation += 1
+        end = (int(time.time()) // SNAP + 1) * SNAP
+        start = end - self.span
+        self.range_label.text = describe_span(self.span)
+        key = ("charts", start, end, CHART_SIZE)
+        cached = chart_textures.get(self.user_id, key)
+        if cached is not None:
+            self.show_charts(cached)
+            return
+
+        self.grid.clear_widgets()
+        self.status.text = "Loading charts..."
+        generation = self.generation
+        version = user_version(self.user_id)
+
+        def loaded(charts):
+            # Textures are made on the UI thread, and only for the range still on screen
+            rendered = {name: (render_chart(series, start, end), series) for name, series in charts.items()}
+            chart_textures.put(self.user_id, key, rendered, version)
+            if generation == self.generation:
+                self.show_charts(rendered)
+
+        def failed(error):
+            if generation == self.generation:
+                self.status.text = "Could not load charts, please try again."
+
+        run_in_background(load_charts, get_database(), self.user_id, start, end, on_result=loaded, on_error=failed)
+
+    def show_charts(self, rendered):
+        self.grid.clear_widgets()
+        self.status.text = "" if rendered else "No readings in this range."
+        units = {name: unit for name, (_id, unit) in get_database().resources().items()}
+        for name, (fbo, series) in rendered.items():
+            label = self.resource_labels.get(name, name.title())
+            self.grid.add_widget(Label(
+                text=f"{label}: peak {series.value.max():g} {units.get(name, '')} ({len(series.ts):,} points, "
+                     f"{series.method})",
+                font_size=14, color=(0.2, 0.2, 0.2, 1), size_hint=(1, None), height=22))
+            self.grid.add_widget(ChartImage(fbo.texture, size_hint=(1, None), height=CHART_SIZE[1]))
@@ -0,0 +1,272 @@
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from kivy.clock import Clock
+from kivy.uix.boxlayout import BoxLayout
+from kivy.uix.button import Button
+from kivy.uix.label import Label
+from kivy.uix.recycleboxlayout import RecycleBoxLayout
+from kivy.uix.recycleview import RecycleView
+from kivy.uix.textinput import TextInput
+from kivy.properties import StringProperty
+
+from database import get_database
+from db_worker import run_in_background
+
+ROW_HEIGHT = 32
+# Rows fetched per query
+PAGE_SIZE = 200
+# Rows held in the list at most; pages scrolled far out of view are dropped and re-fetched on the way back
+WINDOW_ROWS = 1000
+# How close to either end (as a fraction of the list) scrolling starts fetching the next page
+PREFETCH = 0.15
+
+ALL_RESOURCES = "All resources"
+
+
+# 📄 One recycled history row
+class HistoryRow(BoxLayout):
+    when = StringProperty("")
+    resource = StringProperty("")
+    amount = StringProperty("")
+
+    def __init__(self, **kwargs):
+        super().__init__(orientation='horizontal', size_hint_y=None, height=ROW_HEIGHT, **kwargs)
+        self.when_label = Label(font_size=14, color=(0.2, 0.2, 0.2, 1), size_hint_x=0.4)
+        self.resource_label = Label(font_size=14, color=(0.18, 0.49, 0.2, 1), size_hint_x=0.3)
+        self.amount_label = Label(font_size=14, color=(0.2, 0.2, 0.2, 1), size_hint_x=0.3)
+        for label in (self.when_label, self.resource_label, self.amount_label):
+            self.add_widget(label)
+
+    def on_when(self, instance, value):
+        self.when_label.text = value
+
+    def on_resource(self, instance, value):
+        self.resource_label.text = value
+
+    def on_amount(self, instance, value):
+        self.amount_label.text = value
+
+
+# 🕘 Consumption history, newest first
+class HistoryView(BoxLayout):
+    """Only the visible rows get widgets (RecycleView) and only ``WINDOW_ROWS`` rows are held in memory.
+
+    Pages come from :meth:`Database.get_history` on the database worker, keyed on ``(ts, id)``.
+    """
+
+    def __init__(self, user_id, resource_labels=None, **kwargs):
+        from kivy.uix.spinner import Spinner
+
+        super().__init__(orientation='vertical', spacing=8, **kwargs)
+        self.user_id = user_id
+        self.resource_labels = resource_labels or {}
+        self.resource_names = {}
+        self.rows = []
+        self.filters = {}
+        # Bumped on every filter change so pages for old filters are ignored
+        self.generation = 0
+        self.loading = False
+        self.has_older = False
+        self.has_newer = False
+
+        filters = BoxLayout(orientation='horizontal', size_hint=(1, None), height=36, spacing=6)
+        self.resource_spinner = Spinner(text=ALL_RESOURCES, values=[ALL_RESOURCES], size_hint=(0.26, 1),
+                                        background_color=(1, 1, 1, 1), color=(0, 0, 0, 1), font_size=14)
+        self.start_input = TextInput(hint_text="From YYYY-MM-DD", multiline=False, font_size=14, size_hint=(0.22, 1))
+        self.end_input = TextInput(hint_text="To YYYY-MM-DD", multiline=False, font_size=14, size_hint=(0.22, 1))
+        apply_btn = Button(text="Apply", size_hint=(0.15, 1), background_color=(0.18, 0.49, 0.2, 1),
+                           color=(1, 1, 1, 1), font_size=14)
+        apply_btn.bind(on_release=self.apply_filters)
+        export_btn = Button(text="Export", size_hint=(0.15, 1), background_color=(0.18, 0.49, 0.2, 1),
+                            color=(1, 1, 1, 1), font_size=14)
+        export_btn.bind(on_release=self.open_export_popup)
+        for widget in (self.resource_spinner, self.start_input, self.end_input, apply_btn, export_btn):
+            filters.add_widget(widget)
+        self.add_widget(filters)
+
+        self.status = Label(text="Loading history...", font_size=14, color=(0.3, 0.5, 0.3, 1),
+                            size_hint=(1, None), height=24)
+        self.add_widget(self.status)
+
+        self.list = RecycleView(viewclass=HistoryRow, bar_width=8, scroll_type=['bars', 'content'])
+        layout = RecycleBoxLayout(orientation='vertical', default_size=(None, ROW_HEIGHT),
+                                  default_size_hint=(1, None), size_hint_y=None)
+        layout.bind(minimum_height=layout.setter("height"))
+        self.list.add_widget(layout)
+        self.list.bind(scroll_y=self.on_scroll)
+        self.add_widget(self.list)
+
+        run_in_background(get_database().resources, on_result=self.set_resources)
+        self.apply_filters()
+
+    def set_resources(self, resources):
+        self.resource_spinner.values = [ALL_RESOURCES] + [self.label_for(name) for name in resources]
+        self.resource_names = {self.label_for(name): name for name in resources}
+
+    def label_for(self, name):
+        return self.resource_labels.get(name, name.title())
+
+    def parse_date(self, text, field):
+        try:
+            return datetime.strptime(text.strip(), "%Y-%m-%d")
+        except ValueError:
+            raise ValueError(f"{field} must look like 2024-01-31")
+
+    def apply_filters(self, *args):
+        filters = {}
+        try:
+            if self.resource_spinner.text != ALL_RESOURCES:
+                filters["resource"] = self.resource_names[self.resource_spinner.text]
+            if self.start_input.text.strip():
+                filters["start"] = int(self.parse_date(self.start_input.text, "From").timestamp())
+            if self.end_input.text.strip():
+                # The end date is inclusive
+                end = self.parse_date(self.end_input.text, "To") + timedelta(days=1)
+                filters["end"] = int(end.timestamp())
+        except ValueError as error:
+            self.status.text = str(error)
+            return
+        self.filters = filters
+        self.generation += 1
+        self.loading = False
+        self.rows = []
+        self.list.data = []
+        self.list.scroll_y = 1
+        self.status.text = "Loading history..."
+        self.fetch(before=None)
+
+    # 📥 Paging
+
+    def fetch(self, before=None, after=None):
+        self.loading = True
+        generation = self.generation
+
+        def loaded(rows):
+            if generation == self.generation:
+                self.loading = False
+                if after is not None:
+                    self.prepend(rows)
+                else:
+                    self.append(rows)
+
+        def failed(error):
+            if generation == self.generation:
+                self.loading = False
+                self.status.text = "Could not load history, please try again."
+
+        run_in_background(get_database().get_history, self.user_id, before=before, after=after,
+                          limit=PAGE_SIZE, on_result=loaded, on_error=failed, **self.filters)
+
+    def on_scroll(self, instance, scroll_y):
+        if self.loading or not self.rows:
+            return
+        if scroll_y <= PREFETCH and self.has_older:
+            last = self.rows[-1]
+            self.fetch(before=(last[1], last[0]))
+        elif scroll_y >= 1 - PREFETCH and self.has_newer:
+            first = self.rows[0]
+            self.fetch(after=(first[1], first[0]))
+
+    def append(self, rows):
+        self.has_older = len(rows) == PAGE_SIZE
+        dropped = max(0, len(self.rows) + len(rows) - WINDOW_ROWS)
+        if dropped:
+            self.has_newer = True
+        self.update_rows(self.rows[dropped:] + rows, shift=-dropped)
+
+    def prepend(self, rows):
+        self.has_newer = len(rows) == PAGE_SIZE
+        dropped = max(0, len(self.rows) + len(rows) - WINDOW_ROWS)
+        if dropped:
+            self.has_older = True
+        self.update_rows(rows + self.rows[:len(self.rows) - dropped], shift=len(rows))
+
+    def update_rows(self, rows, shift):
+        """Replace the window, keeping the rows on screen where they were; ``shift`` is rows added above."""
+        viewport = self.list.height
+        old_height = len(self.rows) * ROW_HEIGHT
+        top = (1 - self.list.scroll_y) * max(old_height - viewport, 0)
+        self.rows = rows
+        self.list.data = [self.row_data(row) for row in rows]
+        new_height = len(rows) * ROW_HEIGHT
+        if new_height > viewport and self.list.data:
+            top = min(max(top + shift * ROW_HEIGHT, 0), new_height - viewport)
+            self.list.scroll_y = 1 - top / (new_height - viewport)
+        self.status.text = f"{len(rows):,} readings loaded, scroll for more" if rows else "No readings match these filters."
+
+    def row_data(self, row):
+        _id, ts, name, unit, value = row
+        return {"when": time.strftime("%d %b %Y %H:%M", time.localtime(ts)),
+                "resource": self.label_for(name), "amount": f"{value:g} {unit}"}
+
+    # 📤 Export of the filtered history
+
+    def open_export_popup(self, *args):
+        from kivy.uix.popup import Popup
+        from kivy.uix.spinner import Spinner
+
+        from reports import HAS_PYARROW, export
+
+        content = BoxLayout(orientation='vertical', padding=12, spacing=8)
+        content.add_widget(Label(text="Export the readings matching the filters to:", font_size=16))
+        row = BoxLayout(size_hint=(1, None), height=40, spacing=8)
+        formats = ["CSV", "Parquet", "Arrow"] if HAS_PYARROW else ["CSV"]
+        format_spinner = Spinner(text="CSV", values=formats, size_hint=(0.3, 1),
+                                 background_color=(1, 1, 1, 1), color=(0, 0, 0, 1), font_size=14)
+        path_input = TextInput(text=time.strftime("ecostar_readings_%Y%m%d.csv"), multiline=False, font_size=14)
+        row.add_widget(format_spinner)
+        row.add_widget(path_input)
+        content.add_widget(row)
+        status = Label(text="" if HAS_PYARROW else "Install pyarrow for Parquet and Arrow export.",
+                       font_size=14, size_hint=(1, None), height=24)
+        content.add_widget(status)
+
+        btns = BoxLayout(size_hint=(1, None), height=44, spacing=8)
+        export_btn = Button(text="Export", background_color=(0.18, 0.49, 0.2, 1), color=(1, 1, 1, 1))
+        close_btn = Button(text="Close", background_color=(0.72, 0.11, 0.11, 1), color=(1, 1, 1, 1))
+        btns.add_widget(export_btn)
+        btns.add_widget(close_btn)
+        content.add_widget(btns)
+
+        popup = Popup(title="Export History", content=content, size_hint=(None, None), size=(460, 240))
+
+        def format_changed(spinner, text):
+            base, _ext = os.path.splitext(path_input.text)
+            path_input.text = base + "." + text.lower()
+
+        def finish(result, error):
+            export_btn.disabled = False
+            if error is not None:
+                status.text = f"Export failed: {error}"
+                return
+            status.text = f"Exported {result.rows:,} readings to {os.path.basename(result.path)}."
+
+        # Long exports stream on their own thread and connection, leaving the database worker free
+        def run_export(path, fmt, filters):
+            try:
+                result = export(path, self.user_id, fmt=fmt, progress=lambda rows: Clock.schedule_once(
+                    lambda dt: setattr(status, 'text', f"{rows:,} readings written...")), **filters)
+            except Exception as exc:
+                Clock.schedule_once(lambda dt, exc=exc: finish(None, exc))
+            else:
+                Clock.schedule_once(lambda dt: finish(result, None))
+            finally:
+                get_database().close()
+
+        def start_export(*args):
+            path = path_input.text.strip()
+            if not path:
+                status.text = "Enter a file name."
+                return
+            export_btn.disabled = True
+            status.text = "Exporting..."
+            threading.Thread(target=run_export, args=(path, format_spinner.text.lower(), dict(self.filters)),
+                             daemon=True).start()
+
+        format_spinner.bind(text=format_changed)
+        export_btn.bind(on_release=start_export)
+        close_btn.bind(on_release=popup.dismiss)
+        popup.open()
@@ -1,64 +1,52 @@
-import sqlite3
+import os
+import threading
+import time
+
 from kivy.app import App
+from kivy.clock import Clock
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.button import Button
 from kivy.uix.label import Label
-from kivy.uix.spinner import Spinner
 from kivy.core.window import Window
-from kivy.uix.popup import Popup
 from kivy.uix.textinput import TextInput
 from kivy.uix.gridlayout import GridLayout
+from kivy.uix.progressbar import ProgressBar
 from kivy.graphics import Color, Rectangle
 
-DB_PATH = "ecostar_pro.db"
-
-def create_consumption_table():
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS consumption (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            electricity REAL DEFAULT 0,
-            water REAL DEFAULT 0,
-            gas REAL DEFAULT 0,
-            entry_date DATE DEFAULT (DATE('now')),
-            FOREIGN KEY(user_id) REFERENCES users(id)
-        )
-    ''')
-    conn.commit()
-    conn.close()
-
-def add_missing_columns():
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-
-    columns_to_add = [
-        ("oil", "REAL DEFAULT 0"),
-        ("cng", "REAL DEFAULT 0"),
-        ("petrol", "REAL DEFAULT 0")
-    ]
+from admin import is_admin
+from cache import VersionedLRUCache, user_version
+from database import get_database
+from db_worker import run_in_background
+from forecasting import load_forecast, refreshing, schedule_refresh
+from importer import import_file
+from instrumentation import instrumented
+from recommendations import PRIORITY_NAMES
+from write_queue import save_reading
 
-    for column, datatype in columns_to_add:
-        try:
-            c.execute(f"ALTER TABLE consumption ADD COLUMN {column} {datatype}")
-        except sqlite3.OperationalError:
-            # Column already exists, skip
-            pass
+RESOURCE_LABELS = {"cng": "CNG"}
 
-    conn.commit()
-    conn.close()
+# Profile + summary per (user, analysis period, day), dropped when the user's data changes
+dashboard_cache = VersionedLRUCache(maxsize=64)
+# Seconds between checks for a retrained forecast while the dashboard shows a stale one
+FORECAST_POLL = 5
 
-create_consumption_table()
-add_missing_columns()
+# Analysis Time spinner value -> (rollup period, summary heading)
+ANALYSIS_PERIODS = {
+    "Daily": ("day", "Today"),
+    "Weekly": ("week", "This week"),
+    "Monthly": ("month", "This month"),
+}
 
 
 class DrawerApp(BoxLayout):
     def __init__(self, user_id, **kwargs):
+        from kivy.uix.spinner import Spinner
+
         super().__init__(orientation='horizontal', **kwargs)
-        Window.clearcolor = (0.937, 0.98, 0.941, 1)  # #effaf0
 
         self.user_id = user_id
+        self.view_id = 0
+        self.charts_view = None
 
         self.drawer = BoxLayout(orientation='vertical', size_hint=(None, 1), width=180, spacing=8, padding=4)
         self.drawer_canvas_color()
@@ -69,6 +57,16 @@ class DrawerApp(BoxLayout):
         btn_home.bind(on_release=self.show_home)
         self.drawer.add_widget(btn_home)
 
+        btn_history = Button(text="History", background_color=(0.22, 0.56, 0.24, 1), color=(1, 1, 1, 1),
+                             font_size=15, size_hint=(1, None), height=46)
+        btn_history.bind(on_release=self.show_history)
+        self.drawer.add_widget(btn_history)
+
+        btn_charts = Button(text="Charts", background_color=(0.22, 0.56, 0.24, 1), color=(1, 1, 1, 1),
+                            font_size=15, size_hint=(1, None), height=46)
+        btn_charts.bind(on_release=self.show_charts)
+        self.drawer.add_widget(btn_charts)
+
         btn_profile = Button(text="User Profile", background_color=(0.22, 0.56, 0.24, 1), color=(1, 1, 1, 1),
                              font_size=15, size_hint=(1, None), height=46)
         btn_profile.bind(on_release=self.show_profile)
@@ -79,6 +77,11 @@ class DrawerApp(BoxLayout):
         btn_settings.bind(on_release=self.show_settings)
         self.drawer.add_widget(btn_settings)
 
+        btn_import = Button(text="Import Data", background_color=(0.22, 0.56, 0.24, 1), color=(1, 1, 1, 1),
+                            font_size=15, size_hint=(1, None), height=46)
+        btn_import.bind(on_release=self.open_import_popup)
+        self.drawer.add_widget(btn_import)
+
         self.drawer.add_widget(Label(size_hint=(1, None), height=32))  # Spacer
 
         self.drawer.add_widget(Label(text="Analysis Time:", font_size=15, color=(1, 1, 1, 1),
@@ -93,7 +96,7 @@ class DrawerApp(BoxLayout):
         )
         self.spinner.bind(text=self.analysis_time_changed)
         self.drawer.add_widget(self.spinner)
-        self.drawer.add_widget(Label(size_hint=(1, None), height=200))  # Filler
+        self.drawer.add_widget(Label(size_hint=(1, None), height=38))  # Filler
 
         btn_logout = Button(
             text="Logout",
@@ -108,40 +111,6 @@ class DrawerApp(BoxLayout):
 
         self.load_user_data()
 
-       
-
-
-        from kivy.uix.gridlayout import GridLayout
-        from kivy.uix.scrollview import ScrollView
-
-        scroll = ScrollView(size_hint=(1, None), size=(Window.width, 300))  # You can adjust height
-        grid = GridLayout(cols=2, spacing=8, size_hint_y=None, padding=[10, 10])
-        grid.bind(minimum_height=grid.setter("height"))
-
-        types = [
-            ("Electricity ⚡", "Electricity"),
-            ("Oil 🛢️", "Oil"),
-            ("Gas 🔥", "Gas"),
-            ("CNG 🚗", "CNG"),
-            ("Petrol ⛽", "Petrol"),
-        ]
-
-        for label_text, t in types:
-            btn = Button(
-                text=label_text,
-                size_hint_y=None,
-                height=50,
-                background_color=(0.18, 0.49, 0.2, 1),
-                color=(1, 1, 1, 1),
-                font_size=16,
-                bold=True
-            )
-            btn.bind(on_release=lambda instance, tp=t: self.open_add_consumption_popup(instance, tp))
-            grid.add_widget(btn)
-
-        scroll.add_widget(grid)
-        self.main_content.add_widget(scroll)
-
     def drawer_canvas_color(self):
         with self.drawer.canvas.before:
             Color(0.18, 0.49, 0.2, 1)  # #2e7d32
@@ -153,12 +122,26 @@ class DrawerApp(BoxLayout):
         self._rect.size = instance.size
 
     def clear_main(self):
+        self.view_id += 1
         self.main_content.clear_widgets()
 
     def show_home(self, *args):
         self.load_user_data()
 
 
+    def show_history(self, *args):
+        from HistoryPage import HistoryView
+
+        self.clear_main()
+        self.main_content.add_widget(HistoryView(self.user_id, resource_labels=RESOURCE_LABELS))
+
+    def show_charts(self, *args):
+        from ChartsPage import ChartsView
+
+        self.clear_main()
+        self.charts_view = ChartsView(self.user_id, self.analysis_time_var, resource_labels=RESOURCE_LABELS)
+        self.main_content.add_widget(self.charts_view)
+
     def show_profile(self, *args):
         self.clear_main()
         label = Label(text="User Profile Page\n(Details to be implemented)", font_size=18, color=(0.18, 0.49, 0.2, 1))
@@ -166,63 +149,233 @@ class DrawerApp(BoxLayout):
 
     def show_settings(self, *args):
         self.clear_main()
-        label = Label(text="Settings Page\n(Options to be implemented)", font_size=18, color=(0.18, 0.49, 0.2, 1))
-        self.main_content.add_widget(label)
+        heading = Button(text="Settings", font_size=22, bold=True, size_hint=(1, None), height=40,
+                         background_normal='', background_color=(0, 0, 0, 0), color=(0.18, 0.49, 0.2, 1))
+        self.main_content.add_widget(heading)
+        admin_slot = BoxLayout(size_hint=(1, None), height=0)
+        self.main_content.add_widget(admin_slot)
+        self.show_sync()
+        self.show_backups()
+
+        def show_admin_button(allowed):
+            if allowed and admin_slot.parent is not None:
+                admin_btn = Button(text="Manage users", background_color=(0.18, 0.49, 0.2, 1), color=(1, 1, 1, 1))
+                admin_btn.bind(on_release=self.show_admin)
+                admin_slot.height = 40
+                admin_slot.add_widget(admin_btn)
+
+        run_in_background(is_admin, get_database(), self.user_id, on_result=show_admin_button)
+        taps = []
+
+        # Five quick taps on the heading open the diagnostics panel
+        def tapped(_):
+            now = time.monotonic()
+            taps[:] = [t for t in taps if now - t < 2] + [now]
+            if len(taps) >= 5:
+                taps.clear()
+                self.show_diagnostics()
+
+        heading.bind(on_release=tapped)
+
+    def show_admin(self, *args):
+        from AdminPage import AdminView
 
-    def show_consumption_input(self, *args):
         self.clear_main()
-        label = Label(
-            text="Enter your power consumption (kWh):",
-            font_size=20, color=(0.18, 0.49, 0.2, 1)
-        )
-        self.main_content.add_widget(label)
+        self.main_content.add_widget(AdminView(self.user_id))
+
+    def show_sync(self):
+        from sync import SYNC_URL, last_sync, sync_in_background
+
+        self.main_content.add_widget(Label(text="Sync", font_size=18, bold=True, color=(0.18, 0.49, 0.2, 1),
+                                           size_hint=(1, None), height=30))
+        status = Label(text="", font_size=14, color=(0.3, 0.5, 0.3, 1), size_hint=(1, None), height=24)
+        sync_btn = Button(text="Sync now", size_hint=(1, None), height=40,
+                          background_color=(0.18, 0.49, 0.2, 1), color=(1, 1, 1, 1))
+        self.main_content.add_widget(sync_btn)
+        self.main_content.add_widget(status)
+
+        def done(result, error):
+            sync_btn.disabled = False
+            if error is not None:
+                status.text = "Sync failed, please check the connection."
+            else:
+                status.text = (f"Synced: {result.pushed:,} sent, {result.pulled:,} received "
+                               f"({(result.bytes_sent + result.bytes_received) / 1024:.1f} KB).")
+                if result.pulled:
+                    schedule_refresh()
+
+        def start(*args):
+            if sync_in_background(on_done=lambda result, error: Clock.schedule_once(lambda dt: done(result, error))):
+                sync_btn.disabled = True
+                status.text = "Syncing..."
+            else:
+                status.text = "A sync is already running."
+
+        sync_btn.bind(on_release=start)
+
+        def show_last(last):
+            if not status.text:
+                status.text = (f"Last synced {time.strftime('%d %b %Y %H:%M', time.localtime(last))}." if last
+                               else f"Not synced yet. Server: {SYNC_URL}")
+
+        run_in_background(last_sync, on_result=show_last)
+
+    def show_backups(self):
+        from backup import backup_in_background, list_backups
+
+        self.main_content.add_widget(Label(text="Backups", font_size=18, bold=True, color=(0.18, 0.49, 0.2, 1),
+                                           size_hint=(1, None), height=30))
+        status = Label(text="Snapshots are taken daily and the last few are kept.", font_size=14,
+                       color=(0.3, 0.5, 0.3, 1), size_hint=(1, None), height=24)
+        backup_btn = Button(text="Back up now", size_hint=(1, None), height=40,
+                            background_color=(0.18, 0.49, 0.2, 1), color=(1, 1, 1, 1))
+        self.main_content.add_widget(backup_btn)
+        self.main_content.add_widget(status)
+
+        listing = GridLayout(cols=2, spacing=6, size_hint=(1, None), row_default_height=34, row_force_default=True)
+        listing.bind(minimum_height=listing.setter("height"))
+        self.main_content.add_widget(listing)
+        self.main_content.add_widget(Label())  # Keeps the section at the top
+
+        def fill(*args):
+            run_in_background(list_backups, on_result=show_list)
+
+        def show_list(backups):
+            listing.clear_widgets()
+            for info in backups:
+                listing.add_widget(Label(text=f"{info.created:%d %b %Y %H:%M}  ({info.size / 2 ** 20:.1f} MB)",
+                                         font_size=14, color=(0.2, 0.2, 0.2, 1)))
+                restore_btn = Button(text="Restore", size_hint_x=None, width=110,
+                                     background_color=(0.72, 0.11, 0.11, 1), color=(1, 1, 1, 1))
+                restore_btn.bind(on_release=lambda instance, path=info.path: self.confirm_restore(path))
+                listing.add_widget(restore_btn)
+
+        def done(info, error):
+            backup_btn.disabled = False
+            status.text = "Backup failed, please try again." if error is not None else "Backup complete."
+            fill()
+
+        def progress(fraction):
+            status.text = f"Backing up... {fraction:.0%}"
+
+        def start(*args):
+            if backup_in_background(on_done=lambda info, error: Clock.schedule_once(lambda dt: done(info, error)),
+                                    progress=lambda fraction: Clock.schedule_once(lambda dt: progress(fraction))):
+                backup_btn.disabled = True
+                status.text = "Backing up..."
+            else:
+                status.text = "A backup is already running."
+
+        backup_btn.bind(on_release=start)
+        fill()
+
+    def confirm_restore(self, path):
+        from kivy.uix.popup import Popup
+        from backup import restore_backup
 
-        # Input field
-        self.electricity_input = TextInput(
-            multiline=False, input_filter='float',
-            size_hint=(1, None), height=40
-        )
-        self.main_content.add_widget(self.electricity_input)
+        content = BoxLayout(orientation='vertical', padding=12, spacing=8)
+        message = Label(text="Replace all current data with this backup? You will be logged out.", font_size=16,
+                        halign='center')
+        message.bind(width=lambda instance, value: setattr(instance, 'text_size', (value, None)))
+        content.add_widget(message)
+        btns = BoxLayout(spacing=12, size_hint=(1, None), height=44)
+        yes_btn = Button(text="Restore", background_color=(0.72, 0.11, 0.11, 1), color=(1, 1, 1, 1))
+        no_btn = Button(text="Cancel", background_color=(0.18, 0.49, 0.2, 1), color=(1, 1, 1, 1))
+        btns.add_widget(yes_btn)
+        btns.add_widget(no_btn)
+        content.add_widget(btns)
+        popup = Popup(title="Restore Backup", content=content, size_hint=(None, None), size=(360, 190))
 
-        # Save button
-        save_btn = Button(
-            text="Save Consumption", size_hint=(1, None), height=44,
-            background_color=(0.18, 0.49, 0.2, 1), color=(1, 1, 1, 1)
-        )
-        save_btn.bind(on_release=self.save_consumption)
-        self.main_content.add_widget(save_btn)
+        def finish(error):
+            popup.dismiss()
+            if error is not None:
+                self.show_info_popup("Error", f"Restore failed: {error}")
+                return
+            App.get_running_app().navigate_to("login")
 
+        def run_restore():
+            try:
+                restore_backup(path)
+            except Exception as exc:
+                Clock.schedule_once(lambda dt, exc=exc: finish(exc))
+            else:
+                Clock.schedule_once(lambda dt: finish(None))
+            finally:
+                get_database().close()
+
+        def start(*args):
+            yes_btn.disabled = no_btn.disabled = True
+            message.text = "Restoring..."
+            threading.Thread(target=run_restore, daemon=True).start()
+
+        yes_btn.bind(on_release=start)
+        no_btn.bind(on_release=popup.dismiss)
+        popup.open()
 
-    def save_consumption(self, instance):
-        try:
-            val = float(self.electricity_input.text.strip())
-        except ValueError:
-            self.show_info_popup("Invalid Input", "Please enter a valid number for electricity consumption.")
+    def show_diagnostics(self, *args):
+        import instrumentation
+        from kivy.uix.scrollview import ScrollView
+
+        self.clear_main()
+        self.main_content.add_widget(Label(text="Diagnostics", font_size=22, bold=True,
+                                           color=(0.18, 0.49, 0.2, 1), size_hint=(1, None), height=40))
+        if not instrumentation.ENABLED:
+            note = Label(text="Instrumentation is off. Start the app with ECOSTAR_INSTRUMENT=1 to record "
+                              "query, callback and frame timings.",
+                         font_size=15, color=(0.2, 0.2, 0.2, 1), halign='center')
+            note.bind(width=lambda instance, value: setattr(instance, 'text_size', (value, None)))
+            self.main_content.add_widget(note)
             return
 
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
-        c.execute(
-            "INSERT INTO consumption (user_id, electricity) VALUES (?, ?)",
-            (self.user_id, val)
-        )
-        conn.commit()
-        conn.close()
+        btns = BoxLayout(size_hint=(1, None), height=40, spacing=8)
+        refresh_btn = Button(text="Refresh", background_color=(0.18, 0.49, 0.2, 1), color=(1, 1, 1, 1))
+        export_btn = Button(text="Export JSON", background_color=(0.18, 0.49, 0.2, 1), color=(1, 1, 1, 1))
+        refresh_btn.bind(on_release=self.show_diagnostics)
+        export_btn.bind(on_release=self.export_diagnostics)
+        btns.add_widget(refresh_btn)
+        btns.add_widget(export_btn)
+        self.main_content.add_widget(btns)
+
+        scroll = ScrollView()
+        table = GridLayout(cols=5, spacing=4, size_hint_y=None, row_default_height=24, row_force_default=True)
+        table.bind(minimum_height=table.setter("height"))
+        for text in ("Name", "Calls", "p50 ms", "p95 ms", "Rows"):
+            table.add_widget(Label(text=text, bold=True, font_size=13, color=(0.18, 0.49, 0.2, 1),
+                                   size_hint_x=0.6 if text == "Name" else 0.1))
+        for kind, entries in instrumentation.snapshot().items():
+            for name, stats in entries.items():
+                cells = (f"{kind}: {name}", f"{stats['calls']:,}", f"{stats['p50_ms']:g}",
+                         f"{stats['p95_ms']:g}", f"{stats['rows']:,}")
+                for i, text in enumerate(cells):
+                    cell = Label(text=text, font_size=12, color=(0.2, 0.2, 0.2, 1), shorten=True,
+                                 halign='left' if i == 0 else 'right', size_hint_x=0.6 if i == 0 else 0.1)
+                    cell.bind(size=lambda instance, value: setattr(instance, 'text_size', value))
+                    table.add_widget(cell)
+        scroll.add_widget(table)
+        self.main_content.add_widget(scroll)
 
-        self.show_info_popup("Success", "Consumption data saved successfully!")
-        self.show_home()
+    def export_diagnostics(self, *args):
+        import instrumentation
 
+        path = instrumentation.export_json(time.strftime("diagnostics_%Y%m%d_%H%M%S.json"))
+        self.show_info_popup("Exported", f"Saved to {path}")
 
+    def show_save_error(self, error):
+        self.show_info_popup("Error", "Could not save, please try again.")
+
+
+    @instrumented("analysis_time_changed")
     def analysis_time_changed(self, spinner, val):
         self.analysis_time_var = val
-        self.show_info_popup("Analysis Time Changed", f"Selected: {val}")
-        if val == 'Daily':
-            self.show_consumption_input()
+        if self.charts_view is not None and self.charts_view.parent is self.main_content:
+            self.show_charts()
         else:
             self.show_home()
 
 
     def logout(self, instance):
+        from kivy.uix.popup import Popup
+
         content = BoxLayout(orientation='vertical', padding=12, spacing=8)
         content.add_widget(Label(text="Do you want to logout?", font_size=17))
         btns = BoxLayout(spacing=12, size_hint=(1, None), height=44)
@@ -232,15 +385,87 @@ class DrawerApp(BoxLayout):
         btns.add_widget(no_btn)
         content.add_widget(btns)
         popup = Popup(title="Logout", content=content, size_hint=(None,None), size=(320, 170))
-        yes_btn.bind(on_release=lambda *a: (popup.dismiss(), App.get_running_app().stop()))
+        yes_btn.bind(on_release=lambda *a: (popup.dismiss(), App.get_running_app().navigate_to("login")))
         no_btn.bind(on_release=popup.dismiss)
         popup.open()
 
     def show_info_popup(self, title, msg):
+        from kivy.uix.popup import Popup
+
         popup = Popup(title=title, content=Label(text=msg, font_size=16), size_hint=(None,None), size=(320, 140))
         popup.open()
 
+    def open_import_popup(self, *args):
+        from kivy.uix.popup import Popup
+
+        content = BoxLayout(orientation='vertical', padding=12, spacing=8)
+        content.add_widget(Label(text="Meter export file (CSV or JSON):", font_size=16))
+        path_input = TextInput(multiline=False, size_hint=(1, None), height=40)
+        content.add_widget(path_input)
+        progress_bar = ProgressBar(max=1, value=0, size_hint=(1, None), height=20)
+        content.add_widget(progress_bar)
+        status = Label(text="", font_size=14, size_hint=(1, None), height=24)
+        content.add_widget(status)
+
+        btns = BoxLayout(size_hint=(1, None), height=44, spacing=8)
+        import_btn = Button(text="Import", background_color=(0.18, 0.49, 0.2, 1), color=(1, 1, 1, 1))
+        close_btn = Button(text="Close", background_color=(0.72, 0.11, 0.11, 1), color=(1, 1, 1, 1))
+        btns.add_widget(import_btn)
+        btns.add_widget(close_btn)
+        content.add_widget(btns)
+
+        popup = Popup(title="Import Meter Data", content=content, size_hint=(None, None), size=(460, 300))
+
+        imported = [0]
+
+        def show_progress(rows, fraction):
+            imported[0] = rows
+            progress_bar.value = fraction
+            status.text = f"{rows:,} readings imported..."
+
+        def finish(result, error):
+            import_btn.disabled = False
+            if error is not None:
+                # Batches are committed as they go, so earlier ones are already saved
+                status.text = f"Import failed: {error}. {imported[0]:,} readings were kept."
+                if imported[0]:
+                    schedule_refresh()
+                    self.load_user_data()
+                return
+            status.text = f"Imported {result.imported:,} readings, skipped {result.skipped:,}."
+            schedule_refresh()
+            self.load_user_data()
+
+        # Runs on its own thread with its own connection; the UI only hears back through Clock
+        def run_import(path):
+            try:
+                result = import_file(path, self.user_id, progress=lambda rows, fraction: Clock.schedule_once(
+                    lambda dt: show_progress(rows, fraction)))
+            except Exception as exc:
+                Clock.schedule_once(lambda dt, exc=exc: finish(None, exc))
+            else:
+                Clock.schedule_once(lambda dt: finish(result, None))
+            finally:
+                get_database().close()
+
+        def start_import(*args):
+            path = path_input.text.strip()
+            if not os.path.isfile(path):
+                status.text = "File not found."
+                return
+            import_btn.disabled = True
+            imported[0] = 0
+            progress_bar.value = 0
+            status.text = "Importing..."
+            threading.Thread(target=run_import, args=(path,), daemon=True).start()
+
+        import_btn.bind(on_release=start_import)
+        close_btn.bind(on_release=popup.dismiss)
+        popup.open()
+
     def open_add_consumption_popup(self, instance, consumption_type):
+        from kivy.uix.popup import Popup
+
         content = BoxLayout(orientation='vertical', padding=12, spacing=8)
 
         label = Label(text=f"Enter {consumption_type} usage:", font_size=16, color=(0, 0, 0, 1))
@@ -257,20 +482,25 @@ class DrawerApp(BoxLayout):
 
         popup = Popup(title=f"Add {consumption_type}", content=content, size_hint=(None, None), size=(340, 220))
 
+        def saved(_):
+            schedule_refresh()
+            popup.dismiss()
+            self.show_info_popup("Success", f"{consumption_type} data added!")
+            self.load_user_data()
+
+        def failed(error):
+            save_btn.disabled = False
+            self.show_save_error(error)
+
+        @instrumented("save_consumption")
         def save_and_close(*args):
             try:
                 val = float(usage_input.text.strip())
-                conn = sqlite3.connect(DB_PATH)
-                c = conn.cursor()
-            # Dynamically insert based on type
-                c.execute(f"UPDATE consumption SET {consumption_type.lower()} = ? WHERE user_id = ?", (val, self.user_id))
-                conn.commit()
-                conn.close()
-                popup.dismiss()
-                self.show_info_popup("Success", f"{consumption_type} data added!")
-                self.load_user_data()
             except ValueError:
                 self.show_info_popup("Error", "Invalid input. Please enter a number.")
+                return
+            save_btn.disabled = True
+            save_reading(self.user_id, consumption_type.lower(), val, on_result=saved, on_error=failed)
 
         save_btn.bind(on_release=save_and_close)
         cancel_btn.bind(on_release=popup.dismiss)
@@ -279,15 +509,83 @@ class DrawerApp(BoxLayout):
     # New Methods to integrate user data
 
     def get_user_details(self):
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
-        c.execute("SELECT username, name, email FROM users WHERE id=?", (self.user_id,))
-        user = c.fetchone()
-        conn.close()
-        return user if user else (None, None, None)
+        return get_database().get_user_details(self.user_id)
 
+    @instrumented("load_user_data")
     def load_user_data(self):
-        username, name, email = self.get_user_details()
+        # Today's date is part of the key so period summaries roll over at midnight
+        key = ("dashboard", self.analysis_time_var, time.strftime("%Y-%m-%d"))
+        version = user_version(self.user_id)
+        cached = dashboard_cache.get(self.user_id, key)
+        if cached is not None:
+            self.render_dashboard(cached)
+            # Forecasts are retrained out of process without bumping the version, so check for a newer one
+            if cached[3] is None or cached[3]["stale"]:
+                self.reload_forecast(key, cached, version)
+            return
+
+        self.clear_main()
+        self.main_content.add_widget(Label(text="Loading your dashboard...", font_size=18,
+                                           color=(0.3, 0.5, 0.3, 1)))
+        view = self.view_id
+
+        def loaded(data):
+            # Skip if the user moved to another page while we were loading
+            if view == self.view_id:
+                self.render_dashboard(data)
+                if data[3] is not None and data[3]["stale"]:
+                    self.reload_forecast(key, data, version)
+
+        run_in_background(self.fetch_dashboard, key, on_result=loaded, on_error=self.show_load_error)
+
+    def fetch_dashboard(self, key):
+        # Runs on the database worker thread
+        version = user_version(self.user_id)
+        db = get_database()
+        forecast = load_forecast(self.user_id, db.data_version(self.user_id))
+        data = (self.get_user_details(), self.get_latest_consumption_summary(key[1]),
+                db.recent_anomalies(self.user_id), forecast, db.get_user_tips(self.user_id))
+        dashboard_cache.put(self.user_id, key, data, version)
+        return data
+
+    def data_changed(self, _=None):
+        schedule_refresh()
+        self.load_user_data()
+
+    def reload_forecast(self, key, data, version):
+        view = self.view_id
+        # Read before the fetch, so a refresh that ends during it still gets one more look
+        running = refreshing()
+
+        def loaded(fresh):
+            if view != self.view_id:
+                return
+            if fresh is not None:
+                self.render_dashboard(fresh)
+            elif running and data[3] is not None and data[3]["stale"]:
+                # Still training; look again while the dashboard stays open
+                Clock.schedule_once(lambda dt: view == self.view_id and self.reload_forecast(key, data, version),
+                                    FORECAST_POLL)
+
+        run_in_background(self.fetch_forecast, key, data, version, on_result=loaded)
+
+    def fetch_forecast(self, key, data, version):
+        # Runs on the database worker thread; returns the dashboard with the new forecast, or None if unchanged
+        forecast = load_forecast(self.user_id, get_database().data_version(self.user_id))
+        if forecast == data[3]:
+            return None
+        data = data[:3] + (forecast,) + data[4:]
+        # Stored under the version the cached data was read at, so a write since then still invalidates it
+        dashboard_cache.put(self.user_id, key, data, version)
+        return data
+
+    def show_load_error(self, error):
+        self.clear_main()
+        self.main_content.add_widget(Label(text="Could not load your data, please try again.", font_size=18,
+                                           color=(0.72, 0.11, 0.11, 1)))
+
+    def render_dashboard(self, data):
+        (username, name, email), consumption_summary, anomalies, forecast, tips = data
         self.clear_main()
 
         if username:
@@ -302,38 +600,117 @@ class DrawerApp(BoxLayout):
             self.main_content.add_widget(welcome_label)
 
         # 🟩 Consumption summary
-        consumption_summary = self.get_latest_consumption_summary()
         summary_label = Label(
             text=consumption_summary,
             font_size=18,
             color=(0.3, 0.5, 0.3, 1),
             size_hint=(1, None),
-            height=50
+            height=70,
+            halign="center"
         )
+        summary_label.bind(width=lambda label, width: setattr(label, "text_size", (width, None)))
         self.main_content.add_widget(summary_label)
 
-       
+        if forecast:
+            self.add_forecast(forecast)
 
+        if anomalies:
+            self.add_anomaly_alerts(anomalies)
 
-    def get_latest_consumption_summary(self):
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
-        c.execute("""SELECT SUM(electricity), SUM(water), SUM(gas) FROM consumption WHERE user_id=?""", (self.user_id,))
-        data = c.fetchone()
-        conn.close()
-        if data:
-            elec, water, gas = data
-            elec, water, gas = elec or 0, water or 0, gas or 0
-            return f"Consumption Summary: Electricity: {elec} kWh, Water: {water} L, Gas: {gas} m3"
-        else:
-            return "No consumption data found."
+        if tips:
+            self.add_tips(tips)
+
+        self.add_consumption_buttons()
+
+    def add_forecast(self, forecast):
+        units = {name: unit for name, (_id, unit) in get_database().resources().items()}
+        # The three resources with the largest expected use next month
+        top = sorted(forecast["resources"].items(), key=lambda item: -item[1]["forecast"]["month"])[:3]
+        lines = [f"{RESOURCE_LABELS.get(name, name.title())}: {f['day']:.1f} tomorrow, {f['week']:.1f} next week, "
+                 f"{f['month']:.1f} {units.get(name, '')} next month"
+                 for name, f in ((name, values["forecast"]) for name, values in top)]
+        heading = "🔮 Forecast" + (" (updating...)" if forecast["stale"] else "")
+        label = Label(text="\n".join([heading] + lines), font_size=15, color=(0.3, 0.5, 0.3, 1),
+                      size_hint=(1, None), height=24 * (len(lines) + 1), halign="center")
+        label.bind(width=lambda label, width: setattr(label, "text_size", (width, None)))
+        self.main_content.add_widget(label)
+
+    def add_tips(self, tips):
+        box = BoxLayout(orientation='vertical', size_hint=(1, None), height=28 * len(tips) + 40, spacing=4)
+        for _id, category, message, priority in tips:
+            tip = Label(text=f"💡 [b]{category}[/b] ({PRIORITY_NAMES[priority]}): {message}", markup=True,
+                        font_size=14, color=(0.18, 0.49, 0.2, 1), size_hint=(1, None), height=24)
+            tip.bind(width=lambda label, width: setattr(label, "text_size", (width, None)))
+            box.add_widget(tip)
+        read_btn = Button(text="Got it", size_hint=(None, None), size=(140, 32),
+                          background_color=(0.18, 0.49, 0.2, 1), color=(1, 1, 1, 1), font_size=14)
+        read_btn.bind(on_release=lambda *a: run_in_background(
+            get_database().mark_tips_read, self.user_id, [row[0] for row in tips],
+            on_result=self.data_changed, on_error=self.show_save_error))
+        box.add_widget(read_btn)
+        self.main_content.add_widget(box)
+
+    def add_anomaly_alerts(self, anomalies):
+        box = BoxLayout(orientation='vertical', size_hint=(1, None), height=30 * len(anomalies) + 40, spacing=4)
+        for _id, resource, unit, ts, value, score in anomalies:
+            direction = "high" if score > 0 else "low"
+            box.add_widget(Label(
+                text=f"⚠ Unusually {direction} {RESOURCE_LABELS.get(resource, resource.title())}: "
+                     f"{value:g} {unit} on {time.strftime('%d %b %H:%M', time.localtime(ts))}",
+                font_size=15, color=(0.72, 0.11, 0.11, 1), size_hint=(1, None), height=26
+            ))
+        dismiss_btn = Button(text="Dismiss alerts", size_hint=(None, None), size=(140, 32),
+                             background_color=(0.72, 0.11, 0.11, 1), color=(1, 1, 1, 1), font_size=14)
+        dismiss_btn.bind(on_release=lambda *a: run_in_background(
+            get_database().dismiss_anomalies, self.user_id, [row[0] for row in anomalies],
+            on_result=self.data_changed, on_error=self.show_save_error))
+        box.add_widget(dismiss_btn)
+        self.main_content.add_widget(box)
+
+    def add_consumption_buttons(self):
+        from kivy.uix.scrollview import ScrollView
+
+        scroll = ScrollView(size_hint=(1, None), size=(Window.width, 300))  # You can adjust height
+        grid = GridLayout(cols=2, spacing=8, size_hint_y=None, padding=[10, 10])
+        grid.bind(minimum_height=grid.setter("height"))
+
+        types = [
+            ("Electricity ⚡", "Electricity"),
+            ("Water 💧", "Water"),
+            ("Oil 🛢️", "Oil"),
+            ("Gas 🔥", "Gas"),
+            ("CNG 🚗", "CNG"),
+            ("Petrol ⛽", "Petrol"),
+        ]
 
+        for label_text, t in types:
+            btn = Button(
+                text=label_text,
+                size_hint_y=None,
+                height=50,
+                background_color=(0.18, 0.49, 0.2, 1),
+                color=(1, 1, 1, 1),
+                font_size=16,
+                bold=True
+            )
+            btn.bind(on_release=lambda instance, tp=t: self.open_add_consumption_popup(instance, tp))
+            grid.add_widget(btn)
+
+        scroll.add_widget(grid)
+        self.main_content.add_widget(scroll)
 
-class HomePageApp(App):
-    def build(self):
-        # Replace with actual logged-in user ID in real use
-        return DrawerApp(user_id=1)
+    def get_latest_consumption_summary(self, analysis_time=None):
+        period, heading = ANALYSIS_PERIODS[analysis_time or self.analysis_time_var]
+        db = get_database()
+        totals = db.get_period_totals(self.user_id, period)
+        if not any(totals.values()):
+            return f"{heading}: no consumption data found."
+        parts = [f"{RESOURCE_LABELS.get(name, name.title())}: {total:g} {db.resources()[name][1]}"
+                 for name, total in totals.items() if total]
+        return f"{heading}'s Consumption: " + ", ".join(parts)
 
 
 if __name__ == "__main__":
-    HomePageApp().run()
+    from main import EcoStarApp
+    # Replace with actual logged-in user ID in real use
+    EcoStarApp(start_screen="home", user_id=1).run()
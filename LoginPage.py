@@ -4,67 +4,14 @@ from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.label import Label
 from kivy.uix.textinput import TextInput
 from kivy.uix.button import Button
-from kivy.uix.popup import Popup
-from kivy.graphics import Color, RoundedRectangle, Rectangle
-from kivy.clock import Clock
+from kivy.graphics import Color, RoundedRectangle
 from kivy.animation import Animation
-from kivy.core.window import Window
 from kivy.metrics import dp
-import sqlite3
-import subprocess
-import sys
 
-# 🌿 Global setup
-Window.size = (950, 600)
-Window.clearcolor = (0, 0, 0, 1)
-
-DB_PATH = "ecostar_pro.db"
-
-
-def create_tables():
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute('''CREATE TABLE IF NOT EXISTS users (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        username TEXT UNIQUE NOT NULL,
-        password TEXT NOT NULL,
-        name TEXT,
-        email TEXT)''')
-    conn.commit()
-    conn.close()
-
-
-def get_user_id(username, password):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("SELECT id FROM users WHERE username=? AND password=?", (username, password))
-    user = c.fetchone()
-    conn.close()
-    return user[0] if user else None
-
-
-# 🌈 Modern animated gradient background
-class AnimatedGradient(RelativeLayout):
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        with self.canvas:
-            self.color_instruction = Color(0.0, 0.25, 0.1, 1)
-            self.rect = Rectangle(pos=self.pos, size=self.size)
-        self.bind(pos=self.update_rect, size=self.update_rect)
-        self.step = 0
-        Clock.schedule_interval(self.animate, 0.05)
-
-    def update_rect(self, *args):
-        self.rect.pos = self.pos
-        self.rect.size = self.size
-
-    def animate(self, dt):
-        self.step += 0.005
-        offset = abs((self.step % 2) - 1)
-        r = 0.05 + 0.15 * offset
-        g = 0.4 + 0.4 * offset
-        b = 0.1 + 0.15 * offset
-        self.color_instruction.rgba = (r, g, b, 1)
+from database import get_database
+from db_worker import run_in_background
+from instrumentation import instrumented
+from widgets import AnimatedGradient
 
 
 # 💠 Glass card with blur and shadow illusion
@@ -94,7 +41,7 @@ class LoginPage(RelativeLayout):
         super().__init__(**kwargs)
 
         # Background animation
-        self.bg = AnimatedGradient()
+        self.bg = AnimatedGradient(palette="login")
         self.add_widget(self.bg)
 
         # Glass card
@@ -194,6 +141,8 @@ class LoginPage(RelativeLayout):
         Animation(opacity=1, scale=1, duration=1.1, t='out_elastic').start(self.card)
 
     def show_popup(self, title, msg):
+        from kivy.uix.popup import Popup
+
         popup = Popup(
             title=title,
             content=Label(text=msg, font_size=18, color=(0, 0, 0, 1)),
@@ -204,29 +153,37 @@ class LoginPage(RelativeLayout):
         )
         popup.open()
 
+    @instrumented("login")
     def login(self, instance):
         username = self.username_entry.text.strip()
         password = self.password_entry.text.strip()
         if not username or not password:
             self.show_popup("Input Error", "Please enter both username and password.")
             return
-        user_id = get_user_id(username, password)
+        self.set_busy(True)
+        run_in_background(get_database().get_user_id, username, password,
+                          on_result=self.on_login_result, on_error=self.on_login_error)
+
+    def set_busy(self, busy):
+        self.login_btn.disabled = busy
+        self.login_btn.text = "Signing in..." if busy else "Sign In"
+
+    def on_login_result(self, user_id):
+        self.set_busy(False)
         if user_id:
-            self.show_popup("Success", f"Welcome, {username}!")
-            App.get_running_app().stop()
-            subprocess.Popen([sys.executable, "HomePage.py", str(user_id)])
+            self.password_entry.text = ""
+            App.get_running_app().navigate_to("home", user_id=user_id)
         else:
             self.show_popup("Failed", "Invalid username or password.")
 
-    def open_register(self, instance):
-        App.get_running_app().stop()
-        subprocess.Popen([sys.executable, "RegisterPage.py"])
-
+    def on_login_error(self, error):
+        self.set_busy(False)
+        self.show_popup("Error", "Could not reach the database, please try again.")
 
-class LoginApp(App):
-    def build(self):
-        return LoginPage()
+    def open_register(self, instance):
+        App.get_running_app().navigate_to("register")
 
 
 if __name__ == "__main__":
-    LoginApp().run()
+    from main import EcoStarApp
+    EcoStarApp(start_screen="login").run()
@@ -4,71 +4,13 @@ from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.label import Label
 from kivy.uix.textinput import TextInput
 from kivy.uix.button import Button
-from kivy.graphics import Color, RoundedRectangle, Rectangle
-from kivy.clock import Clock
+from kivy.graphics import Color, RoundedRectangle
 from kivy.animation import Animation
-from kivy.core.window import Window
-from kivy.uix.popup import Popup
 from kivy.metrics import dp
-import sqlite3
-import subprocess
-import sys
-
-Window.clearcolor = (0, 0, 0, 1)
-Window.size = (900, 600)
-
-DB_PATH = "ecostar_pro.db"
-
-
-def create_tables():
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute('''CREATE TABLE IF NOT EXISTS users (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        username TEXT UNIQUE NOT NULL,
-        password TEXT NOT NULL,
-        name TEXT,
-        email TEXT)''')
-    conn.commit()
-    conn.close()
-
-
-def register_user(username, password, name, email):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    try:
-        c.execute("INSERT INTO users (username, password, name, email) VALUES (?, ?, ?, ?)",
-                  (username, password, name, email))
-        conn.commit()
-        conn.close()
-        return True
-    except sqlite3.IntegrityError:
-        conn.close()
-        return False
-
-
-# 🌈 Animated eco-gradient background
-class AnimatedGradient(RelativeLayout):
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        with self.canvas:
-            self.color_instruction = Color(0.0, 0.3, 0.1, 1)
-            self.rect = Rectangle(pos=self.pos, size=self.size)
-        self.bind(pos=self.update_rect, size=self.update_rect)
-        self.step = 0
-        Clock.schedule_interval(self.animate, 0.05)
-
-    def update_rect(self, *args):
-        self.rect.pos = self.pos
-        self.rect.size = self.size
-
-    def animate(self, dt):
-        self.step += 0.008
-        offset = abs((self.step % 2) - 1)
-        r = (0.0 * (1 - offset)) + (0.18 * offset)
-        g = (0.4 * (1 - offset)) + (0.75 * offset)
-        b = (0.1 * (1 - offset)) + (0.25 * offset)
-        self.color_instruction.rgba = (r, g, b, 1)
+
+from database import get_database
+from db_worker import run_in_background
+from widgets import AnimatedGradient
 
 
 # 💠 Glassmorphic container
@@ -97,10 +39,8 @@ class RegisterPage(RelativeLayout):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
 
-        create_tables()
-
         # Animated background
-        self.bg = AnimatedGradient()
+        self.bg = AnimatedGradient(palette="register")
         self.add_widget(self.bg)
 
         # Glassmorphic card
@@ -140,7 +80,7 @@ class RegisterPage(RelativeLayout):
             self.card.add_widget(entry)
 
         # Register button
-        reg_btn = Button(
+        self.reg_btn = reg_btn = Button(
             text="Register", size_hint=(1, None), height=46,
             font_size=18, bold=True,
             background_normal='', background_color=(0.05, 0.55, 0.2, 1),
@@ -172,6 +112,8 @@ class RegisterPage(RelativeLayout):
         Animation(opacity=1, scale=1, duration=1.0, t='out_elastic').start(self.card)
 
     def show_popup(self, title, msg):
+        from kivy.uix.popup import Popup
+
         popup = Popup(
             title=title,
             content=Label(text=msg, font_size=16, color=(0, 0, 0, 1)),
@@ -191,21 +133,30 @@ class RegisterPage(RelativeLayout):
             self.show_popup("Input Error", "Please fill all fields.")
             return
 
-        if register_user(username, password, name, email):
+        self.set_busy(True)
+        run_in_background(get_database().register_user, username, password, name, email,
+                          on_result=self.on_register_result, on_error=self.on_register_error)
+
+    def set_busy(self, busy):
+        self.reg_btn.disabled = busy
+        self.reg_btn.text = "Creating account..." if busy else "Register"
+
+    def on_register_result(self, created):
+        self.set_busy(False)
+        if created:
             self.show_popup("Success", "Account created successfully!")
-            self.back_to_login(instance)
+            self.back_to_login(self.reg_btn)
         else:
             self.show_popup("Error", "Username already exists, try another.")
 
-    def back_to_login(self, instance):
-        App.get_running_app().stop()
-        subprocess.Popen([sys.executable, "LoginPage.py"])
+    def on_register_error(self, error):
+        self.set_busy(False)
+        self.show_popup("Error", "Could not create the account, please try again.")
 
-
-class RegisterApp(App):
-    def build(self):
-        return RegisterPage()
+    def back_to_login(self, instance):
+        App.get_running_app().navigate_to("login")
 
 
 if __name__ == "__main__":
-    RegisterApp().run()
+    from main import EcoStarApp
+    EcoStarApp(start_screen="register").run()
@@ -1,30 +1,61 @@
+import importlib
+import time
+
 from kivy.app import App
 from kivy.uix.floatlayout import FloatLayout
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.label import Label
 from kivy.clock import Clock
-from kivy.graphics import Color, RoundedRectangle
+from kivy.core.text import Label as CoreLabel
+from kivy.graphics import Color, Rectangle, RoundedRectangle
 from kivy.animation import Animation
-from kivy.core.window import Window
-import subprocess
-import sys
+from kivy.logger import Logger
+
+import startup
+from database import get_database
+from db_worker import run_in_background
+from widgets import gradient_texture
+
+# Seconds the splash stays up even when warm-up finishes sooner
+MIN_DISPLAY = 1.5
+# Imported while the splash shows so the first login does not pay for them
+WARM_MODULES = ("LoginPage", "RegisterPage", "HomePage", "HistoryPage", "ChartsPage", "importer", "forecasting", "recommendations")
+# (font_size, bold, italic) the login page renders first
+WARM_FONTS = ((46, True, False), (18, False, True), (17, False, False), (20, True, False), (15, False, False))
+
+
+def warm_up():
+    """Background half of the warm-up, run on the database worker; returns seconds per stage."""
+    timings = {}
+    started = time.perf_counter()
+    # Opens the worker's connection and applies any pending migrations
+    get_database().resources()
+    timings["database"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for name in WARM_MODULES:
+        importlib.import_module(name)
+    timings["modules"] = time.perf_counter() - started
+    return timings
+
+
+def preload_fonts():
+    """Load the login page's font faces and sizes; must run on the UI thread."""
+    for font_size, bold, italic in WARM_FONTS:
+        CoreLabel(text="EcoStar Pro", font_size=font_size, bold=bold, italic=italic).refresh()
 
-# Set larger window size
-Window.size = (800, 400)
 
 class ModernSplash(FloatLayout):
     def __init__(self, **kwargs):
         super().__init__(size_hint=(1, 1), **kwargs)
+        self.shown_at = time.perf_counter()
 
-        # Gradient background
+        # Gradient background, drawn once into a texture and stretched
         with self.canvas.before:
-            for i in range(80):
-                t = i / 79.0
-                r = 0 * (1 - t) + 0.196 * t
-                g = 0.39 * (1 - t) + 0.803 * t
-                b = 0 * (1 - t) + 0.196 * t
-                Color(r, g, b)
-                RoundedRectangle(pos=(0, i * (self.height / 80)), size=(self.width, self.height / 80))
+            Color(1, 1, 1, 1)
+            self.gradient = Rectangle(texture=gradient_texture((0, 0.39, 0), (0.196, 0.803, 0.196)),
+                                      pos=self.pos, size=self.size)
+        self.bind(pos=self.update_gradient, size=self.update_gradient)
 
         # Card container
         self.card = BoxLayout(
@@ -72,20 +103,47 @@ class ModernSplash(FloatLayout):
             widget.opacity = 0
             Animation(opacity=1, d=1.1, t='out_cubic').start(widget)
 
-        # Schedule closing splash and launching login page
-        Clock.schedule_once(self.launch_login, 4)
+        # Move on to the login page once warm-up is done
+        Clock.schedule_once(self.start_warm_up)
+
+    def update_gradient(self, *args):
+        self.gradient.pos = self.pos
+        self.gradient.size = self.size
 
     def update_bg(self, *args):
         self.bg.pos = self.card.pos
         self.bg.size = self.card.size
 
+    def start_warm_up(self, dt):
+        run_in_background(warm_up, on_result=self.on_warm_up_done, on_error=self.on_warm_up_error)
+        started = time.perf_counter()
+        preload_fonts()
+        self.log_stage("fonts", time.perf_counter() - started)
+
+    def on_warm_up_done(self, timings):
+        for stage, seconds in timings.items():
+            self.log_stage(stage, seconds)
+        self.finish()
+
+    def on_warm_up_error(self, error):
+        # The login page reports database problems itself; do not hold the splash
+        Logger.warning(f"Splash: warm-up failed: {error!r}")
+        self.finish()
+
+    def log_stage(self, stage, seconds):
+        Logger.info(f"Splash: {stage} ready in {seconds * 1000:.1f} ms")
+        startup.record(stage, seconds)
+
+    def finish(self):
+        elapsed = time.perf_counter() - self.shown_at
+        Logger.info(f"Splash: warm-up finished {elapsed * 1000:.1f} ms after the splash was built")
+        startup.record("warm_up", elapsed)
+        Clock.schedule_once(self.launch_login, max(0, MIN_DISPLAY - elapsed))
+
     def launch_login(self, dt):
-        App.get_running_app().stop()  # Close splash
-        subprocess.Popen([sys.executable, "LoginPage.py"])  
+        App.get_running_app().navigate_to("login")
 
-class SplashApp(App):
-    def build(self):
-        return ModernSplash()
 
 if __name__ == "__main__":
-    SplashApp().run()
+    from main import EcoStarApp
+    EcoStarApp(start_screen="splash").run()
@@ -0,0 +1,137 @@
+"""User management for administrators: search, status reports, edit and delete.
+
+Search runs on the ``users_fts`` FTS5 index (username, name and email, kept
+in sync by triggers). Every word typed is matched as a token prefix, so
+``jo smi`` finds John Smith and ``example.com`` finds everyone at that
+domain. Results are keyset-paginated on the user id, which is also the
+order FTS5 yields matches in, so each page is a short index walk however
+many users match. Status comes from the rollups and indexes, never from a
+scan of the readings.
+
+    python admin.py --grant alice
+"""
+import argparse
+import re
+import sqlite3
+import time
+from collections import namedtuple
+from typing import Dict, Iterable, List, Optional
+
+from database import Database, get_database
+
+PAGE_SIZE = 50
+# Users with a reading this recent count as active
+ACTIVE_DAYS = 7
+
+UserRow = namedtuple("UserRow", "id username name email is_admin")
+
+_WORD = re.compile(r"\w+")
+
+# Every table holding per-user data, cleared when a user is deleted
+USER_TABLES = ("readings", "rollups", "hourly_extremes", "reading_stats", "anomalies", "recommendations")
+
+
+def match_query(text: str) -> Optional[str]:
+    """FTS5 query matching every word of ``text`` as a prefix, or None when there are no words."""
+    words = _WORD.findall(text.lower())
+    # \w never contains a double quote, so quoting each word is enough to escape FTS5 syntax
+    return " ".join(f'"{word}"*' for word in words) or None
+
+
+def search_users(db: Database, text: str = "", after: Optional[int] = None,
+                 limit: int = PAGE_SIZE) -> List[UserRow]:
+    """One page of users matching ``text``, by id; pass the last row's id as ``after`` for the next page."""
+    after = after if after is not None else 0
+    match = match_query(text)
+    if match is None:
+        rows = db.conn.execute("SELECT id, username, name, email, is_admin FROM users WHERE id > ? "
+                               "ORDER BY id LIMIT ?", (after, limit)).fetchall()
+    else:
+        rows = db.conn.execute('''
+            SELECT u.id, u.username, u.name, u.email, u.is_admin
+            FROM users_fts f JOIN users u ON u.id = f.rowid
+            WHERE users_fts MATCH ? AND f.rowid > ?
+            ORDER BY f.rowid LIMIT ?
+        ''', (match, after, limit)).fetchall()
+    return [UserRow(*row) for row in rows]
+
+
+def user_status(db: Database, user_ids: Iterable[int], now: Optional[int] = None) -> Dict[int, dict]:
+    """Readings, last reading, open anomalies and an Active/Idle/No data label per user."""
+    user_ids = list(user_ids)
+    if not user_ids:
+        return {}
+    now = int(time.time()) if now is None else now
+    marks = ",".join("?" * len(user_ids))
+    counts = dict(db.conn.execute(f"SELECT user_id, SUM(count) FROM rollups WHERE period='month' "
+                                  f"AND user_id IN ({marks}) GROUP BY user_id", user_ids).fetchall())
+    alerts = dict(db.conn.execute(f"SELECT user_id, COUNT(*) FROM anomalies WHERE dismissed=0 "
+                                  f"AND user_id IN ({marks}) GROUP BY user_id", user_ids).fetchall())
+    report = {}
+    for user_id in user_ids:
+        # MAX over the (user_id, ts) index is a single seek
+        last = db.conn.execute("SELECT MAX(ts) FROM readings WHERE user_id=?", (user_id,)).fetchone()[0]
+        if last is None:
+            status = "No data"
+        else:
+            status = "Active" if now - last < ACTIVE_DAYS * 86400 else "Idle"
+        report[user_id] = {"status": status, "readings": counts.get(user_id, 0), "last_reading": last,
+                           "open_anomalies": alerts.get(user_id, 0)}
+    return report
+
+
+def search_page(db: Database, text: str = "", after: Optional[int] = None, limit: int = PAGE_SIZE) -> tuple:
+    """``(rows, status_by_user_id)`` for one page, for the admin console to fetch in one job."""
+    rows = search_users(db, text, after, limit)
+    return rows, user_status(db, [row.id for row in rows])
+
+
+def is_admin(db: Database, user_id: int) -> bool:
+    row = db.conn.execute("SELECT is_admin FROM users WHERE id=?", (user_id,)).fetchone()
+    return bool(row and row[0])
+
+
+def set_admin(db: Database, username: str, admin: bool = True) -> bool:
+    with db.transaction() as conn:
+        return conn.execute("UPDATE users SET is_admin=? WHERE username=?", (int(admin), username)).rowcount > 0
+
+
+def update_user(db: Database, user_id: int, username: str, name: str, email: str, admin: bool) -> bool:
+    """Save an edited user; False when the username is taken."""
+    try:
+        with db.transaction() as conn:
+            conn.execute("UPDATE users SET username=?, name=?, email=?, is_admin=? WHERE id=?",
+                         (username, name, email, int(admin), user_id))
+            db.touch(user_id)
+        return True
+    except sqlite3.IntegrityError:
+        return False
+
+
+def delete_user(db: Database, user_id: int) -> None:
+    """Delete a user with all of their data."""
+    import forecasting
+
+    with db.transaction() as conn:
+        for table in USER_TABLES:
+            conn.execute(f"DELETE FROM {table} WHERE user_id=?", (user_id,))
+        conn.execute("DELETE FROM users WHERE id=?", (user_id,))
+        db.touch(user_id)
+    forecasting.discard(user_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Grant or revoke access to the admin console.")
+    parser.add_argument("username")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--grant", action="store_true")
+    group.add_argument("--revoke", action="store_true")
+    args = parser.parse_args()
+
+    if not set_admin(get_database(), args.username, args.grant):
+        parser.error(f"No user named {args.username!r}")
+    print(f"{args.username} is {'now' if args.grant else 'no longer'} an administrator.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""Vectorized consumption analytics (the ``Analysis`` class from the UML).
+
+A user's readings are loaded once, in a single columnar fetch, into NumPy
+arrays ordered by (resource, ts). Every computation below - bucket totals,
+deltas, moving averages, per-resource breakdowns and period comparisons -
+works on whole arrays instead of looping over rows in Python.
+
+Bucketing uses the machine's current UTC offset; readings on the far side of
+a DST change can land an hour off compared with the SQL rollups.
+"""
+import time
+from collections import namedtuple
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from database import Database, get_database
+
+DAY = 86400
+
+# Columnar readings for one user, sorted by (resource_id, ts)
+Readings = namedtuple("Readings", "resource_id ts value")
+
+Series = namedtuple("Series", "buckets totals")
+
+
+def load_readings(db: Database, user_id: int, start: Optional[int] = None, end: Optional[int] = None) -> Readings:
+    """Fetch a user's readings as three aligned arrays in one query."""
+    sql = "SELECT resource_id, ts, value FROM readings WHERE user_id=?"
+    params = [user_id]
+    if start is not None:
+        sql += " AND ts >= ?"
+        params.append(start)
+    if end is not None:
+        sql += " AND ts < ?"
+        params.append(end)
+    # Matches the covering index order, so SQLite streams it without sorting
+    rows = db.conn.execute(sql + " ORDER BY resource_id, ts", params).fetchall()
+    table = np.array(rows, dtype=np.float64).reshape(len(rows), 3)
+    return Readings(table[:, 0].astype(np.int64), table[:, 1].astype(np.int64), table[:, 2])
+
+
+def bucket_starts(ts: np.ndarray, period: str, utc_offset: Optional[int] = None) -> np.ndarray:
+    """Unix time of the local start of each timestamp's day, week (Monday) or month."""
+    offset = time.localtime().tm_gmtoff if utc_offset is None else utc_offset
+    local = ts + offset
+    if period == "day":
+        starts = local - local % DAY
+    elif period == "week":
+        days = local // DAY
+        starts = (days - (days + 3) % 7) * DAY  # 1970-01-01 was a Thursday
+    elif period == "month":
+        starts = local.astype("datetime64[s]").astype("datetime64[M]").astype("datetime64[s]").astype(np.int64)
+    else:
+        raise ValueError(f"Unknown period: {period}")
+    return starts - offset
+
+
+def resource_slices(data: Readings) -> Dict[int, slice]:
+    """Contiguous slice of each resource in the (resource, ts) ordered arrays."""
+    ids, first = np.unique(data.resource_id, return_index=True)
+    bounds = np.append(first, len(data.resource_id))
+    return {int(rid): slice(bounds[i], bounds[i + 1]) for i, rid in enumerate(ids)}
+
+
+def bucket_totals(ts: np.ndarray, values: np.ndarray, period: str) -> Series:
+    buckets, inverse = np.unique(bucket_starts(ts, period), return_inverse=True)
+    return Series(buckets, np.bincount(inverse, weights=values, minlength=len(buckets)))
+
+
+def moving_average(values: np.ndarray, window: int) -> np.ndarray:
+    """Trailing mean over ``window`` points; shorter windows at the start."""
+    if len(values) == 0:
+        return values.astype(np.float64)
+    sums = np.cumsum(values, dtype=np.float64)
+    sums[window:] = sums[window:] - sums[:-window]
+    counts = np.minimum(np.arange(1, len(values) + 1), window)
+    return sums / counts
+
+
+def deltas(totals: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Change and percentage change from each bucket to the next (NaN where the previous is zero)."""
+    change = np.diff(totals)
+    previous = totals[:-1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        percent = np.where(previous != 0, change / previous * 100, np.nan)
+    return change, percent
+
+
+def breakdown(data: Readings, start: Optional[int] = None, end: Optional[int] = None) -> np.ndarray:
+    """Total per resource id (index = resource_id) for ``start <= ts < end``."""
+    mask = np.ones(len(data.ts), dtype=bool)
+    if start is not None:
+        mask &= data.ts >= start
+    if end is not None:
+        mask &= data.ts < end
+    size = int(data.resource_id.max()) + 1 if len(data.resource_id) else 0
+    return np.bincount(data.resource_id[mask], weights=data.value[mask], minlength=size)
+
+
+class Analysis:
+    def __init__(self, db: Optional[Database] = None):
+        self.db = db or get_database()
+
+    def _names(self) -> Dict[int, str]:
+        return {resource_id: name for name, (resource_id, _unit) in self.db.resources().items()}
+
+    def _named(self, per_id: np.ndarray) -> Dict[str, float]:
+        return {name: float(per_id[rid]) if rid < len(per_id) else 0.0 for rid, name in self._names().items()}
+
+    def period_series(self, user_id: int, period: str = "day", data: Optional[Readings] = None) -> Dict[str, Series]:
+        """Bucket totals per resource over the user's whole history."""
+        data = data if data is not None else load_readings(self.db, user_id)
+        names = self._names()
+        return {names[rid]: bucket_totals(data.ts[part], data.value[part], period)
+                for rid, part in resource_slices(data).items()}
+
+    def compare_periods(self, user_id: int, period1: Tuple[int, int], period2: Tuple[int, int]) -> Dict[str, dict]:
+        """Per-resource totals for two ``(start, end)`` ranges and the change from the first to the second."""
+        data = load_readings(self.db, user_id, min(period1[0], period2[0]), max(period1[1], period2[1]))
+        first = self._named(breakdown(data, *period1))
+        second = self._named(breakdown(data, *period2))
+        result = {}
+        for name in first:
+            change = second[name] - first[name]
+            result[name] = {
+                "period1": first[name],
+                "period2": second[name],
+                "change": change,
+                "change_pct": change / first[name] * 100 if first[name] else None,
+            }
+        return result
+
+    def get_trends(self, user_id: int, period: str = "day", window: int = 7) -> Dict[str, dict]:
+        """Moving average, last change and fitted slope (units per bucket) for each resource."""
+        trends = {}
+        for name, series in self.period_series(user_id, period).items():
+            change, percent = deltas(series.totals)
+            slope = np.polyfit(np.arange(len(series.totals)), series.totals, 1)[0] if len(series.totals) > 1 else 0.0
+            trends[name] = {
+                "buckets": series.buckets,
+                "totals": series.totals,
+                "moving_average": moving_average(series.totals, window),
+                "last_change": float(change[-1]) if len(change) else 0.0,
+                "last_change_pct": float(percent[-1]) if len(percent) and not np.isnan(percent[-1]) else None,
+                "slope": float(slope),
+            }
+        return trends
+
+    def generate_report(self, user_id: int, time_frame: str = "month", ts: Optional[int] = None) -> dict:
+        """Totals for the ``time_frame`` bucket containing ``ts`` compared with the bucket before it."""
+        ts = int(time.time()) if ts is None else int(ts)
+        start = int(bucket_starts(np.array([ts]), time_frame)[0])
+        previous = int(bucket_starts(np.array([start - 1]), time_frame)[0])
+        comparison = self.compare_periods(user_id, (previous, start), (start, ts + 1))
+        current = {name: values["period2"] for name, values in comparison.items()}
+        return {
+            "user_id": user_id,
+            "time_frame": time_frame,
+            "start": start,
+            "total_electricity": current.get("electricity", 0.0),
+            "total_gas": current.get("gas", 0.0),
+            "total_water": current.get("water", 0.0),
+            "breakdown": current,
+            "comparison": comparison,
+            "generated_at": datetime.now().isoformat(timespec="seconds"),
+        }
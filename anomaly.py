@@ -0,0 +1,180 @@
+"""Incremental anomaly detection on newly written readings.
+
+``reading_stats`` keeps a compact running baseline per user and resource: a
+streaming median estimate (``center``) and an exponentially weighted mean
+absolute deviation (``spread``). :func:`observe` scores each new reading
+against it with a robust z-score and updates it in O(1), inside the same
+transaction as the insert, so history is never rescanned. Readings scoring
+above ``Z_THRESHOLD`` are stored in ``anomalies`` for the home screen.
+
+:func:`refit` is the optional batch pass: it rebuilds the baselines from the
+full history with NumPy and re-flags historical outliers, using
+scikit-learn's IsolationForest when it is installed. Both are imported only
+when a re-fit runs.
+
+    python anomaly.py [--user ID]
+"""
+import argparse
+import sqlite3
+from typing import Iterable, List, Tuple
+
+# Robust z-score above which a reading is flagged
+Z_THRESHOLD = 3.5
+# Readings needed before a baseline is trusted
+MIN_OBSERVATIONS = 12
+# Weight of each new reading in the running spread
+ALPHA = 0.05
+# Mean absolute deviation -> standard deviation for normally distributed data
+MAD_TO_SIGMA = 1.2533
+EPSILON = 1e-9
+
+
+def robust_z(value: float, center: float, spread: float) -> float:
+    return (value - center) / (MAD_TO_SIGMA * spread + EPSILON)
+
+
+def update_baseline(n: int, center: float, spread: float, value: float) -> Tuple[int, float, float]:
+    """Fold one value into the running baseline."""
+    if n == 0:
+        return 1, value, 0.0
+    # Clip the value's pull so one outlier cannot drag the baseline with it
+    limit = Z_THRESHOLD * MAD_TO_SIGMA * spread
+    deviation = value - center
+    if n >= MIN_OBSERVATIONS:
+        deviation = max(-limit, min(limit, deviation))
+    rate = max(ALPHA, 1.0 / (n + 1))
+    spread += rate * (abs(deviation) - spread)
+    # Stochastic median: step towards the value by a fraction of the spread
+    step = rate * (spread if spread > 0 else abs(deviation))
+    center += step if deviation > 0 else -step if deviation < 0 else 0.0
+    return n + 1, center, spread
+
+
+def observe(conn: sqlite3.Connection, rows: Iterable[Tuple[int, int, int, int, float]]) -> int:
+    """Score freshly inserted ``(reading_id, user_id, resource_id, ts, value)`` rows.
+
+    Runs inside the insert's transaction. Returns the number of anomalies flagged.
+    """
+    stats = {}
+    flagged = []
+    for reading_id, user_id, resource_id, ts, value in rows:
+        key = (user_id, resource_id)
+        if key not in stats:
+            found = conn.execute("SELECT n, center, spread FROM reading_stats WHERE user_id=? AND resource_id=?",
+                                 key).fetchone()
+            stats[key] = found or (0, 0.0, 0.0)
+        n, center, spread = stats[key]
+        if n >= MIN_OBSERVATIONS:
+            score = robust_z(value, center, spread)
+            if abs(score) > Z_THRESHOLD:
+                flagged.append((user_id, resource_id, reading_id, ts, value, score, "streaming"))
+        stats[key] = update_baseline(n, center, spread, value)
+
+    conn.executemany('''
+        INSERT INTO reading_stats (user_id, resource_id, n, center, spread) VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (user_id, resource_id) DO UPDATE SET n = excluded.n, center = excluded.center,
+            spread = excluded.spread
+    ''', [key + values for key, values in stats.items()])
+    conn.executemany('''
+        INSERT INTO anomalies (user_id, resource_id, reading_id, ts, value, score, detector)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', flagged)
+    return len(flagged)
+
+
+def recent_anomalies(conn: sqlite3.Connection, user_id: int, since: int, limit: int = 3) -> List[tuple]:
+    """Undismissed ``(id, resource, unit, ts, value, score)`` rows, newest first."""
+    return conn.execute('''
+        SELECT a.id, r.name, r.unit, a.ts, a.value, a.score
+        FROM anomalies a JOIN resources r ON r.id = a.resource_id
+        WHERE a.user_id=? AND a.dismissed=0 AND a.ts >= ?
+        ORDER BY a.ts DESC LIMIT ?
+    ''', (user_id, since, limit)).fetchall()
+
+
+def dismiss(conn: sqlite3.Connection, user_id: int, anomaly_ids: Iterable[int]) -> int:
+    """Dismiss the user's own alerts among ``anomaly_ids``; returns how many changed."""
+    return conn.executemany("UPDATE anomalies SET dismissed=1 WHERE id=? AND user_id=? AND dismissed=0",
+                            [(i, user_id) for i in anomaly_ids]).rowcount
+
+
+# 🔁 Batch re-fit
+
+def _isolation_forest():
+    try:
+        from sklearn.ensemble import IsolationForest
+    except ImportError:
+        return None
+    return IsolationForest
+
+
+def _history_outliers(ts, values, center: float, sigma: float):
+    """Boolean mask of outliers among one resource's history."""
+    import numpy as np
+
+    IsolationForest = _isolation_forest()
+    if IsolationForest is not None and len(values) >= 64:
+        hours = (ts // 3600) % 24
+        weekdays = (ts // 86400 + 3) % 7
+        features = np.column_stack([values, hours, weekdays])
+        model = IsolationForest(n_estimators=100, contamination="auto", random_state=0)
+        return model.fit_predict(features) == -1
+    return np.abs(values - center) / (sigma + EPSILON) > Z_THRESHOLD
+
+
+def refit(conn: sqlite3.Connection, user_id: int) -> int:
+    """Rebuild ``user_id``'s baselines from history and re-flag outliers; returns anomalies flagged.
+
+    Call inside a write transaction.
+    """
+    import numpy as np
+
+    detector = "isolation_forest" if _isolation_forest() is not None else "batch_mad"
+    conn.execute("DELETE FROM anomalies WHERE user_id=? AND detector != 'streaming' AND dismissed=0", (user_id,))
+    flagged = 0
+    resource_ids = [row[0] for row in conn.execute(
+        "SELECT DISTINCT resource_id FROM reading_stats WHERE user_id=?", (user_id,))]
+    for resource_id in resource_ids:
+        rows = conn.execute("SELECT id, ts, value FROM readings WHERE user_id=? AND resource_id=? ORDER BY ts",
+                            (user_id, resource_id)).fetchall()
+        if not rows:
+            continue
+        table = np.array(rows, dtype=np.float64)
+        ids, ts, values = table[:, 0].astype(np.int64), table[:, 1].astype(np.int64), table[:, 2]
+        center = float(np.median(values))
+        mad = float(np.median(np.abs(values - center)))
+        sigma = 1.4826 * mad
+        conn.execute("UPDATE reading_stats SET n=?, center=?, spread=? WHERE user_id=? AND resource_id=?",
+                     (len(values), center, sigma / MAD_TO_SIGMA, user_id, resource_id))
+        if len(values) < MIN_OBSERVATIONS:
+            continue
+        outliers = _history_outliers(ts, values, center, sigma)
+        scores = (values - center) / (sigma + EPSILON)
+        cursor = conn.executemany('''
+            INSERT INTO anomalies (user_id, resource_id, reading_id, ts, value, score, detector)
+            SELECT ?, ?, ?, ?, ?, ?, ?
+            WHERE NOT EXISTS (SELECT 1 FROM anomalies WHERE reading_id = ?)
+        ''', [(user_id, resource_id, int(i), int(t), float(v), float(s), detector, int(i))
+              for i, t, v, s in zip(ids[outliers], ts[outliers], values[outliers], scores[outliers])])
+        flagged += cursor.rowcount
+    return flagged
+
+
+def main():
+    from database import get_database
+
+    parser = argparse.ArgumentParser(description="Re-fit anomaly baselines from full history.")
+    parser.add_argument("--user", type=int, help="only this user (default: everyone)")
+    args = parser.parse_args()
+
+    db = get_database()
+    user_ids = [args.user] if args.user else [row[0] for row in db.conn.execute("SELECT id FROM users")]
+    for user_id in user_ids:
+        with db.transaction() as conn:
+            flagged = refit(conn, user_id)
+            db.touch(user_id)
+        print(f"user {user_id}: {flagged} outliers in history")
+
+
+if __name__ == "__main__":
+    main()
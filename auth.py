@@ -0,0 +1,89 @@
+"""Salted password hashing for login and registration.
+
+Passwords are stored as ``scrypt$<n>$<r>$<p>$<salt>$<hash>`` (or
+``pbkdf2_sha256$<iterations>$<salt>$<hash>`` where OpenSSL lacks scrypt), so
+each user's cost travels with their hash and can be raised without a
+migration. Plaintext rows from older versions still verify and are re-hashed
+by the caller when :func:`needs_rehash` says so.
+
+Hashing is deliberately slow; call these from the database worker, never
+from the Kivy UI thread.
+"""
+import hashlib
+import hmac
+import os
+
+# Cost of new hashes; tune with benchmarks/bench_auth.py against the login SLA
+SCRYPT_N = int(os.environ.get("ECOSTAR_SCRYPT_N", 2 ** 14))
+SCRYPT_R = 8
+SCRYPT_P = 1
+PBKDF2_ITERATIONS = int(os.environ.get("ECOSTAR_PBKDF2_ITERATIONS", 600000))
+SALT_BYTES = 16
+
+HAS_SCRYPT = hasattr(hashlib, "scrypt")
+
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r + 1024 * 1024, dklen=32)
+
+
+def _pbkdf2(password: str, salt: bytes, iterations: int) -> bytes:
+    return hashlib.pbkdf2_hmac("sha256", password.encode(), salt, iterations)
+
+
+def hash_password(password: str, n: int = SCRYPT_N, iterations: int = PBKDF2_ITERATIONS) -> str:
+    salt = os.urandom(SALT_BYTES)
+    if HAS_SCRYPT:
+        key = _scrypt(password, salt, n, SCRYPT_R, SCRYPT_P)
+        return f"scrypt${n}${SCRYPT_R}${SCRYPT_P}${salt.hex()}${key.hex()}"
+    return f"pbkdf2_sha256${iterations}${salt.hex()}${_pbkdf2(password, salt, iterations).hex()}"
+
+
+def _parse(stored: str):
+    parts = stored.split("$")
+    if parts[0] == "scrypt" and len(parts) == 6:
+        return parts[0], [int(value) for value in parts[1:4]], bytes.fromhex(parts[4]), bytes.fromhex(parts[5])
+    if parts[0] == "pbkdf2_sha256" and len(parts) == 4:
+        return parts[0], [int(parts[1])], bytes.fromhex(parts[2]), bytes.fromhex(parts[3])
+    return None
+
+
+def verify_password(password: str, stored: str) -> bool:
+    try:
+        parsed = _parse(stored)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        # Legacy plaintext row
+        return hmac.compare_digest(password.encode(), stored.encode())
+    algorithm, cost, salt, expected = parsed
+    if algorithm == "scrypt":
+        key = _scrypt(password, salt, *cost)
+    else:
+        key = _pbkdf2(password, salt, *cost)
+    return hmac.compare_digest(key, expected)
+
+
+def needs_rehash(stored: str) -> bool:
+    """True for plaintext rows and hashes weaker than the current settings."""
+    try:
+        parsed = _parse(stored)
+    except ValueError:
+        return True
+    if parsed is None:
+        return True
+    algorithm, cost, _salt, _key = parsed
+    if HAS_SCRYPT:
+        return algorithm != "scrypt" or cost[0] < SCRYPT_N
+    return cost[0] < PBKDF2_ITERATIONS
+
+
+# Verified against when the username does not exist, so misses cost as much as hits
+_DUMMY_HASH = None
+
+
+def dummy_verify(password: str) -> None:
+    global _DUMMY_HASH
+    if _DUMMY_HASH is None:
+        _DUMMY_HASH = hash_password("not a real password")
+    verify_password(password, _DUMMY_HASH)
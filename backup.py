@@ -0,0 +1,268 @@
+"""Online backups of the app database through the SQLite backup API.
+
+A backup copies ``PAGES_PER_STEP`` pages at a time, pausing between steps,
+on its own thread and connection, so the UI and the database worker carry
+on while it runs. The source connection holds one read transaction for the
+whole copy: in WAL mode that snapshot never blocks writers, and because the
+snapshot cannot change under it the backup never has to restart, however
+busy saves from the app or a bulk import keep the database. (Without the
+held snapshot every commit from another connection restarts a stepped
+backup from page one.)
+
+Snapshots are written next to the database in ``backups/`` as
+``<name>-YYYYmmdd-HHMMSS.db`` (with ``-2``, ``-3``... for more in the same
+second) and only the newest ``KEEP`` are kept.
+:func:`restore_backup` copies a checked snapshot back into the live
+database through the same API, migrates it to the current schema and gives
+it a new sync device id.
+
+    python backup.py                 # take a snapshot now
+    python backup.py --list
+    python backup.py --restore backups/ecostar_pro-20240131-020000.db
+"""
+import argparse
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, List, Optional
+
+from cache import bump_version
+from database import Database, get_database
+from migrations import migrate
+from sync import rebase_after_restore
+
+# Snapshots kept after each backup
+KEEP = int(os.environ.get("ECOSTAR_BACKUP_KEEP", 7))
+# Pages copied per step (4 KB each) and the pause after each, which leaves writers room
+PAGES_PER_STEP = 256
+STEP_PAUSE = 0.001
+# Age after which the app takes a fresh snapshot on start
+MAX_AGE = 86400
+
+STAMP = "%Y%m%d-%H%M%S"
+# The stamp, then a counter from the second snapshot within the same second on
+SNAPSHOT_NAME = re.compile(r"^(\d{8}-\d{6})(?:-(\d+))?$")
+
+BackupInfo = namedtuple("BackupInfo", "path created size")
+
+
+class BackupError(RuntimeError):
+    pass
+
+
+def backup_dir(db: Database) -> str:
+    return os.environ.get("ECOSTAR_BACKUP_DIR") or os.path.join(os.path.dirname(os.path.abspath(db.path)),
+                                                                 "backups")
+
+
+def _prefix(db: Database) -> str:
+    return os.path.splitext(os.path.basename(db.path))[0] + "-"
+
+
+def list_backups(db: Optional[Database] = None, directory: Optional[str] = None) -> List[BackupInfo]:
+    """Snapshots of ``db``, newest first."""
+    db = db or get_database()
+    directory = directory or backup_dir(db)
+    prefix = _prefix(db)
+    backups = []
+    if not os.path.isdir(directory):
+        return backups
+    for name in os.listdir(directory):
+        if not (name.startswith(prefix) and name.endswith(".db")):
+            continue
+        match = SNAPSHOT_NAME.match(name[len(prefix):-3])
+        try:
+            created = datetime.strptime(match.group(1), STAMP) if match else None
+        except ValueError:
+            created = None
+        if created is None:
+            continue
+        path = os.path.join(directory, name)
+        try:
+            backups.append((int(match.group(2) or 1), BackupInfo(path, created, os.path.getsize(path))))
+        except FileNotFoundError:
+            continue  # pruned meanwhile
+    # Snapshots taken within the same second are numbered in order
+    return [info for _seq, info in sorted(backups, key=lambda item: (item[1].created, item[0]), reverse=True)]
+
+
+def prune(db: Optional[Database] = None, directory: Optional[str] = None, keep: int = KEEP) -> List[str]:
+    """Delete all but the newest ``keep`` snapshots and return the removed paths."""
+    removed = []
+    for info in list_backups(db, directory)[max(keep, 1):]:
+        os.remove(info.path)
+        removed.append(info.path)
+    return removed
+
+
+# 💾 Backup
+
+def _publish(partial: str, directory: str, prefix: str, stamp: str) -> str:
+    """Move a finished snapshot to ``<prefix><stamp>[-N].db``, numbered after any taken the same second."""
+    seqs = [SNAPSHOT_NAME.match(name[len(prefix):-3]) for name in os.listdir(directory)
+            if name.startswith(prefix + stamp) and name.endswith(".db")]
+    # Past the highest number, so the newest snapshot still sorts last once older ones are pruned
+    seq = max((int(match.group(2) or 1) for match in seqs if match), default=0) + 1
+    while True:
+        path = os.path.join(directory, prefix + stamp + (f"-{seq}" if seq > 1 else "") + ".db")
+        try:
+            # A hard link fails if the name is taken, unlike a rename
+            os.link(partial, path)
+        except FileExistsError:
+            seq += 1
+            continue
+        os.remove(partial)
+        return path
+
+
+def create_backup(db: Optional[Database] = None, directory: Optional[str] = None, keep: int = KEEP,
+                  pages: int = PAGES_PER_STEP, pause: float = STEP_PAUSE,
+                  progress: Optional[Callable[[float], None]] = None) -> BackupInfo:
+    """Snapshot the live database; ``progress(fraction_copied)`` is called from the backing-up thread."""
+    db = db or get_database()
+    directory = directory or backup_dir(db)
+    os.makedirs(directory, exist_ok=True)
+    created = datetime.now().replace(microsecond=0)
+    prefix, stamp = _prefix(db), created.strftime(STAMP)
+    partial = os.path.join(directory, f"{prefix}{stamp}-{os.getpid()}-{threading.get_ident()}.part")
+
+    def step(status, remaining, total):
+        if progress:
+            progress(1 - remaining / total if total else 1.0)
+        time.sleep(pause)
+
+    source = sqlite3.connect(db.path, isolation_level=None)
+    target = sqlite3.connect(partial)
+    try:
+        # Pin one snapshot for the whole copy; see the module docstring
+        source.execute("BEGIN")
+        source.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchall()
+        source.backup(target, pages=pages, progress=step)
+        source.execute("COMMIT")
+        # A rollback-journal snapshot is one self-contained file, with no -wal/-shm beside it
+        target.execute("PRAGMA journal_mode=DELETE")
+        target.close()
+        path = _publish(partial, directory, prefix, stamp)
+    except BaseException:
+        target.close()
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+    finally:
+        source.close()
+    prune(db, directory, keep)
+    return BackupInfo(path, created, os.path.getsize(path))
+
+
+_running = threading.Lock()
+
+
+def backup_in_background(db: Optional[Database] = None,
+                         on_done: Optional[Callable[[Optional[BackupInfo], Optional[BaseException]], None]] = None,
+                         progress: Optional[Callable[[float], None]] = None, max_age: Optional[int] = None) -> bool:
+    """Start a backup thread unless one is running, or the newest snapshot is younger than ``max_age``.
+
+    ``on_done(info, error)`` is called from that thread. Returns whether a backup was started.
+    """
+    db = db or get_database()
+    if max_age is not None:
+        latest = list_backups(db)[:1]
+        if latest and (datetime.now() - latest[0].created).total_seconds() < max_age:
+            return False
+    if not _running.acquire(blocking=False):
+        return False
+
+    def run():
+        try:
+            info = create_backup(db, progress=progress)
+        except Exception as exc:
+            if on_done:
+                on_done(None, exc)
+        else:
+            if on_done:
+                on_done(info, None)
+        finally:
+            _running.release()
+
+    threading.Thread(target=run, name="ecostar-backup", daemon=True).start()
+    return True
+
+
+# ♻️ Restore
+
+def check_backup(path: str) -> None:
+    """Raise :class:`BackupError` unless ``path`` is an intact EcoStar database."""
+    try:
+        conn = sqlite3.connect(Path(path).resolve().as_uri() + "?mode=ro", uri=True)
+    except sqlite3.Error as exc:
+        raise BackupError(f"Cannot open {path}: {exc}") from None
+    try:
+        if conn.execute("PRAGMA quick_check").fetchone()[0] != "ok":
+            raise BackupError(f"{path} is damaged")
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='users'").fetchone() is None:
+            raise BackupError(f"{path} is not an EcoStar database")
+    except sqlite3.DatabaseError as exc:
+        raise BackupError(f"{path} is not a database: {exc}") from None
+    finally:
+        conn.close()
+
+
+def restore_backup(path: str, db: Optional[Database] = None) -> None:
+    """Replace the live database's contents with the snapshot at ``path``.
+
+    Other connections stay open and see the restored data on their next
+    query; in-memory caches are invalidated for every user in either copy.
+    """
+    db = db or get_database()
+    check_backup(path)
+    user_ids = {row[0] for row in db.conn.execute("SELECT id FROM users")}
+    # The identity this install has synced under, which the snapshot may predate
+    device = db.conn.execute("SELECT value FROM sync_state WHERE key='device_id'").fetchone()[0]
+    source = sqlite3.connect(Path(path).resolve().as_uri() + "?mode=ro", uri=True)
+    target = sqlite3.connect(db.path, isolation_level=None, timeout=30)
+    try:
+        # One step: writers wait for the restore instead of interleaving with it
+        source.backup(target)
+        migrate(target)
+        rebase_after_restore(target, device)
+        user_ids.update(row[0] for row in target.execute("SELECT id FROM users"))
+    finally:
+        source.close()
+        target.close()
+    # The restored copy may know other resources, or the same ones under other ids
+    db.forget_resources()
+    for user_id in user_ids:
+        bump_version(user_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Back up or restore the EcoStar database.")
+    parser.add_argument("--list", action="store_true", help="list snapshots, newest first")
+    parser.add_argument("--restore", metavar="PATH", help="restore this snapshot into the live database")
+    parser.add_argument("--keep", type=int, default=KEEP, help="snapshots to keep")
+    args = parser.parse_args()
+
+    if args.list:
+        for info in list_backups():
+            print(f"{info.created:%Y-%m-%d %H:%M:%S}  {info.size / 2 ** 20:8.1f} MB  {info.path}")
+        return
+    if args.restore:
+        try:
+            restore_backup(args.restore)
+        except BackupError as exc:
+            parser.error(str(exc))
+        print(f"Restored {args.restore}")
+        return
+
+    started = time.perf_counter()
+    info = create_backup(keep=args.keep, progress=lambda fraction: print(f"\r{fraction:6.1%}", end=""))
+    print(f"\nWrote {info.path} ({info.size / 2 ** 20:.1f} MB) in {time.perf_counter() - started:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
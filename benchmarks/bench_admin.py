@@ -0,0 +1,79 @@
+"""Admin console search times on a large user base.
+
+Fills a scratch database with ``--users`` synthetic accounts and times
+admin.search_page (one page of matches plus their status) for typical
+queries, on the first page and on a page deep into the results. Each query
+is compared with a plain LIKE scan over username, name and email.
+
+    python benchmarks/bench_admin.py --users 100000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from admin import search_page, search_users  # noqa: E402
+from database import Database  # noqa: E402
+
+FIRST = ("john", "jane", "alex", "maria", "wei", "fatima", "li", "omar", "sara", "raj", "anna", "juan", "olga",
+         "yuki", "kunal", "vijay")
+LAST = ("smith", "garcia", "chen", "khan", "patel", "muller", "rossi", "silva", "kim", "nowak", "gangani", "amrute")
+DOMAINS = ("example.com", "mail.org", "ecostar.io", "uni.edu")
+
+QUERIES = ("", "j", "jo", "john", "john smi", "kunal gangani", "ecostar.io", "nobody")
+
+
+def fill(db, users, seed=5):
+    rng = random.Random(seed)
+    rows = []
+    for i in range(users):
+        first, last = rng.choice(FIRST), rng.choice(LAST)
+        rows.append((f"{first}{last[:3]}{i}", "-", f"{first.title()} {last.title()}",
+                     f"{first}.{last}{i}@{rng.choice(DOMAINS)}"))
+    with db.transaction() as conn:
+        conn.executemany("INSERT INTO users (username, password, name, email) VALUES (?, ?, ?, ?)", rows)
+
+
+def median_ms(fn, repeats):
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+
+def like_scan(db, text):
+    pattern = f"%{text}%"
+    return db.conn.execute("SELECT id FROM users WHERE username LIKE ? OR name LIKE ? OR email LIKE ? "
+                           "ORDER BY id LIMIT 50", (pattern, pattern, pattern)).fetchall()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "bench.db"))
+        started = time.perf_counter()
+        fill(db, args.users)
+        print(f"{args.users:,} users in {time.perf_counter() - started:.1f} s")
+        print(f"{'query':<16}{'first page':>12}{'deep page':>12}{'LIKE scan':>12}")
+        for text in QUERIES:
+            first = median_ms(lambda: search_page(db, text), args.repeats)
+            # Start halfway through the ids, as if the admin had scrolled far down
+            deep = median_ms(lambda: search_users(db, text, after=args.users // 2), args.repeats)
+            like = median_ms(lambda: like_scan(db, text), max(3, args.repeats // 5))
+            print(f"{text or '(all)':<16}{first:>10.2f}ms{deep:>10.2f}ms{like:>10.2f}ms")
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
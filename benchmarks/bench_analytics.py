@@ -0,0 +1,115 @@
+"""Vectorized analytics vs. the equivalent row-by-row Python loops.
+
+Generates a multi-year, multi-resource history for one user in a scratch
+database, then times the same work both ways: day/week/month totals per
+resource, 7-bucket moving averages and a month-over-month comparison.
+
+    python benchmarks/bench_analytics.py --years 3 --interval 900
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics import Analysis, load_readings, moving_average  # noqa: E402
+from database import Database  # noqa: E402
+
+
+def fill(db, years, interval, seed=3):
+    rng = random.Random(seed)
+    db.register_user("bench", "bench", "Bench", "bench@example.com")
+    user_id = db.get_user_id("bench", "bench")
+    resources = list(db.resources())
+    end = int(time.time())
+    start = end - years * 365 * 86400
+    db.add_readings((user_id, resource, rng.random(), ts)
+                    for ts in range(start, end, interval) for resource in resources)
+    return user_id, start, end
+
+
+# 🐢 Row-by-row reference implementation
+def loop_bucket(ts, period):
+    day = datetime.fromtimestamp(ts).replace(hour=0, minute=0, second=0, microsecond=0)
+    if period == "week":
+        day -= timedelta(days=day.weekday())
+    elif period == "month":
+        day = day.replace(day=1)
+    return int(day.timestamp())
+
+
+def loop_analysis(db, user_id, month_start, previous_start, now):
+    rows = db.conn.execute("SELECT resource_id, ts, value FROM readings WHERE user_id=?", (user_id,)).fetchall()
+    series = {}
+    for period in ("day", "week", "month"):
+        totals = defaultdict(lambda: defaultdict(float))
+        for resource_id, ts, value in rows:
+            totals[resource_id][loop_bucket(ts, period)] += value
+        for resource_id, buckets in totals.items():
+            ordered = [buckets[key] for key in sorted(buckets)]
+            averages = []
+            for i in range(len(ordered)):
+                window = ordered[max(0, i - 6):i + 1]
+                averages.append(sum(window) / len(window))
+            series[(period, resource_id)] = (ordered, averages)
+    comparison = defaultdict(lambda: [0.0, 0.0])
+    for resource_id, ts, value in rows:
+        if previous_start <= ts < month_start:
+            comparison[resource_id][0] += value
+        elif month_start <= ts <= now:
+            comparison[resource_id][1] += value
+    return series, comparison
+
+
+# 🚀 Vectorized
+def vector_analysis(db, user_id, month_start, previous_start, now):
+    analysis = Analysis(db)
+    data = load_readings(db, user_id)
+    series = {}
+    for period in ("day", "week", "month"):
+        for name, part in analysis.period_series(user_id, period, data).items():
+            series[(period, name)] = (part.totals, moving_average(part.totals, 7))
+    comparison = analysis.compare_periods(user_id, (previous_start, month_start), (month_start, now + 1))
+    return series, comparison
+
+
+def best_of(repeats, fn, *args):
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn(*args)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--interval", type=int, default=900, help="seconds between readings")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "bench.db"))
+        user_id, _start, now = fill(db, args.years, args.interval)
+        rows = db.conn.execute("SELECT COUNT(*) FROM readings").fetchone()[0]
+        month_start = loop_bucket(now, "month")
+        previous_start = loop_bucket(month_start - 1, "month")
+        work = (db, user_id, month_start, previous_start, now)
+
+        loops = best_of(args.repeats, loop_analysis, *work)
+        vector = best_of(args.repeats, vector_analysis, *work)
+        db.close()
+
+    print(f"{rows:,} readings over {args.years} years")
+    print(f"python loops: {loops * 1000:9.1f} ms")
+    print(f"numpy:        {vector * 1000:9.1f} ms   ({loops / vector:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Password verify latency at each hashing cost level.
+
+Times ``auth.verify_password`` for scrypt at a range of ``n`` values and for
+PBKDF2-SHA256 at a range of iteration counts, and marks which levels fit
+the login SLA. The current defaults are starred; raise them with
+``ECOSTAR_SCRYPT_N`` / ``ECOSTAR_PBKDF2_ITERATIONS``.
+
+    python benchmarks/bench_auth.py --sla-ms 250
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import auth  # noqa: E402
+
+SCRYPT_LEVELS = [2 ** power for power in range(12, 19)]
+PBKDF2_LEVELS = [100000, 200000, 400000, 600000, 1000000]
+PASSWORD = "correct horse battery staple"
+
+
+def median_verify(stored, repeats):
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        auth.verify_password(PASSWORD, stored)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def report(name, cost, current, seconds, sla):
+    mark = "*" if cost == current else " "
+    verdict = "ok" if seconds * 1000 <= sla else "over SLA"
+    print(f"{name:<14}{mark}{cost:>9,}   {seconds * 1000:8.1f} ms   {verdict}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sla-ms", type=float, default=250, help="login latency budget for one verify")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'algorithm':<15}{'cost':>9}   {'verify':>11}")
+    if auth.HAS_SCRYPT:
+        for n in SCRYPT_LEVELS:
+            stored = auth.hash_password(PASSWORD, n=n)
+            report("scrypt n", n, auth.SCRYPT_N, median_verify(stored, args.repeats), args.sla_ms)
+    for iterations in PBKDF2_LEVELS:
+        salt = os.urandom(auth.SALT_BYTES)
+        stored = f"pbkdf2_sha256${iterations}${salt.hex()}${auth._pbkdf2(PASSWORD, salt, iterations).hex()}"
+        report("pbkdf2 iter", iterations, auth.PBKDF2_ITERATIONS, median_verify(stored, args.repeats), args.sla_ms)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Chart series load times on multi-year, minute-resolution data.
+
+Fills a scratch database with one reading a minute per resource and times
+charts.load_charts for spans from a day to the whole history. Each span
+is compared with fetching the raw rows the old way, and the report shows
+how many points reach the canvas.
+
+    python benchmarks/bench_charts.py --years 3 --resources 2
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from charts import load_charts  # noqa: E402
+from database import Database  # noqa: E402
+
+SPANS = (("day", 86400), ("week", 7 * 86400), ("month", 30 * 86400), ("year", 365 * 86400))
+
+
+def fill(db, years, resources, seed=11):
+    rng = random.Random(seed)
+    db.register_user("bench", "bench", "Bench", "bench@example.com")
+    user_id = db.get_user_id("bench", "bench")
+    names = list(db.resources())[:resources]
+    end = int(time.time()) // 60 * 60
+    start = end - years * 365 * 86400
+    db.add_readings((user_id, name, rng.random(), ts) for ts in range(start, end, 60) for name in names)
+    return user_id, names, start, end
+
+
+def timed(fn, *args, **kwargs):
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--resources", type=int, default=2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "bench.db"))
+        user_id, names, start, end = fill(db, args.years, args.resources)
+        rows = db.conn.execute("SELECT COUNT(*) FROM readings").fetchone()[0]
+        print(f"{rows:,} readings, {len(names)} resources over {args.years} years")
+        print(f"{'span':<8}{'raw rows':>12}{'raw fetch':>12}{'charts':>10}{'points':>9}  method")
+        for label, seconds in SPANS + (("all", end - start),):
+            raw, raw_time = timed(lambda: [db.get_readings(user_id, name, end - seconds, end) for name in names])
+            charts, chart_time = timed(load_charts, db, user_id, end - seconds, end, names)
+            points = sum(len(series.ts) for series in charts.values())
+            methods = ",".join(sorted({series.method for series in charts.values()}))
+            print(f"{label:<8}{sum(map(len, raw)):>12,}{raw_time * 1000:>10.0f}ms{chart_time * 1000:>8.0f}ms"
+                  f"{points:>9,}  {methods}")
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
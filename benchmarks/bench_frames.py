@@ -0,0 +1,111 @@
+"""Frame times while heavy queries run, on the UI thread vs the database worker.
+
+Fills a scratch database, keeps an animation running and issues the same
+full-scan aggregate repeatedly: first synchronously inside Clock callbacks
+(the old behaviour), then through db_worker.run_in_background. Reports the
+frame-time distribution and how many frames missed the 60 fps budget.
+
+    python benchmarks/bench_frames.py --rows 300000 --seconds 5
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("KIVY_NO_CONSOLELOG", "1")
+os.environ.setdefault("KIVY_NO_ARGS", "1")
+
+FRAME_BUDGET = 1 / 60.0
+HEAVY_QUERY = "SELECT resource_id, ts % 97, SUM(value * 1.0001) FROM readings GROUP BY 1, 2"
+
+
+def fill(db, rows, seed=7):
+    rng = random.Random(seed)
+    db.register_user("bench", "bench", "Bench", "bench@example.com")
+    user_id = db.get_user_id("bench", "bench")
+    start = int(time.time()) - rows * 60
+    resources = list(db.resources())
+    db.add_readings((user_id, resources[i % len(resources)], rng.random(), start + i * 60) for i in range(rows))
+
+
+def summarize(name, frames):
+    frames = sorted(frames)
+    dropped = sum(1 for dt in frames if dt > FRAME_BUDGET * 1.5)
+    p99 = frames[int(len(frames) * 0.99) - 1] if frames else 0
+    print(f"{name:<12} frames={len(frames):5d}  median={statistics.median(frames) * 1000:6.1f} ms  "
+          f"p99={p99 * 1000:7.1f} ms  max={frames[-1] * 1000:7.1f} ms  dropped={dropped}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=300000)
+    parser.add_argument("--seconds", type=float, default=5.0, help="length of each phase")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    import database
+    database.DB_PATH = os.path.join(tmp, "bench.db")
+    db = database.get_database()
+    fill(db, args.rows)
+
+    from kivy.animation import Animation
+    from kivy.app import App
+    from kivy.clock import Clock
+    from kivy.uix.label import Label
+    from db_worker import get_worker, run_in_background
+
+    frames = {"ui thread": [], "worker": []}
+    state = {"phase": None, "pending": False}
+
+    def heavy_query():
+        return database.get_database().conn.execute(HEAVY_QUERY).fetchall()
+
+    def record(dt):
+        if state["phase"] and not state.pop("switched", False):
+            frames[state["phase"]].append(dt)
+
+    def tick(dt):
+        if state["phase"] == "ui thread":
+            heavy_query()
+        elif state["phase"] == "worker" and not state["pending"]:
+            state["pending"] = True
+            run_in_background(heavy_query, on_result=lambda rows: state.update(pending=False))
+
+    def set_phase(phase):
+        # The frame that switches phase still carries the previous phase's work
+        state.update(phase=phase, switched=True)
+
+    class FrameBenchApp(App):
+        def build(self):
+            label = Label(text="EcoStar Pro", font_size=40)
+            anim = Animation(font_size=60, d=0.5) + Animation(font_size=40, d=0.5)
+            anim.repeat = True
+            anim.start(label)
+            return label
+
+        def on_start(self):
+            Clock.schedule_interval(record, 0)
+            Clock.schedule_interval(tick, 0.1)
+            Clock.schedule_once(lambda dt: set_phase("ui thread"), 0.5)
+            Clock.schedule_once(lambda dt: set_phase("worker"), 0.5 + args.seconds)
+            Clock.schedule_once(lambda dt: self.stop(), 0.5 + 2 * args.seconds)
+
+        def on_stop(self):
+            get_worker().stop()
+
+    FrameBenchApp().run()
+    started = time.perf_counter()
+    heavy_query()
+    print(f"heavy query: {(time.perf_counter() - started) * 1000:.1f} ms over {args.rows:,} rows")
+    for name, values in frames.items():
+        summarize(name, values)
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
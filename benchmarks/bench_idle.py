@@ -0,0 +1,108 @@
+"""Idle CPU of the login/register background animation.
+
+Runs one app window through four phases of equal length and reports the
+process CPU time each used, as a share of one core:
+
+* static: no animation at all, the floor set by Kivy's own main loop
+* legacy: the old per-widget gradient, one 20 Hz Python callback for the
+  login page and one for the register page kept alive off-screen
+* shared: the widgets.AnimatedGradient on screen, one shared Animation
+* minimized: the same with the window minimized, which pauses it
+
+    python benchmarks/bench_idle.py --seconds 10
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("KIVY_NO_CONSOLELOG", "1")
+os.environ.setdefault("KIVY_NO_ARGS", "1")
+
+PHASES = ("static", "legacy", "shared", "minimized")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=10.0, help="length of each phase")
+    args = parser.parse_args()
+
+    from kivy.app import App
+    from kivy.clock import Clock
+    from kivy.core.window import Window
+    from kivy.graphics import Color, Rectangle
+    from kivy.uix.relativelayout import RelativeLayout
+
+    from widgets import AnimatedGradient
+
+    # 🐢 The gradient as it was, with its callback running for the life of the widget
+    class LegacyGradient(RelativeLayout):
+        def __init__(self, **kwargs):
+            super().__init__(**kwargs)
+            with self.canvas:
+                self.color_instruction = Color(0.0, 0.25, 0.1, 1)
+                self.rect = Rectangle(pos=self.pos, size=self.size)
+            self.bind(pos=self.update_rect, size=self.update_rect)
+            self.step = 0
+            self.event = Clock.schedule_interval(self.animate, 0.05)
+
+        def update_rect(self, *args):
+            self.rect.pos = self.pos
+            self.rect.size = self.size
+
+        def animate(self, dt):
+            self.step += 0.005
+            offset = abs((self.step % 2) - 1)
+            self.color_instruction.rgba = (0.05 + 0.15 * offset, 0.4 + 0.4 * offset, 0.1 + 0.15 * offset, 1)
+
+    usage = {}
+    state = {"phase": None, "widgets": []}
+
+    def start_phase(root, phase):
+        for widget in state["widgets"]:
+            if isinstance(widget, LegacyGradient):
+                widget.event.cancel()
+            else:
+                widget.pause()
+        root.clear_widgets()
+        state["widgets"] = []
+        if phase == "legacy":
+            # The register page's copy kept ticking while the login page showed
+            state["widgets"] = [LegacyGradient(), LegacyGradient()]
+            root.add_widget(state["widgets"][0])
+        elif phase in ("shared", "minimized"):
+            gradient = AnimatedGradient(palette="login")
+            root.add_widget(gradient)
+            gradient.resume()
+            state["widgets"] = [gradient]
+            Window.dispatch("on_restore" if phase == "shared" else "on_minimize")
+        state.update(phase=phase, cpu=time.process_time(), wall=time.perf_counter())
+
+    def end_phase():
+        if state["phase"]:
+            usage[state["phase"]] = ((time.process_time() - state["cpu"])
+                                     / (time.perf_counter() - state["wall"]))
+
+    class IdleBenchApp(App):
+        def build(self):
+            return RelativeLayout()
+
+        def on_start(self):
+            for i, phase in enumerate(PHASES + (None,)):
+                Clock.schedule_once(lambda dt, phase=phase: self.next_phase(phase), 0.5 + i * args.seconds)
+
+        def next_phase(self, phase):
+            end_phase()
+            if phase is None:
+                self.stop()
+            else:
+                start_phase(self.root, phase)
+
+    IdleBenchApp().run()
+    for phase in PHASES:
+        print(f"{phase:<10} {usage[phase] * 100:6.1f}% of one core")
+
+
+if __name__ == "__main__":
+    main()
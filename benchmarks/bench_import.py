@@ -0,0 +1,62 @@
+"""Bulk import throughput on a generated smart-meter export.
+
+Writes a CSV of interval readings (default 1M rows) to a scratch directory,
+imports it into a fresh database and reports rows per second.
+
+    python benchmarks/bench_import.py --rows 1000000
+"""
+import argparse
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database  # noqa: E402
+from importer import import_file  # noqa: E402
+
+METERS = (("electricity", "Wh", 50, 900), ("water", "L", 0, 40), ("gas", "m3", 0, 0.3))
+
+
+def generate_csv(path, rows, seed=42):
+    rng = random.Random(seed)
+    start = int(time.time()) - rows * 60
+    with open(path, "w", newline="") as handle:
+        writer = csv.writer(handle)
+        writer.writerow(["timestamp", "resource", "value", "unit"])
+        for i in range(rows):
+            resource, unit, low, high = METERS[i % len(METERS)]
+            writer.writerow([start + (i // len(METERS)) * 900, resource, round(rng.uniform(low, high), 3), unit])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--batch-size", type=int, default=10000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        export = os.path.join(tmp, "export.csv")
+        started = time.perf_counter()
+        generate_csv(export, args.rows)
+        print(f"generated {args.rows:,} rows in {time.perf_counter() - started:.1f} s "
+              f"({os.path.getsize(export) / 1e6:.0f} MB)")
+
+        db = Database(os.path.join(tmp, "bench.db"))
+        db.register_user("bench", "bench", "Bench", "bench@example.com")
+        user_id = db.get_user_id("bench", "bench")
+
+        started = time.perf_counter()
+        result = import_file(export, user_id, db=db, batch_size=args.batch_size)
+        elapsed = time.perf_counter() - started
+        db.close()
+
+    print(f"imported {result.imported:,} rows (skipped {result.skipped}) in {elapsed:.1f} s")
+    print(f"throughput: {result.imported / elapsed:,.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Cold-start and page-switch latency, before and after the single-process app.
+
+Before: every page transition stopped the app and relaunched Python on the
+next page, so one hop costs a full interpreter + Kivy start, a new window and
+its first frame. After: one EcoStarApp process switches screens in memory.
+
+    python benchmarks/bench_startup.py --hops 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGES = ["login", "register", "login", "home"]
+
+
+def child_env():
+    env = dict(os.environ)
+    env["KIVY_NO_CONSOLELOG"] = "1"
+    env["KIVY_NO_ARGS"] = "1"
+    env["PYTHONPATH"] = ROOT + os.pathsep + env.get("PYTHONPATH", "")
+    return env
+
+
+def run_child(args, cwd):
+    out = subprocess.run([sys.executable, os.path.abspath(__file__)] + args,
+                         cwd=cwd, env=child_env(), capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+# 🐢 Old flow: one process per page, stopped after its first frame
+def relaunch_child(page):
+    from kivy.app import App
+    from kivy.clock import Clock
+    from kivy.core.window import Window
+
+    class OnePageApp(App):
+        def build(self):
+            from main import EcoStarApp
+            return EcoStarApp(start_screen=page, user_id=1).build_page(page)
+
+        def on_start(self):
+            Window.bind(on_flip=lambda *a: Clock.schedule_once(lambda dt: self.stop(), 0))
+
+    OnePageApp().run()
+    print(json.dumps({}))
+
+
+# 🚀 New flow: one process, screens switched in memory
+def inprocess_child(t0, hops):
+    from kivy.clock import Clock
+    from kivy.core.window import Window
+    from main import EcoStarApp
+
+    timings = {"cold_start": None, "switch": {page: [] for page in set(PAGES)}}
+    plan = [page for _ in range(hops) for page in PAGES]
+    state = {"page": None, "started": None}
+
+    app = EcoStarApp(start_screen="login", user_id=None)
+
+    def on_flip(*args):
+        now = time.perf_counter()
+        if timings["cold_start"] is None:
+            timings["cold_start"] = time.time() - t0
+        elif state["page"] is not None:
+            timings["switch"][state["page"]].append(now - state["started"])
+            state["page"] = None
+        else:
+            return
+        Clock.schedule_once(next_hop, 0)
+
+    def next_hop(dt):
+        if not plan:
+            app.stop()
+            return
+        page = plan.pop(0)
+        state["page"], state["started"] = page, time.perf_counter()
+        app.navigate_to(page, user_id=1)
+
+    Window.bind(on_flip=on_flip)
+    app.run()
+    print(json.dumps(timings))
+
+
+def ms(seconds):
+    return f"{seconds * 1000:9.1f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hops", type=int, default=3, help="navigation cycles to time")
+    parser.add_argument("--relaunch-child")
+    parser.add_argument("--inprocess-child", type=float)
+    args = parser.parse_args()
+
+    if args.relaunch_child:
+        return relaunch_child(args.relaunch_child)
+    if args.inprocess_child:
+        return inprocess_child(args.inprocess_child, args.hops)
+
+    # Run in a scratch directory so the benchmark never touches ecostar_pro.db
+    with tempfile.TemporaryDirectory() as cwd:
+        before = {page: [] for page in set(PAGES)}
+        for _ in range(args.hops):
+            for page in PAGES:
+                start = time.perf_counter()
+                run_child(["--relaunch-child", page], cwd)
+                before[page].append(time.perf_counter() - start)
+
+        after = run_child(["--inprocess-child", repr(time.time()), "--hops", str(args.hops)], cwd)
+
+    print(f"{'page':<10}{'before (relaunch)':>20}{'after (switch)':>20}")
+    for page in sorted(before):
+        print(f"{page:<10}{ms(statistics.median(before[page])):>20}"
+              f"{ms(statistics.median(after['switch'][page])):>20}")
+    print(f"\ncold start to first frame: {ms(after['cold_start'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Sync bandwidth and latency against the local stand-in server.
+
+Starts sync_server.py on a free port with a scratch store and two scratch
+devices. Device A is filled with generate_data.py up to a week ago and
+pushes everything; device B pulls everything. A then records a week of
+readings offline and both devices rename the same account (a conflict),
+and each step after that is timed with the bytes sent and received:
+
+* A's delta push after the week offline, and B's delta pull
+* a sync with nothing to do
+* the size of A's database file, for comparison
+
+Both devices must end with the same readings and account data.
+
+    python benchmarks/bench_sync.py --users 10 --years 1
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database  # noqa: E402
+from generate_data import generate, usage  # noqa: E402
+from sync import SyncClient  # noqa: E402
+from sync_server import serve  # noqa: E402
+
+WEEK = 7 * 86400
+
+
+def offline_week(db, user_ids, interval, end, seed=2):
+    rng = random.Random(seed)
+    rows = [(user_id, resource, usage(rng, resource, ts, interval), ts)
+            for user_id in user_ids for ts in range(end - WEEK, end, interval) for resource in db.resources()]
+    return db.add_readings(rows)
+
+
+def step(label, client):
+    result = client.sync()
+    print(f"{label:<28}{result.pushed:>10,}{result.pulled:>10,}{result.bytes_sent / 1024:>11.1f}KB"
+          f"{result.bytes_received / 1024:>11.1f}KB{result.seconds * 1000:>10.0f}ms")
+    return result
+
+
+def snapshot(db):
+    users = db.conn.execute("SELECT username, name, email, is_admin FROM users ORDER BY username").fetchall()
+    readings = db.conn.execute('''
+        SELECT u.username, s.name, r.ts, r.value FROM readings r
+        JOIN users u ON u.id = r.user_id JOIN resources s ON s.id = r.resource_id
+        ORDER BY 1, 2, 3
+    ''').fetchall()
+    return users, readings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--years", type=float, default=1)
+    parser.add_argument("--interval", type=int, default=3600)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        server = serve(port=0, path=os.path.join(tmp, "server.db"))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+        a_path = os.path.join(tmp, "a.db")
+        a, b = Database(a_path), Database(os.path.join(tmp, "b.db"))
+        client_a, client_b = SyncClient(a, url), SyncClient(b, url)
+
+        now = int(time.time()) // args.interval * args.interval
+        user_ids, readings = generate(a, args.users, args.years, args.interval, end=now - WEEK)
+        print(f"Device A: {args.users} users, {readings:,} readings")
+        print(f"{'step':<28}{'pushed':>10}{'pulled':>10}{'sent':>13}{'received':>13}{'time':>12}")
+        step("A initial push", client_a)
+        step("B initial pull", client_b)
+
+        added = offline_week(a, user_ids, args.interval, now)
+        # The same account renamed on both devices; the later edit wins on both
+        b.conn.execute("UPDATE users SET name='Renamed on B' WHERE username='synthetic1'")
+        time.sleep(0.01)
+        a.conn.execute("UPDATE users SET name='Renamed on A' WHERE username='synthetic1'")
+        print(f"A offline for a week: {added:,} new readings")
+        step("A delta sync", client_a)
+        step("B delta sync", client_b)
+        step("A sync, nothing new", client_a)
+        a.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        print(f"A's database file: {os.path.getsize(a_path) / 1024:,.0f}KB")
+
+        same = snapshot(a) == snapshot(b)
+        winner = b.conn.execute("SELECT name FROM users WHERE username='synthetic1'").fetchone()[0]
+        print(f"Devices converged: {'yes' if same else 'NO'} (synthetic1 is {winner!r} on both)")
+        server.shutdown()
+        server.server_close()
+        a.close()
+        b.close()
+        if not same:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
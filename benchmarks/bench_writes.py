@@ -0,0 +1,110 @@
+"""Inserts per second through the write queue against per-row commits.
+
+A scratch database is filled with generate_data.py, so each commit also
+updates realistic rollups, anomaly baselines and tips. ``--rows``
+readings are then saved for one user in each of these ways:
+
+* per-row: ``Database.add_reading`` in a loop, one transaction per reading,
+  which is what each save did before the queue (``synchronous=NORMAL``)
+* per-row durable: the same with ``synchronous=FULL``, the queue's guarantee
+* queue, scripted: one producer queues everything and waits for the last ack
+* queue, N feeds: ``--feeds`` threads each save a reading and wait for its
+  acknowledgement before the next, like meters or clicks
+
+For the feeds the acknowledgement latency is reported too.
+
+    python benchmarks/bench_writes.py --rows 5000 --feeds 8
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# The write queue reports back through the Kivy clock; keep Kivy off the command line
+os.environ.setdefault("KIVY_NO_CONSOLELOG", "1")
+os.environ.setdefault("KIVY_NO_ARGS", "1")
+
+from database import Database  # noqa: E402
+from generate_data import generate  # noqa: E402
+from write_queue import WriteQueue  # noqa: E402
+
+
+def per_row(db, user_id, rows, synchronous):
+    db.conn.execute(f"PRAGMA synchronous={synchronous}")
+    started = time.perf_counter()
+    for i in range(rows):
+        db.add_reading(user_id, "electricity", 1.0 + i % 7)
+    return time.perf_counter() - started, None
+
+
+def scripted(db, user_id, rows):
+    writes = WriteQueue(db)
+    started = time.perf_counter()
+    futures = [writes.add(user_id, "water", 10.0 + i % 5) for i in range(rows)]
+    futures[-1].result()
+    elapsed = time.perf_counter() - started
+    writes.stop()
+    for future in futures:
+        future.result()
+    return elapsed, None
+
+
+def feeds(db, user_id, rows, threads):
+    writes = WriteQueue(db)
+    latencies = []
+
+    def feed(count):
+        for i in range(count):
+            sent = time.perf_counter()
+            writes.add(user_id, "gas", 0.2 + i % 3).result()
+            latencies.append(time.perf_counter() - sent)
+
+    workers = [threading.Thread(target=feed, args=(rows // threads,)) for _ in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+    writes.stop()
+    latencies.sort()
+    return elapsed, (statistics.median(latencies) * 1000, latencies[int(len(latencies) * 0.95)] * 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--feeds", type=int, default=8)
+    parser.add_argument("--users", type=int, default=5)
+    parser.add_argument("--years", type=float, default=0.5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "bench.db"))
+        user_ids, readings = generate(db, args.users, args.years)
+        user_id = user_ids[0]
+        print(f"{args.users} users, {readings:,} readings; saving {args.rows:,} more")
+        print(f"{'path':<22}{'inserts/s':>12}{'ack p50':>11}{'ack p95':>11}")
+        runs = (
+            ("per-row", lambda: per_row(db, user_id, args.rows, "NORMAL")),
+            ("per-row durable", lambda: per_row(db, user_id, args.rows, "FULL")),
+            ("queue, scripted", lambda: scripted(db, user_id, args.rows)),
+            (f"queue, {args.feeds} feeds", lambda: feeds(db, user_id, args.rows, args.feeds)),
+        )
+        for label, run in runs:
+            before = db.conn.execute("SELECT COUNT(*) FROM readings").fetchone()[0]
+            elapsed, acks = run()
+            written = db.conn.execute("SELECT COUNT(*) FROM readings").fetchone()[0] - before
+            line = f"{label:<22}{written / elapsed:>12,.0f}"
+            if acks:
+                line += f"{acks[0]:>9.1f}ms{acks[1]:>9.1f}ms"
+            print(line)
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
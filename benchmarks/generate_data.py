@@ -0,0 +1,108 @@
+"""Seeded synthetic users and readings for benchmarks and manual testing.
+
+Creates ``--users`` accounts (``synthetic1``, ``synthetic2``, ... all with
+password ``password``) and ``--years`` of readings for each of them across
+all six resources, one reading per resource every ``--interval`` seconds.
+Usage follows a daily and weekly rhythm with noise, so the rollups, anomaly
+baselines and tips see realistic data. The same seed and ``--end`` always
+produce the same readings.
+
+    python benchmarks/generate_data.py --users 50 --years 2 [--db ecostar_pro.db]
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import auth  # noqa: E402
+from database import DB_PATH, Database  # noqa: E402
+
+PASSWORD = "password"
+
+# Typical reading per hour and how strongly it follows the time of day
+PROFILES = {
+    "electricity": (0.45, 0.6),
+    "water": (12.0, 0.8),
+    "gas": (0.15, 0.5),
+    "oil": (0.08, 0.3),
+    "cng": (0.05, 0.9),
+    "petrol": (0.12, 0.9),
+}
+
+# Readings written per add_readings call
+CHUNK = 50000
+
+
+def usage(rng, resource, ts, interval):
+    base, daily = PROFILES[resource]
+    hour = time.localtime(ts).tm_hour
+    # Peaks in the morning and evening, quieter at night and at weekends for transport
+    rhythm = 1 + daily * (math.sin((hour - 6) / 24 * 2 * math.pi) + 0.5 * math.sin((hour - 17) / 12 * math.pi))
+    if resource in ("cng", "petrol") and time.localtime(ts).tm_wday >= 5:
+        rhythm *= 0.4
+    return round(max(0.0, base * interval / 3600 * rhythm * rng.lognormvariate(0, 0.25)), 4)
+
+
+def create_users(db, users):
+    """Insert the accounts directly with one shared hash; hashing each would dominate a large run."""
+    hashed = auth.hash_password(PASSWORD)
+    with db.transaction() as conn:
+        # Past the highest suffix in use, so deleted or earlier synthetic accounts never collide
+        first = conn.execute("SELECT COALESCE(MAX(CAST(SUBSTR(username, 10) AS INTEGER)), 0) + 1 FROM users "
+                             "WHERE username GLOB 'synthetic[0-9]*'").fetchone()[0]
+        conn.executemany("INSERT INTO users (username, password, name, email) VALUES (?, ?, ?, ?)",
+                         [(f"synthetic{i}", hashed, f"Synthetic User {i}", f"synthetic{i}@example.com")
+                          for i in range(first, first + users)])
+        # Inside one write transaction the new accounts take the highest ids
+        rows = conn.execute("SELECT id FROM users ORDER BY id DESC LIMIT ?", (users,)).fetchall()
+    return [row[0] for row in reversed(rows)]
+
+
+def generate(db, users, years, interval=3600, seed=1, end=None, progress=None):
+    """Fill ``db``; returns ``(user_ids, readings_written)``."""
+    rng = random.Random(seed)
+    end = (int(time.time()) if end is None else end) // interval * interval
+    start = end - int(years * 365 * 86400)
+    resources = list(db.resources())
+    user_ids = create_users(db, users)
+    written = 0
+    for user_id in user_ids:
+        # Each household uses a little more or less than the profile
+        scale = {resource: rng.uniform(0.6, 1.6) for resource in resources}
+        batch = []
+        for ts in range(start, end, interval):
+            for resource in resources:
+                batch.append((user_id, resource, usage(rng, resource, ts, interval) * scale[resource], ts))
+            if len(batch) >= CHUNK:
+                written += db.add_readings(batch)
+                batch = []
+        written += db.add_readings(batch)
+        if progress:
+            progress(user_id, written)
+    return user_ids, written
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--years", type=float, default=1)
+    parser.add_argument("--interval", type=int, default=3600, help="seconds between readings of a resource")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--end", type=int, help="unix time of the last reading (default: now)")
+    parser.add_argument("--db", default=DB_PATH)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    db = Database(args.db)
+    _user_ids, written = generate(db, args.users, args.years, args.interval, args.seed, args.end,
+                                  progress=lambda user_id, rows: print(f"user {user_id}: {rows:,} readings so far"))
+    db.close()
+    print(f"Wrote {args.users} users and {written:,} readings to {args.db} in {time.perf_counter() - started:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""Headless benchmark suite for the app's hot paths, with a JSON baseline.
+
+For each data size (``USERSxYEARS``) a scratch database is filled with
+generate_data.py and these are timed against one of its users:
+
+* login: ``Database.get_user_id`` with the right password
+* register: ``Database.register_user`` for a new account
+* insert: ``Database.add_reading``, one reading in its own transaction
+* popup_update: an insert followed by the period summary the dashboard reloads
+* summary_day/week/month: ``Database.get_period_totals``, behind get_latest_consumption_summary
+* totals: ``Database.get_totals`` over all time
+* aggregate_day/week/month: ``analytics.Analysis.period_series`` over the full history
+
+Results are written as JSON (``--output``). Pass an earlier file as
+``--compare`` to print how each median moved.
+
+    python benchmarks/run_benchmarks.py --sizes 5x1,20x2 --output baseline.json
+"""
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics import Analysis  # noqa: E402
+from database import Database  # noqa: E402
+from generate_data import PASSWORD, generate  # noqa: E402
+
+PERIODS = ("day", "week", "month")
+
+
+def measure(fn, repeats):
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return {
+        "n": repeats,
+        "median_ms": round(statistics.median(timings) * 1000, 3),
+        "p95_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))] * 1000, 3),
+        "mean_ms": round(statistics.fmean(timings) * 1000, 3),
+    }
+
+
+def run_size(users, years, interval, repeats, seed):
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "bench.db"))
+        started = time.perf_counter()
+        user_ids, readings = generate(db, users, years, interval, seed)
+        fill_seconds = time.perf_counter() - started
+        user_id = user_ids[len(user_ids) // 2]
+        username = db.get_user_details(user_id)[0]
+        analysis = Analysis(db)
+        registered = iter(range(10 ** 9))
+
+        def popup_update():
+            db.add_reading(user_id, "water", 5.0)
+            db.get_period_totals(user_id, "day")
+
+        benches = {
+            # Password hashing is deliberately slow, a few rounds are enough
+            "login": (lambda: db.get_user_id(username, PASSWORD), max(3, repeats // 10)),
+            "register": (lambda: db.register_user(f"bench{next(registered)}", PASSWORD, "Bench", "b@example.com"),
+                         max(3, repeats // 10)),
+            "insert": (lambda: db.add_reading(user_id, "electricity", 1.5), repeats),
+            "popup_update": (popup_update, repeats),
+            "totals": (lambda: db.get_totals(user_id), repeats),
+        }
+        for period in PERIODS:
+            benches[f"summary_{period}"] = (lambda period=period: db.get_period_totals(user_id, period), repeats)
+        for period in PERIODS:
+            benches[f"aggregate_{period}"] = (lambda period=period: analysis.period_series(user_id, period),
+                                              max(3, repeats // 10))
+
+        results = {name: measure(fn, count) for name, (fn, count) in benches.items()}
+        db.close()
+    return {"users": users, "years": years, "interval": interval, "readings": readings,
+            "fill_seconds": round(fill_seconds, 2), "results": results}
+
+
+def compare(current, previous):
+    old = {(size["users"], size["years"]): size["results"] for size in previous["sizes"]}
+    for size in current["sizes"]:
+        before = old.get((size["users"], size["years"]))
+        if before is None:
+            continue
+        print(f"\n{size['users']} users x {size['years']} years vs baseline")
+        for name, result in size["results"].items():
+            if name in before and before[name]["median_ms"]:
+                ratio = result["median_ms"] / before[name]["median_ms"]
+                print(f"  {name:<16}{before[name]['median_ms']:>10.2f} -> {result['median_ms']:>10.2f} ms"
+                      f"  ({(ratio - 1) * 100:+.0f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="5x1,20x1", help="comma-separated USERSxYEARS")
+    parser.add_argument("--interval", type=int, default=3600, help="seconds between readings of a resource")
+    parser.add_argument("--repeats", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "machine": platform.machine(),
+        "sizes": [],
+    }
+    for size in args.sizes.split(","):
+        users, years = size.lower().split("x")
+        result = run_size(int(users), float(years), args.interval, args.repeats, args.seed)
+        report["sizes"].append(result)
+        print(f"{result['users']} users x {result['years']} years ({result['readings']:,} readings, "
+              f"filled in {result['fill_seconds']} s)")
+        for name, stats in result["results"].items():
+            print(f"  {name:<16}median {stats['median_ms']:>9.2f} ms   p95 {stats['p95_ms']:>9.2f} ms")
+
+    with open(args.output, "w") as handle:
+        json.dump(report, handle, indent=2)
+    print(f"\nWrote {args.output}")
+
+    if args.compare:
+        with open(args.compare) as handle:
+            compare(report, json.load(handle))
+
+
+if __name__ == "__main__":
+    main()
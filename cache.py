@@ -0,0 +1,55 @@
+"""Per-user in-memory caches invalidated by a write-version counter.
+
+Every write path bumps the owning user's version with :func:`bump_version`
+after it commits. Cached values remember the version they were computed at
+and are ignored once it moves on, so readers never see data older than the
+last committed write while unchanged users keep their entries. Entries are
+held in a bounded LRU.
+"""
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+_versions = {}
+_versions_lock = threading.Lock()
+
+
+def user_version(user_id: int) -> int:
+    return _versions.get(user_id, 0)
+
+
+def bump_version(user_id: int) -> None:
+    """Invalidate everything cached for ``user_id``; call after the write commits."""
+    with _versions_lock:
+        _versions[user_id] = _versions.get(user_id, 0) + 1
+
+
+class VersionedLRUCache:
+    def __init__(self, maxsize: int = 128):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: int, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get((user_id, key))
+            if entry is None or entry[0] != user_version(user_id):
+                self.misses += 1
+                return default
+            self._entries.move_to_end((user_id, key))
+            self.hits += 1
+            return entry[1]
+
+    def put(self, user_id: int, key: Hashable, value: Any, version: Optional[int] = None) -> None:
+        """Store ``value``; pass the ``version`` read *before* computing it to avoid caching stale data."""
+        with self._lock:
+            self._entries[(user_id, key)] = (user_version(user_id) if version is None else version, value)
+            self._entries.move_to_end((user_id, key))
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
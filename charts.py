@@ -0,0 +1,90 @@
+"""Downsampled consumption series for the charts.
+
+However long the range, at most ``MAX_POINTS`` points per resource leave
+here. Ranges holding up to ``LTTB_LIMIT`` readings are fetched whole and
+reduced with largest-triangle-three-buckets, which keeps the visual shape
+(peaks included). Longer ranges never touch the raw readings: they read the
+``hourly_extremes`` rollup and SQLite merges it into one min/max pair per
+time bucket, so a multi-year, minute-resolution range costs a few thousand
+rows instead of millions.
+"""
+from collections import namedtuple
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+MAX_POINTS = 2000
+# Readings above which a range is drawn from the hourly min/max instead of LTTB
+LTTB_LIMIT = 20000
+
+HOUR = 3600
+DAY = 86400
+
+ChartSeries = namedtuple("ChartSeries", "ts value method")
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Largest-triangle-three-buckets: the ``threshold`` points that best keep the line's shape."""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return x, y
+    # Interior points split into threshold - 2 buckets; first and last points are always kept
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    keep = np.empty(threshold, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_lo, next_hi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x, avg_y = x[next_lo:next_hi].mean(), y[next_lo:next_hi].mean()
+        # Twice the triangle area between the last kept point, each candidate and the next bucket's mean
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(area.argmax())
+        keep[i + 1] = a
+    return x[keep], y[keep]
+
+
+def min_max(db, user_id: int, resource_id: int, start: int, end: int,
+            buckets: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Per-bucket minimum and maximum from the hourly extremes; two points per non-empty bucket."""
+    width = max(HOUR, -(-(end - start) // buckets))
+    rows = db.conn.execute('''
+        SELECT (hour - ?) / ? AS bucket, MIN(low), MAX(high) FROM hourly_extremes
+        WHERE user_id=? AND resource_id=? AND hour >= ? AND hour < ?
+        GROUP BY bucket ORDER BY bucket
+    ''', (start, width, user_id, resource_id, start - start % HOUR, end)).fetchall()
+    table = np.array(rows, dtype=np.float64).reshape(len(rows), 3)
+    centers = start + (table[:, 0] + 0.5) * width
+    return np.repeat(centers, 2), table[:, 1:].ravel()
+
+
+def estimate_count(db, user_id: int, resource_id: int, start: int, end: int) -> int:
+    """Readings in range, to within a day at either end, from the daily rollups."""
+    row = db.conn.execute("SELECT SUM(count) FROM rollups WHERE user_id=? AND period='day' AND resource_id=? "
+                          "AND bucket > ? AND bucket < ?", (user_id, resource_id, start - DAY, end)).fetchone()
+    return row[0] or 0
+
+
+def load_series(db, user_id: int, resource: str, start: int, end: int,
+                max_points: int = MAX_POINTS) -> ChartSeries:
+    resource_id = db.resource_id(resource)
+    count = estimate_count(db, user_id, resource_id, start, end)
+    if count > LTTB_LIMIT:
+        ts, value = min_max(db, user_id, resource_id, start, end, max_points // 2)
+        return ChartSeries(ts, value, "min/max")
+    rows = db.get_readings(user_id, resource, start, end)
+    table = np.array(rows, dtype=np.float64).reshape(len(rows), 2)
+    ts, value = lttb(table[:, 0], table[:, 1], max_points)
+    return ChartSeries(ts, value, "lttb" if len(rows) > max_points else "raw")
+
+
+def load_charts(db, user_id: int, start: int, end: int, resources: Optional[Iterable[str]] = None,
+                max_points: int = MAX_POINTS) -> Dict[str, ChartSeries]:
+    """Downsampled series for every resource with readings in ``[start, end)``."""
+    names = list(resources if resources is not None else db.resources())
+    charts = {}
+    for name in names:
+        series = load_series(db, user_id, name, start, end, max_points)
+        if len(series.ts):
+            charts[name] = series
+    return charts
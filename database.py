@@ -0,0 +1,287 @@
+"""Shared data-access layer for EcoStar Pro.
+
+Every page goes through one :class:`Database`. Each thread gets its own
+long-lived connection (the UI thread and any worker threads form a small
+pool), opened once with WAL journaling and tuned pragmas and reused for
+every query, so clicks no longer pay for connect/close and fsync.
+"""
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import anomaly
+import auth
+import instrumentation
+import recommendations
+from cache import bump_version
+from migrations import migrate
+from rollups import bucket_sql, rollup_extremes, rollup_readings
+
+DB_PATH = os.environ.get("ECOSTAR_DB", "ecostar_pro.db")
+
+# Applied to every new connection
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",  # WAL stays consistent, fsync only at checkpoints
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",  # ~16 MB page cache
+    "PRAGMA mmap_size=134217728",
+    "PRAGMA busy_timeout=5000",
+)
+
+# Prepared statements kept per connection by the sqlite3 module
+STATEMENT_CACHE_SIZE = 256
+
+class Database:
+    def __init__(self, path: str = DB_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+        self._resources = None
+
+    # 🔌 Connections
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+        return conn
+
+    def _connect(self) -> sqlite3.Connection:
+        # isolation_level=None: transactions are opened explicitly in transaction()
+        conn = sqlite3.connect(self.path, isolation_level=None, cached_statements=STATEMENT_CACHE_SIZE,
+                               **instrumentation.connect_kwargs())
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        with self._schema_lock:
+            if not self._schema_ready:
+                migrate(conn)
+                self._schema_ready = True
+        return conn
+
+    def close(self) -> None:
+        """Close the calling thread's connection."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Run the block in one write transaction; nested blocks join the outer one."""
+        conn = self.conn
+        if conn.in_transaction:
+            yield conn
+            return
+        self._local.touched = set()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            # Persistent per-user data version, used to key on-disk caches
+            conn.executemany("UPDATE users SET data_version = data_version + 1 WHERE id=?",
+                             [(user_id,) for user_id in self._local.touched])
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        # Invalidate caches only once the data is visible to other connections
+        for user_id in self._local.touched:
+            bump_version(user_id)
+
+    def touch(self, *user_ids: int) -> None:
+        """Mark users whose data the current transaction changes."""
+        self._local.touched.update(user_ids)
+
+    # 👤 Users
+
+    def get_user_id(self, username: str, password: str) -> Optional[int]:
+        """Verify the password (slow by design, run off the UI thread); upgrades old hashes on success."""
+        row = self.conn.execute("SELECT id, password FROM users WHERE username=?", (username,)).fetchone()
+        if row is None or row[1] is None:
+            auth.dummy_verify(password)
+            return None
+        user_id, stored = row
+        if not auth.verify_password(password, stored):
+            return None
+        if auth.needs_rehash(stored):
+            hashed = auth.hash_password(password)
+            with self.transaction() as conn:
+                conn.execute("UPDATE users SET password=? WHERE id=? AND password=?", (hashed, user_id, stored))
+        return user_id
+
+    def register_user(self, username: str, password: str, name: str, email: str) -> bool:
+        # Hash before taking the write lock
+        password = auth.hash_password(password)
+        try:
+            with self.transaction() as conn:
+                # The first account on an install (or any while there is no administrator) runs the admin console
+                cursor = conn.execute("INSERT INTO users (username, password, name, email, is_admin) "
+                                      "VALUES (?, ?, ?, ?, NOT EXISTS (SELECT 1 FROM users WHERE is_admin))",
+                                      (username, password, name, email))
+                self.touch(cursor.lastrowid)
+            return True
+        except sqlite3.IntegrityError:
+            return False
+
+    def get_user_details(self, user_id: int) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+        row = self.conn.execute("SELECT username, name, email FROM users WHERE id=?", (user_id,)).fetchone()
+        return row if row else (None, None, None)
+
+    def data_version(self, user_id: int) -> int:
+        """Bumped in every transaction that changes the user's data."""
+        row = self.conn.execute("SELECT data_version FROM users WHERE id=?", (user_id,)).fetchone()
+        return row[0] if row else 0
+
+    # ⚡ Readings
+
+    def resources(self) -> Dict[str, Tuple[int, str]]:
+        """Map resource name to ``(id, unit)``; cached after the first call."""
+        if self._resources is None:
+            self._resources = {name: (resource_id, unit) for resource_id, name, unit
+                               in self.conn.execute("SELECT id, name, unit FROM resources ORDER BY id")}
+        return self._resources
+
+    def resource_id(self, resource: str) -> int:
+        try:
+            return self.resources()[resource][0]
+        except KeyError:
+            raise ValueError(f"Unknown resource: {resource}") from None
+
+    def add_resource(self, name: str, unit: str) -> int:
+        with self.transaction() as conn:
+            conn.execute("INSERT OR IGNORE INTO resources (name, unit) VALUES (?, ?)", (name, unit))
+        self._resources = None
+        return self.resource_id(name)
+
+    def forget_resources(self) -> None:
+        """Drop the cached resource map, e.g. after the database file was replaced underneath."""
+        self._resources = None
+
+    def add_reading(self, user_id: int, resource: str, value: float, ts: Optional[int] = None) -> None:
+        self.add_readings([(user_id, resource, value, ts)])
+
+    def add_readings(self, rows: Iterable[tuple], origin: Optional[str] = None) -> int:
+        """Append ``(user_id, resource, value, ts)`` rows in one transaction; ``ts=None`` means now.
+
+        Readings pulled by sync pass the ``origin`` device and end each row with the reading's id there.
+        """
+        now = int(time.time())
+        if origin is None:
+            params = [(user_id, self.resource_id(resource), now if ts is None else int(ts), value)
+                      for user_id, resource, value, ts in rows]
+            sql = "INSERT INTO readings (user_id, resource_id, ts, value) VALUES (?, ?, ?, ?)"
+        else:
+            params = [(user_id, self.resource_id(resource), int(ts), value, origin, origin_id)
+                      for user_id, resource, value, ts, origin_id in rows]
+            sql = "INSERT INTO readings (user_id, resource_id, ts, value, origin, origin_id) VALUES (?, ?, ?, ?, ?, ?)"
+        with self.transaction() as conn:
+            # The write lock is held, so the new rows get ids right after this one
+            last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM readings").fetchone()[0]
+            conn.executemany(sql, params)
+            rollup_readings(conn, last_id)
+            rollup_extremes(conn, last_id)
+            anomaly.observe(conn, ((last_id + i,) + row[:4] for i, row in enumerate(params, start=1)))
+            changed = {(row[0], row[1]) for row in params}
+            for user_id in {user_id for user_id, _resource_id in changed}:
+                recommendations.generate_tips(conn, user_id, {rid for uid, rid in changed if uid == user_id})
+                self.touch(user_id)
+        return len(params)
+
+    def _resource_totals(self, rows: Iterable[Tuple[int, float]]) -> Dict[str, float]:
+        names = {resource_id: name for name, (resource_id, _unit) in self.resources().items()}
+        totals = dict.fromkeys(names.values(), 0.0)
+        for resource_id, total in rows:
+            totals[names[resource_id]] += total
+        return totals
+
+    def get_totals(self, user_id: int) -> Dict[str, float]:
+        """Total per resource over the user's whole history, zero where nothing was recorded."""
+        return self._resource_totals(self.conn.execute(
+            "SELECT resource_id, total FROM rollups WHERE user_id=? AND period='month'", (user_id,)))
+
+    def get_period_totals(self, user_id: int, period: str, ts: Optional[int] = None) -> Dict[str, float]:
+        """Totals per resource for the ``day``/``week``/``month`` bucket containing ``ts`` (default now)."""
+        return self._resource_totals(self.conn.execute(
+            f"SELECT resource_id, total FROM rollups WHERE user_id=? AND period=? AND bucket={bucket_sql(period, '?')}",
+            (user_id, period, int(time.time()) if ts is None else int(ts))))
+
+    def get_readings(self, user_id: int, resource: str, start: Optional[int] = None,
+                     end: Optional[int] = None) -> List[Tuple[int, float]]:
+        """``(ts, value)`` pairs for one resource with ``start <= ts < end``, oldest first."""
+        return self.conn.execute(
+            "SELECT ts, value FROM readings WHERE user_id=? AND resource_id=? AND ts >= ? AND ts < ? ORDER BY ts",
+            (user_id, self.resource_id(resource),
+             start if start is not None else -2 ** 63, end if end is not None else 2 ** 63 - 1)).fetchall()
+
+    def get_history(self, user_id: int, resource: Optional[str] = None, start: Optional[int] = None,
+                    end: Optional[int] = None, before: Optional[Tuple[int, int]] = None,
+                    after: Optional[Tuple[int, int]] = None, limit: int = 200) -> List[tuple]:
+        """One page of ``(id, ts, resource, unit, value)`` rows with ``start <= ts < end``, newest first.
+
+        Pages are keyset-paginated on ``(ts, id)``: pass the last row's ``(ts, id)`` as ``before`` for the
+        next older page, or the first row's as ``after`` for the newer page above it.
+        """
+        clauses = ["r.user_id=?"]
+        params = [user_id]
+        if resource is not None:
+            clauses.append("r.resource_id=?")
+            params.append(self.resource_id(resource))
+        if start is not None:
+            clauses.append("r.ts >= ?")
+            params.append(start)
+        if end is not None:
+            clauses.append("r.ts < ?")
+            params.append(end)
+        if before is not None:
+            clauses.append("(r.ts, r.id) < (?, ?)")
+            params.extend(before)
+        if after is not None:
+            clauses.append("(r.ts, r.id) > (?, ?)")
+            params.extend(after)
+        order = "ASC" if after is not None else "DESC"
+        rows = self.conn.execute(f'''
+            SELECT r.id, r.ts, s.name, s.unit, r.value
+            FROM readings r JOIN resources s ON s.id = r.resource_id
+            WHERE {" AND ".join(clauses)}
+            ORDER BY r.ts {order}, r.id {order} LIMIT ?
+        ''', params + [limit]).fetchall()
+        return rows[::-1] if after is not None else rows
+
+    def recent_anomalies(self, user_id: int, days: int = 30, limit: int = 3) -> List[tuple]:
+        return anomaly.recent_anomalies(self.conn, user_id, int(time.time()) - days * 86400, limit)
+
+    def dismiss_anomalies(self, user_id: int, anomaly_ids: Iterable[int]) -> None:
+        with self.transaction() as conn:
+            if anomaly.dismiss(conn, user_id, anomaly_ids):
+                self.touch(user_id)
+
+    # 💡 Recommendations
+
+    def get_user_tips(self, user_id: int, limit: int = 3) -> List[tuple]:
+        return recommendations.get_user_tips(self.conn, user_id, limit)
+
+    def mark_tips_read(self, user_id: int, recommendation_ids: Iterable[int]) -> None:
+        with self.transaction() as conn:
+            changed = [recommendations.mark_as_read(conn, user_id, recommendation_id)
+                       for recommendation_id in recommendation_ids]
+            if any(changed):
+                self.touch(user_id)
+
+
+_database = None
+_database_lock = threading.Lock()
+
+
+def get_database() -> Database:
+    """Return the process-wide :class:`Database` for ``DB_PATH``."""
+    global _database
+    with _database_lock:
+        if _database is None:
+            _database = Database(DB_PATH)
+        return _database
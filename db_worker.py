@@ -0,0 +1,107 @@
+"""Background database worker so the Kivy UI thread never blocks on SQLite.
+
+Jobs are queued to one dedicated thread, which owns its own connection from
+:func:`database.get_database`. :func:`run_in_background` returns a
+:class:`concurrent.futures.Future`; ``on_result``/``on_error`` callbacks are
+delivered on the Kivy main loop through ``Clock.schedule_once``, so they may
+touch widgets freely.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Optional
+
+from kivy.clock import Clock
+from kivy.logger import Logger
+
+import instrumentation
+from database import get_database
+
+
+class DatabaseWorker:
+    def __init__(self, name: str = "ecostar-db"):
+        self.name = name
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def stop(self, wait: bool = True) -> None:
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            if wait:
+                thread.join()
+
+    def submit(self, fn: Callable, *args, on_result: Optional[Callable] = None,
+               on_error: Optional[Callable] = None, **kwargs) -> Future:
+        """Queue ``fn(*args, **kwargs)`` for the worker thread."""
+        future = deliver_on_main_loop(Future(), on_result, on_error)
+        self.start()
+        self._queue.put((future, fn, args, kwargs))
+        return future
+
+    def _run(self) -> None:
+        while True:
+            job = self._queue.get()
+            if job is None:
+                break
+            future, fn, args, kwargs = job
+            if not future.set_running_or_notify_cancel():
+                continue
+            started = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException as exc:
+                future.set_exception(exc)
+            else:
+                future.set_result(result)
+            if instrumentation.ENABLED:
+                record_job(fn, time.perf_counter() - started)
+        get_database().close()
+
+
+def record_job(fn: Callable, seconds: float) -> None:
+    name = getattr(fn, "__qualname__", None) or repr(fn)
+    instrumentation.record("job", name, seconds)
+
+
+def deliver_on_main_loop(future: Future, on_result: Optional[Callable] = None,
+                         on_error: Optional[Callable] = None) -> Future:
+    """Call ``on_result``/``on_error`` on the Kivy main loop once ``future`` is done."""
+    if on_result is not None or on_error is not None:
+        future.add_done_callback(lambda done: Clock.schedule_once(lambda dt: _deliver(done, on_result, on_error)))
+    return future
+
+
+def _deliver(future: Future, on_result: Optional[Callable], on_error: Optional[Callable]) -> None:
+    if future.cancelled():
+        return
+    error = future.exception()
+    if error is None:
+        if on_result is not None:
+            on_result(future.result())
+    elif on_error is not None:
+        on_error(error)
+    else:
+        Logger.error(f"DatabaseWorker: unhandled error in background job: {error!r}")
+
+
+_worker = DatabaseWorker()
+
+
+def get_worker() -> DatabaseWorker:
+    return _worker
+
+
+def run_in_background(fn: Callable, *args, on_result: Optional[Callable] = None,
+                      on_error: Optional[Callable] = None, **kwargs) -> Future:
+    """Run ``fn`` on the shared database worker; callbacks fire on the main loop."""
+    return _worker.submit(fn, *args, on_result=on_result, on_error=on_error, **kwargs)
@@ -0,0 +1,266 @@
+"""CPU-only consumption forecasts per user and resource.
+
+Each resource's daily totals (from the ``day`` rollups) are fitted with a
+damped Holt-Winters model with weekly seasonality. The smoothing parameters
+are chosen by grid search, with every grid point run side by side as NumPy
+vectors, so a multi-year series fits in milliseconds.
+
+Training is batched: :func:`train_all` fits every user whose data changed in
+a process pool and writes the fitted state plus next day/week/month
+forecasts to ``FORECAST_DIR``, keyed by user id and ``users.data_version``.
+The dashboard only ever reads those files through :func:`load_forecast`.
+Code that changes a user's data calls :func:`schedule_refresh`, which
+retrains once the writes have paused for ``REFRESH_DELAY``.
+
+    python forecasting.py [--all] [--workers N]
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+FORECAST_DIR = os.environ.get("ECOSTAR_FORECAST_DIR", "forecast_cache")
+
+SEASON = 7  # days
+DAMPING = 0.95
+ALPHAS = (0.1, 0.3, 0.5, 0.7)
+BETAS = (0.0, 0.05, 0.2)
+GAMMAS = (0.0, 0.1, 0.3)
+GRID = np.array(list(product(ALPHAS, BETAS, GAMMAS)))
+
+HORIZONS = {"day": 1, "week": 7, "month": 30}
+
+CACHE_NAME = re.compile(r"^user(\d+)-v(\d+)\.json$")
+
+# Users loaded and fitted per pool round
+TRAIN_SLICE = 256
+
+# Seconds without a new write before a scheduled refresh starts
+REFRESH_DELAY = 3
+
+
+# 📈 Model
+
+def fit_series(daily: np.ndarray) -> dict:
+    """Fit damped additive Holt-Winters to a daily series; returns the model state."""
+    n = len(daily)
+    if n < 2 * SEASON:
+        # Too little history for seasonality: flat forecast at the recent mean
+        level = float(daily[-SEASON:].mean()) if n else 0.0
+        return {"level": level, "trend": 0.0, "season": [0.0] * SEASON, "next": 0, "params": None}
+
+    alpha, beta, gamma = GRID[:, 0], GRID[:, 1], GRID[:, 2]
+    k = len(GRID)
+    level = np.full(k, daily[:SEASON].mean())
+    trend = np.zeros(k)
+    season = np.tile(daily[:SEASON] - daily[:SEASON].mean(), (k, 1))
+    sse = np.zeros(k)
+
+    # One pass over time; every grid point advances together
+    for t in range(SEASON, n):
+        y = daily[t]
+        s = t % SEASON
+        prediction = level + DAMPING * trend + season[:, s]
+        sse += (y - prediction) ** 2
+        new_level = alpha * (y - season[:, s]) + (1 - alpha) * (level + DAMPING * trend)
+        trend = beta * (new_level - level) + (1 - beta) * DAMPING * trend
+        season[:, s] = gamma * (y - new_level) + (1 - gamma) * season[:, s]
+        level = new_level
+
+    best = int(np.argmin(sse))
+    return {
+        "level": float(level[best]),
+        "trend": float(trend[best]),
+        "season": season[best].tolist(),
+        "next": n % SEASON,
+        "params": GRID[best].tolist(),
+        "rmse": float(np.sqrt(sse[best] / (n - SEASON))),
+    }
+
+
+def predict(model: dict, horizon: int) -> np.ndarray:
+    """Daily predictions for the next ``horizon`` days, never below zero."""
+    steps = np.arange(1, horizon + 1)
+    damped = np.cumsum(DAMPING ** steps)
+    season = np.array(model["season"])[(model["next"] + steps - 1) % SEASON]
+    return np.maximum(model["level"] + damped * model["trend"] + season, 0.0)
+
+
+def _train_user(job: Tuple[int, int, Dict[str, List[float]]]) -> Tuple[int, int, dict]:
+    """Pool task: fit every resource of one user."""
+    user_id, version, series = job
+    resources = {}
+    for resource, daily in series.items():
+        model = fit_series(np.asarray(daily, dtype=np.float64))
+        forecast = predict(model, max(HORIZONS.values()))
+        resources[resource] = {
+            "model": model,
+            "forecast": {name: float(forecast[:days].sum()) for name, days in HORIZONS.items()},
+        }
+    return user_id, version, resources
+
+
+# 🗄️ Data and cache
+
+def load_daily_series(db, user_id: int, today: Optional[int] = None) -> Dict[str, List[float]]:
+    """Daily totals per resource from the first reading up to today, zero-filled."""
+    from rollups import bucket_sql
+
+    today = db.conn.execute(f"SELECT {bucket_sql('day', '?')}",
+                            (int(time.time()) if today is None else today,)).fetchone()[0]
+    names = {resource_id: name for name, (resource_id, _unit) in db.resources().items()}
+    series = {}
+    rows = db.conn.execute("SELECT resource_id, bucket, total FROM rollups WHERE user_id=? AND period='day' "
+                           "ORDER BY resource_id, bucket", (user_id,)).fetchall()
+    for resource_id in sorted({row[0] for row in rows}):
+        part = np.array([(bucket, total) for rid, bucket, total in rows if rid == resource_id])
+        # Round to whole days so DST-shortened days still line up
+        days = np.rint((part[:, 0] - part[0, 0]) / 86400).astype(np.int64)
+        length = int(round((today - part[0, 0]) / 86400)) + 1
+        daily = np.zeros(max(length, days[-1] + 1))
+        np.add.at(daily, days, part[:, 1])
+        # Today is still in progress, forecast from complete days only
+        series[names[resource_id]] = daily[:-1].tolist() if len(daily) > 1 else daily.tolist()
+    return series
+
+
+def cache_path(user_id: int, version: int) -> str:
+    return os.path.join(FORECAST_DIR, f"user{user_id}-v{version}.json")
+
+
+def cached_versions() -> Dict[int, int]:
+    """Newest data version with a forecast on disk, per user id."""
+    versions = {}
+    for name in os.listdir(FORECAST_DIR) if os.path.isdir(FORECAST_DIR) else ():
+        match = CACHE_NAME.match(name)
+        if match:
+            user_id, version = int(match.group(1)), int(match.group(2))
+            versions[user_id] = max(version, versions.get(user_id, version))
+    return versions
+
+
+def cached_version(user_id: int) -> Optional[int]:
+    versions = [int(CACHE_NAME.match(os.path.basename(path)).group(2))
+                for path in glob.glob(os.path.join(FORECAST_DIR, f"user{user_id}-v*.json"))]
+    return max(versions) if versions else None
+
+
+def discard(user_id: int) -> None:
+    """Delete every cached forecast of ``user_id``."""
+    for path in glob.glob(os.path.join(FORECAST_DIR, f"user{user_id}-v*.json")):
+        os.remove(path)
+
+
+def load_forecast(user_id: int, version: int) -> Optional[dict]:
+    """Cached forecast for ``version``, else the last one trained with ``stale`` set; never trains."""
+    newest = cached_version(user_id)
+    if newest is None:
+        return None
+    best = version if os.path.exists(cache_path(user_id, version)) else newest
+    try:
+        with open(cache_path(user_id, best)) as handle:
+            forecast = json.load(handle)
+    except FileNotFoundError:
+        # Superseded by a refresh between the listing and the open; a miss until the next load
+        return None
+    forecast["stale"] = best != version
+    return forecast
+
+
+def _store(user_id: int, version: int, resources: dict) -> None:
+    os.makedirs(FORECAST_DIR, exist_ok=True)
+    path = cache_path(user_id, version)
+    with open(path + ".tmp", "w") as handle:
+        json.dump({"user_id": user_id, "version": version, "trained_at": int(time.time()),
+                   "resources": resources}, handle)
+    os.replace(path + ".tmp", path)
+    # Older versions are superseded
+    for old in glob.glob(os.path.join(FORECAST_DIR, f"user{user_id}-v*.json")):
+        if old != path:
+            os.remove(old)
+
+
+def train_all(db=None, workers: Optional[int] = None, only_stale: bool = True) -> int:
+    """Fit every user (or only those without a forecast for their current version); returns users trained."""
+    from database import get_database
+
+    db = db or get_database()
+    users = db.conn.execute("SELECT id, data_version FROM users").fetchall()
+    cached = cached_versions() if only_stale else {}
+    jobs = [(user_id, version) for user_id, version in users if cached.get(user_id) != version]
+    if not jobs:
+        return 0
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # Load and fit in slices so memory stays bounded on large deployments
+        for start in range(0, len(jobs), TRAIN_SLICE):
+            payloads = [(user_id, version, load_daily_series(db, user_id))
+                        for user_id, version in jobs[start:start + TRAIN_SLICE]]
+            for user_id, version, resources in pool.map(_train_user, payloads, chunksize=8):
+                _store(user_id, version, resources)
+    return len(jobs)
+
+
+_refresh = None
+_pending = None
+_pending_lock = threading.Lock()
+
+
+def refresh_in_background() -> None:
+    """Train stale users in a separate process, unless a refresh is already running."""
+    global _refresh
+    if _refresh is None or _refresh.poll() is not None:
+        _refresh = subprocess.Popen([sys.executable, os.path.abspath(__file__)],
+                                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def schedule_refresh(delay: float = REFRESH_DELAY) -> None:
+    """Refresh once no write has been scheduled for ``delay`` seconds; safe to call from any thread."""
+    global _pending
+    with _pending_lock:
+        if _pending is not None:
+            _pending.cancel()
+        _pending = threading.Timer(delay, _refresh_when_idle, (delay,))
+        _pending.daemon = True
+        _pending.start()
+
+
+def _refresh_when_idle(delay: float) -> None:
+    # A running refresh may have listed the users before the latest write; go again once it is done
+    if _refresh is not None and _refresh.poll() is None:
+        schedule_refresh(delay)
+    else:
+        refresh_in_background()
+
+
+def refreshing() -> bool:
+    """Whether a refresh is scheduled or running, i.e. whether a stale forecast is about to be replaced."""
+    with _pending_lock:
+        if _pending is not None and _pending.is_alive():
+            return True
+    return _refresh is not None and _refresh.poll() is None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train consumption forecasts for every user.")
+    parser.add_argument("--all", action="store_true", help="retrain users whose forecast is current too")
+    parser.add_argument("--workers", type=int, help="process pool size (default: CPU count)")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    trained = train_all(workers=args.workers, only_stale=not args.all)
+    print(f"Trained {trained} users in {time.perf_counter() - started:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+"""Streaming bulk import of smart-meter exports.
+
+Files are read row by row through generators, so memory stays flat however
+large the export is. Each row is validated, converted to the unit of its
+resource and buffered; full batches are written with ``executemany``, one
+transaction per batch, so saves from the app can get in between batches
+during a long import. If an import fails part way, the batches already
+written stay imported.
+
+Accepted layouts (one reading per row/object):
+
+* CSV with a header containing timestamp, resource and value columns and
+  optionally a unit column (common aliases such as ``time``/``type``/``usage``
+  are recognised).
+* JSON Lines, or a JSON array of objects with the same keys.
+
+    python importer.py --user 1 meter_export.csv
+"""
+import argparse
+import csv
+import itertools
+import json
+import os
+import re
+from collections import namedtuple
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+from database import Database, get_database
+
+BATCH_SIZE = 10000
+# Characters read per chunk from JSON files, which may be one long line
+CHUNK_SIZE = 1 << 16
+
+# Header aliases accepted for each field
+FIELD_ALIASES = {
+    "ts": ("timestamp", "ts", "time", "datetime", "date", "interval_start"),
+    "resource": ("resource", "type", "meter", "utility"),
+    "value": ("value", "reading", "usage", "consumption", "amount"),
+    "unit": ("unit", "units", "uom"),
+}
+
+# Unit -> (base unit, factor to base); readings are converted to their resource's unit
+UNIT_FACTORS = {
+    "kwh": ("kWh", 1.0),
+    "wh": ("kWh", 0.001),
+    "mwh": ("kWh", 1000.0),
+    "l": ("L", 1.0),
+    "ml": ("L", 0.001),
+    "m3": ("L", 1000.0),
+    "ft3": ("L", 28.3168),
+    "gal": ("L", 3.78541),
+    "kg": ("kg", 1.0),
+    "g": ("kg", 0.001),
+}
+
+ImportResult = namedtuple("ImportResult", "imported skipped errors")
+
+# Number of row errors kept for reporting
+MAX_ERRORS = 20
+
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+# What a value cut off at the end of the text leaves after the decoder's error position
+_PARTIAL_TOKEN = re.compile(r"[\w.+-]*")
+
+
+class ImportRowError(ValueError):
+    pass
+
+
+# 📄 Readers
+
+def _counting_lines(handle, counter: list) -> Iterator[str]:
+    for line in handle:
+        counter[0] += len(line)
+        yield line
+
+
+def iter_csv(lines: Iterable[str]) -> Iterator[Dict[str, str]]:
+    yield from csv.DictReader(lines)
+
+
+def _counting_chunks(handle, counter: list, size: int) -> Iterator[str]:
+    while True:
+        chunk = handle.read(size)
+        if not chunk:
+            return
+        counter[0] += len(chunk)
+        yield chunk
+
+
+def _partial(buffer: str, exc: json.JSONDecodeError) -> bool:
+    """Whether decoding failed only because the text stops mid-value."""
+    rest = buffer[exc.pos:]
+    # Strings cannot span lines, so an unterminated one followed by a newline is broken, not cut off
+    return bool(_PARTIAL_TOKEN.fullmatch(rest)) or (exc.msg.startswith("Unterminated string") and "\n" not in rest)
+
+
+def _near(buffer: str, pos: int) -> str:
+    return buffer[pos:pos + 40].split("\n", 1)[0]
+
+
+def iter_json(chunks: Iterable[str]) -> Iterator[object]:
+    """Values from JSON Lines or a top-level JSON array, decoded incrementally.
+
+    ``chunks`` may split the text anywhere, e.g. a single-line array read in
+    fixed-size pieces; values are decoded in place from a read offset. A
+    line of JSON Lines that does not parse is yielded as an
+    :class:`ImportRowError` and reading resumes on the next line. A
+    malformed array, or a value cut off by the end of the file, raises it.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    pos = 0
+    in_array = None
+    skip_line = False
+    # A final empty chunk settles whatever was waiting for more text
+    for chunk in itertools.chain(chunks, [None]):
+        final = chunk is None
+        # Drop the decoded text once per chunk, not once per object
+        buffer = buffer[pos:] + (chunk or "")
+        pos = 0
+        while True:
+            if skip_line:
+                newline = buffer.find("\n", pos)
+                if newline == -1:
+                    pos = len(buffer)
+                    break
+                pos, skip_line = newline + 1, False
+            pos = _WHITESPACE.match(buffer, pos).end()
+            if pos == len(buffer):
+                break
+            if in_array is None:
+                in_array = buffer[pos] == "["
+                if in_array:
+                    pos += 1
+                    continue
+            if in_array and buffer[pos] in ",]":
+                pos += 1
+                continue
+            try:
+                obj, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError as exc:
+                if _partial(buffer, exc):
+                    if final:
+                        raise ImportRowError(f"Truncated JSON near: {_near(buffer, pos)!r}") from None
+                    if len(buffer) - exc.pos <= CHUNK_SIZE:
+                        break  # value continues in the next chunk
+                error = ImportRowError(f"Bad JSON ({exc.msg}) near: {_near(buffer, pos)!r}")
+                if in_array:
+                    raise error from None
+                yield error
+                skip_line = True
+                continue
+            if end == len(buffer) and not final and isinstance(obj, (int, float)):
+                break  # more digits may follow
+            pos = end
+            yield obj
+
+
+# 🧪 Validation
+
+def _field(row: dict, field: str):
+    for alias in FIELD_ALIASES[field]:
+        if alias in row and row[alias] not in (None, ""):
+            return row[alias]
+    return None
+
+
+def parse_timestamp(raw) -> int:
+    if isinstance(raw, (int, float)) or (isinstance(raw, str) and raw.replace(".", "", 1).isdigit()):
+        ts = float(raw)
+        return int(ts / 1000 if ts > 1e11 else ts)  # milliseconds from some exporters
+    if isinstance(raw, str):
+        text = raw.strip()
+        if text.endswith("Z"):
+            text = text[:-1] + "+00:00"
+        try:
+            return int(datetime.fromisoformat(text).timestamp())
+        except ValueError:
+            pass
+    raise ImportRowError(f"Bad timestamp: {raw!r}")
+
+
+def convert_unit(value: float, unit: Optional[str], target: str) -> float:
+    if not unit or unit.lower() == target.lower():
+        return value
+    try:
+        base, factor = UNIT_FACTORS[unit.lower()]
+        target_base, target_factor = UNIT_FACTORS[target.lower()]
+    except KeyError:
+        raise ImportRowError(f"Unknown unit: {unit!r}") from None
+    if base != target_base:
+        raise ImportRowError(f"Cannot convert {unit} to {target}")
+    return value * factor / target_factor
+
+
+def parse_row(row: dict, units: Dict[str, str]) -> Tuple[str, float, int]:
+    """Validate one raw row into ``(resource, value, ts)`` in the resource's unit."""
+    if isinstance(row, ImportRowError):
+        raise row
+    if not isinstance(row, dict):
+        raise ImportRowError(f"Not an object: {str(row)[:40]!r}")
+    resource = str(_field(row, "resource") or "").strip().lower()
+    if resource not in units:
+        raise ImportRowError(f"Unknown resource: {resource!r}")
+    try:
+        value = float(_field(row, "value"))
+    except (TypeError, ValueError):
+        raise ImportRowError(f"Bad value: {_field(row, 'value')!r}") from None
+    if value < 0 or value != value:
+        raise ImportRowError(f"Bad value: {value!r}")
+    ts = parse_timestamp(_field(row, "ts"))
+    return resource, convert_unit(value, _field(row, "unit"), units[resource]), ts
+
+
+# 🚚 Import
+
+def import_file(path: str, user_id: int, db: Optional[Database] = None, fmt: Optional[str] = None,
+                batch_size: int = BATCH_SIZE,
+                progress: Optional[Callable[[int, float], None]] = None) -> ImportResult:
+    """Import ``path`` for ``user_id``, committing every ``batch_size`` readings.
+
+    ``progress(rows_imported, fraction_read)`` is called after every batch,
+    from the importing thread.
+    """
+    db = db or get_database()
+    fmt = fmt or ("json" if path.lower().endswith((".json", ".jsonl", ".ndjson")) else "csv")
+    units = {name: unit for name, (_id, unit) in db.resources().items()}
+    size = os.path.getsize(path) or 1
+    read = [0]
+    imported = skipped = 0
+    errors = []
+    batch = []
+
+    with open(path, newline="", encoding="utf-8-sig") as handle:
+        if fmt == "json":
+            rows = iter_json(_counting_chunks(handle, read, CHUNK_SIZE))
+        else:
+            rows = iter_csv(_counting_lines(handle, read))
+        line_no = 0
+        try:
+            for line_no, row in enumerate(rows, start=1):
+                try:
+                    resource, value, ts = parse_row(row, units)
+                except ImportRowError as exc:
+                    skipped += 1
+                    if len(errors) < MAX_ERRORS:
+                        errors.append(f"row {line_no}: {exc}")
+                    continue
+                batch.append((user_id, resource, value, ts))
+                if len(batch) >= batch_size:
+                    # Each batch commits on its own, so the write lock is never held for the whole file
+                    imported += db.add_readings(batch)
+                    batch = []
+                    if progress:
+                        progress(imported, min(read[0] / size, 1.0))
+        except ImportRowError as exc:
+            # A truncated file: keep what was read before the damage
+            errors.append(f"after row {line_no}: {exc}")
+        if batch:
+            imported += db.add_readings(batch)
+    if progress:
+        progress(imported, 1.0)
+    return ImportResult(imported, skipped, errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import smart-meter readings for a user.")
+    parser.add_argument("path")
+    parser.add_argument("--user", type=int, required=True, help="user id to import into")
+    parser.add_argument("--format", choices=("csv", "json"))
+    args = parser.parse_args()
+
+    result = import_file(args.path, args.user, fmt=args.format,
+                         progress=lambda rows, fraction: print(f"\r{fraction:6.1%}  {rows} rows", end=""))
+    print(f"\nImported {result.imported} readings, skipped {result.skipped}.")
+    for error in result.errors:
+        print("  " + error)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""Opt-in timing for SQL statements, UI callbacks and frames.
+
+Start the app with ``ECOSTAR_INSTRUMENT=1`` and every SQL statement run
+through :class:`database.Database`, every database worker job, every
+callback decorated with :func:`instrumented` and every frame is recorded:
+call counts, a latency histogram per name, rows returned by queries and
+total time. A query is timed from ``execute()`` until its last row has been
+fetched (or the cursor is closed or dropped), so lazily fetched rows count
+against the statement that produced them. The data is shown on the hidden
+diagnostics panel in Settings (tap the heading five times) and can be
+exported as JSON.
+
+When the variable is unset nothing is wrapped: connections are plain
+``sqlite3`` connections and :func:`instrumented` returns the function
+unchanged, so the cost is zero.
+"""
+import functools
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Tuple
+
+ENABLED = bool(os.environ.get("ECOSTAR_INSTRUMENT"))
+
+# Upper bounds of the histogram buckets in milliseconds; the last bucket is open-ended
+BUCKETS_MS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 16.7, 25, 50, 100, 250, 500, 1000)
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+
+    def add(self, seconds: float, rows: int = 0) -> None:
+        ms = seconds * 1000
+        self.counts[bisect_left(BUCKETS_MS, ms)] += 1
+        self.calls += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+        self.rows += rows
+
+    def percentile(self, fraction: float) -> float:
+        """Upper bound of the bucket holding the given fraction of calls."""
+        target = self.calls * fraction
+        seen = 0
+        for bound, count in zip(BUCKETS_MS + (self.max,), self.counts):
+            seen += count
+            if seen >= target:
+                return min(bound, self.max)
+        return self.max
+
+    def as_dict(self) -> dict:
+        return {
+            "calls": self.calls,
+            "total_ms": round(self.total, 3),
+            "mean_ms": round(self.total / self.calls, 3) if self.calls else 0.0,
+            "p50_ms": self.percentile(0.5),
+            "p95_ms": self.percentile(0.95),
+            "max_ms": round(self.max, 3),
+            "rows": self.rows,
+            "histogram": dict(zip([f"<={bound}" for bound in BUCKETS_MS] + [f">{BUCKETS_MS[-1]}"], self.counts)),
+        }
+
+
+_stats: Dict[Tuple[str, str], Histogram] = {}
+# Re-entrant: a cursor dropped by the garbage collector while the lock is held records itself
+_lock = threading.RLock()
+
+
+def record(kind: str, name: str, seconds: float, rows: int = 0) -> None:
+    with _lock:
+        histogram = _stats.get((kind, name))
+        if histogram is None:
+            histogram = _stats[(kind, name)] = Histogram()
+        histogram.add(seconds, rows)
+
+
+def reset() -> None:
+    with _lock:
+        _stats.clear()
+
+
+def snapshot() -> dict:
+    """``{kind: {name: stats}}``, slowest total first."""
+    with _lock:
+        items = sorted(_stats.items(), key=lambda item: -item[1].total)
+        report = {}
+        for (kind, name), histogram in items:
+            report.setdefault(kind, {})[name] = histogram.as_dict()
+    return report
+
+
+def export_json(path: str) -> str:
+    with open(path, "w") as handle:
+        json.dump({"enabled": ENABLED, "exported_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                   "stats": snapshot()}, handle, indent=2)
+    return path
+
+
+# 🗄️ SQL
+
+def statement_name(sql: str) -> str:
+    return _WHITESPACE.sub(" ", sql).strip()[:120]
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Times a query until its rows are consumed and records it once, with the rows fetched."""
+    statement = None
+    elapsed = 0.0
+    rows = 0
+
+    def _fetched(self, started: float, rows: int, done: bool) -> None:
+        if self.statement is None:
+            return
+        self.elapsed += time.perf_counter() - started
+        self.rows += rows
+        if done:
+            self._finish()
+
+    def _finish(self) -> None:
+        statement, self.statement = self.statement, None
+        if statement is not None:
+            record("sql", statement, self.elapsed, self.rows)
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(started, row is not None, row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        started = time.perf_counter()
+        rows = super().fetchmany(size)
+        self._fetched(started, len(rows), len(rows) < size)
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(started, len(rows), True)
+        return rows
+
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._fetched(started, 0, True)
+            raise
+        self._fetched(started, 1, False)
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        # Callers often read a single row with fetchone() and drop the cursor
+        self._finish()
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    def _timed(self, method, sql, *args):
+        cursor = self.cursor(InstrumentedCursor)
+        name = statement_name(sql)
+        started = time.perf_counter()
+        try:
+            getattr(cursor, method)(sql, *args)
+        except BaseException:
+            record("sql", name, time.perf_counter() - started)
+            raise
+        if cursor.description is None:
+            # A write: rowcount is the rows it changed
+            record("sql", name, time.perf_counter() - started, max(cursor.rowcount, 0))
+        else:
+            # A query: recorded by the cursor once its rows are consumed
+            cursor.elapsed = time.perf_counter() - started
+            cursor.statement = name
+        return cursor
+
+    def execute(self, sql, *args):
+        return self._timed("execute", sql, *args)
+
+    def executemany(self, sql, *args):
+        return self._timed("executemany", sql, *args)
+
+
+def connect_kwargs() -> dict:
+    """Extra ``sqlite3.connect`` arguments: the instrumented factory when enabled, else nothing."""
+    return {"factory": InstrumentedConnection} if ENABLED else {}
+
+
+# ⏱️ Callbacks and frames
+
+def instrumented(name: str) -> Callable[[Callable], Callable]:
+    """Record each call of the decorated function under ``name``; a no-op when disabled."""
+    def decorate(fn):
+        if not ENABLED:
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                record("callback", name, time.perf_counter() - started)
+        return wrapper
+    return decorate
+
+
+def start_frame_sampling() -> None:
+    """Record every frame interval from the Kivy clock."""
+    if not ENABLED:
+        return
+    from kivy.clock import Clock
+
+    Clock.schedule_interval(lambda dt: record("frame", "frame", dt), 0)
@@ -0,0 +1,130 @@
+import os
+
+import startup
+
+# Before any other import, so the profile sees all of them
+startup.enable_from_env()
+
+from kivy.app import App  # noqa: E402
+from kivy.clock import Clock  # noqa: E402
+from kivy.core.window import Window  # noqa: E402
+from kivy.uix.screenmanager import ScreenManager, Screen, NoTransition  # noqa: E402
+
+from database import get_database  # noqa: E402
+from db_worker import get_worker  # noqa: E402
+from instrumentation import start_frame_sampling  # noqa: E402
+from widgets import set_backgrounds_active  # noqa: E402
+from write_queue import get_write_queue  # noqa: E402
+
+# 🪟 Window size and background colour for every page
+SCREEN_WINDOWS = {
+    "splash": ((800, 400), (0, 0, 0, 1)),
+    "login": ((950, 600), (0, 0, 0, 1)),
+    "register": ((900, 600), (0, 0, 0, 1)),
+    "home": ((800, 600), (0.937, 0.98, 0.941, 1)),  # #effaf0
+}
+
+
+# 🌿 One long-lived app hosting every page as a screen
+class EcoStarApp(App):
+    title = "EcoStar Pro"
+
+    def __init__(self, start_screen="splash", user_id=None, **kwargs):
+        super().__init__(**kwargs)
+        self.start_screen = start_screen
+        self.user_id = user_id
+
+    def build(self):
+        startup.watch_first_frame()
+        self.manager = ScreenManager(transition=NoTransition())
+        self.navigate_to(self.start_screen, user_id=self.user_id)
+        return self.manager
+
+    def on_start(self):
+        start_frame_sampling()
+        # Forecasts are trained out of process; start them once the first frames are out
+        Clock.schedule_once(self.refresh_forecasts, 1)
+        Clock.schedule_once(self.backup_if_due, 5)
+        if os.environ.get("ECOSTAR_SYNC_URL"):
+            Clock.schedule_once(self.sync_if_configured, 3)
+
+    def refresh_forecasts(self, dt):
+        from forecasting import refresh_in_background
+
+        refresh_in_background()
+
+    def backup_if_due(self, dt):
+        from backup import MAX_AGE, backup_in_background
+
+        backup_in_background(max_age=MAX_AGE)
+
+    def sync_if_configured(self, dt):
+        from forecasting import schedule_refresh
+        from sync import sync_in_background
+
+        def done(result, error):
+            # Pulled readings and edits make those users' forecasts stale
+            if result is not None and result.pulled:
+                schedule_refresh()
+
+        sync_in_background(on_done=done)
+
+    def on_stop(self):
+        get_write_queue().stop()
+        get_worker().stop()
+        get_database().close()
+
+    def build_page(self, page):
+        # Pages are imported on first use; the splash warms the rest up in the background
+        if page == "splash":
+            from SplashScreen import ModernSplash
+            return ModernSplash()
+        if page == "login":
+            from LoginPage import LoginPage
+            return LoginPage()
+        if page == "register":
+            from RegisterPage import RegisterPage
+            return RegisterPage()
+        if page == "home":
+            from HomePage import DrawerApp
+            return DrawerApp(user_id=self.user_id)
+        raise ValueError(f"Unknown page: {page}")
+
+    def navigate_to(self, page, user_id=None):
+        if page == "home":
+            # The home screen belongs to one user, rebuild it on every login
+            self.user_id = user_id
+            self.drop_screen("home")
+        elif page == "login" and self.user_id is not None:
+            # Logging out forgets the user and their dashboard
+            self.user_id = None
+            self.drop_screen("home")
+
+        if not self.manager.has_screen(page):
+            screen = Screen(name=page)
+            screen.add_widget(self.build_page(page))
+            # Backgrounds only animate while their screen is showing
+            screen.bind(on_enter=lambda screen: set_backgrounds_active(screen, True),
+                        on_leave=lambda screen: set_backgrounds_active(screen, False))
+            self.manager.add_widget(screen)
+
+        size, clearcolor = SCREEN_WINDOWS[page]
+        Window.size = size
+        Window.clearcolor = clearcolor
+
+        previous = self.manager.current
+        self.manager.current = page
+
+        # The splash is shown once, free it as soon as we leave
+        if previous == "splash" and page != "splash":
+            self.drop_screen("splash")
+
+    def drop_screen(self, page):
+        if self.manager.has_screen(page) and self.manager.current != page:
+            screen = self.manager.get_screen(page)
+            set_backgrounds_active(screen, False)
+            self.manager.remove_widget(screen)
+
+
+if __name__ == "__main__":
+    EcoStarApp().run()
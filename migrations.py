@@ -0,0 +1,312 @@
+"""Versioned schema migrations keyed on ``PRAGMA user_version``.
+
+Each migration is a ``(version, function)`` pair applied in order. Pending
+migrations run once, together, in a single transaction; once the database
+is current, :func:`migrate` is a single pragma read. To change the schema,
+append a new step - never edit one that has shipped. Steps change the schema
+and move data; tables derived from the readings are filled afterwards (see
+``REBUILDS``).
+"""
+import sqlite3
+import uuid
+from typing import List
+
+from anomaly import observe
+from recommendations import generate_tips
+from rollups import rollup_extremes, rollup_readings
+
+
+def _initial_schema(conn: sqlite3.Connection) -> None:
+    conn.execute('''CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT UNIQUE NOT NULL,
+        password TEXT NOT NULL,
+        name TEXT,
+        email TEXT)''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS consumption (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            electricity REAL DEFAULT 0,
+            water REAL DEFAULT 0,
+            gas REAL DEFAULT 0,
+            entry_date DATE DEFAULT (DATE('now')),
+            oil REAL DEFAULT 0,
+            cng REAL DEFAULT 0,
+            petrol REAL DEFAULT 0,
+            FOREIGN KEY(user_id) REFERENCES users(id)
+        )
+    ''')
+    # Databases created before versioning may predate the oil/cng/petrol columns
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(consumption)")}
+    for column in ("oil", "cng", "petrol"):
+        if column not in columns:
+            conn.execute(f"ALTER TABLE consumption ADD COLUMN {column} REAL DEFAULT 0")
+
+
+# Seed resource types; new ones are added as rows, never as columns
+RESOURCES = (
+    ("electricity", "kWh"),
+    ("water", "L"),
+    ("gas", "m3"),
+    ("oil", "L"),
+    ("cng", "kg"),
+    ("petrol", "L"),
+)
+
+
+def _readings_table(conn: sqlite3.Connection) -> None:
+    conn.execute('''CREATE TABLE resources (
+        id INTEGER PRIMARY KEY,
+        name TEXT UNIQUE NOT NULL,
+        unit TEXT NOT NULL)''')
+    conn.executemany("INSERT INTO resources (name, unit) VALUES (?, ?)", RESOURCES)
+
+    # One append-only row per reading; ts is unix seconds
+    conn.execute('''CREATE TABLE readings (
+        id INTEGER PRIMARY KEY,
+        user_id INTEGER NOT NULL REFERENCES users(id),
+        resource_id INTEGER NOT NULL REFERENCES resources(id),
+        ts INTEGER NOT NULL,
+        value REAL NOT NULL)''')
+    # Covering index: per-user/resource range scans and sums never touch the table
+    conn.execute("CREATE INDEX idx_readings_user_resource_ts ON readings (user_id, resource_id, ts, value)")
+
+    # Unpivot the wide consumption rows, one reading per non-zero column
+    for name, _unit in RESOURCES:
+        conn.execute(f'''
+            INSERT INTO readings (user_id, resource_id, ts, value)
+            SELECT c.user_id, r.id, CAST(strftime('%s', COALESCE(c.entry_date, 'now')) AS INTEGER), c.{name}
+            FROM consumption c JOIN resources r ON r.name = ?
+            WHERE c.user_id IS NOT NULL AND c.{name} IS NOT NULL AND c.{name} != 0
+            ORDER BY c.id
+        ''', (name,))
+    conn.execute("DROP TABLE consumption")
+
+
+def _rollups_table(conn: sqlite3.Connection) -> None:
+    conn.execute('''CREATE TABLE rollups (
+        user_id INTEGER NOT NULL,
+        period TEXT NOT NULL,
+        bucket INTEGER NOT NULL,
+        resource_id INTEGER NOT NULL,
+        total REAL NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (user_id, period, bucket, resource_id)) WITHOUT ROWID''')
+
+
+def _anomaly_tables(conn: sqlite3.Connection) -> None:
+    # Running robust baseline per user and resource
+    conn.execute('''CREATE TABLE reading_stats (
+        user_id INTEGER NOT NULL,
+        resource_id INTEGER NOT NULL,
+        n INTEGER NOT NULL,
+        center REAL NOT NULL,
+        spread REAL NOT NULL,
+        PRIMARY KEY (user_id, resource_id)) WITHOUT ROWID''')
+    conn.execute('''CREATE TABLE anomalies (
+        id INTEGER PRIMARY KEY,
+        user_id INTEGER NOT NULL REFERENCES users(id),
+        resource_id INTEGER NOT NULL REFERENCES resources(id),
+        reading_id INTEGER,
+        ts INTEGER NOT NULL,
+        value REAL NOT NULL,
+        score REAL NOT NULL,
+        detector TEXT NOT NULL,
+        dismissed INTEGER NOT NULL DEFAULT 0)''')
+    conn.execute("CREATE INDEX idx_anomalies_user_ts ON anomalies (user_id, dismissed, ts)")
+    conn.execute("CREATE INDEX idx_anomalies_reading ON anomalies (reading_id)")
+
+
+def _user_data_version(conn: sqlite3.Connection) -> None:
+    conn.execute("ALTER TABLE users ADD COLUMN data_version INTEGER NOT NULL DEFAULT 0")
+
+
+def _recommendations_table(conn: sqlite3.Connection) -> None:
+    conn.execute('''CREATE TABLE recommendations (
+        id INTEGER PRIMARY KEY,
+        user_id INTEGER NOT NULL REFERENCES users(id),
+        rule_id TEXT NOT NULL,
+        category TEXT NOT NULL,
+        message TEXT NOT NULL,
+        priority INTEGER NOT NULL,
+        created_at INTEGER NOT NULL,
+        is_read INTEGER NOT NULL DEFAULT 0,
+        UNIQUE (user_id, rule_id))''')
+    conn.execute("CREATE INDEX idx_recommendations_user ON recommendations (user_id, is_read, priority)")
+
+
+def _history_index(conn: sqlite3.Connection) -> None:
+    # Keyset pagination over all of a user's readings, newest first; the rowid rides along as the tie-breaker
+    conn.execute("CREATE INDEX idx_readings_user_ts ON readings (user_id, ts)")
+
+
+def _hourly_extremes(conn: sqlite3.Connection) -> None:
+    conn.execute('''CREATE TABLE hourly_extremes (
+        user_id INTEGER NOT NULL,
+        resource_id INTEGER NOT NULL,
+        hour INTEGER NOT NULL,
+        low REAL NOT NULL,
+        high REAL NOT NULL,
+        PRIMARY KEY (user_id, resource_id, hour)) WITHOUT ROWID''')
+
+
+def _user_admin_search(conn: sqlite3.Connection) -> None:
+    conn.execute("ALTER TABLE users ADD COLUMN is_admin INTEGER NOT NULL DEFAULT 0")
+    # Existing installs keep a way into the admin console: the first account
+    conn.execute("UPDATE users SET is_admin=1 WHERE id=(SELECT MIN(id) FROM users)")
+    # Full-text index over the users table itself (external content); usernames are mostly unique tokens,
+    # so prefix indexes keep short queries from expanding thousands of them
+    conn.execute('''CREATE VIRTUAL TABLE users_fts USING fts5(
+        username, name, email, content='users', content_rowid='id', prefix='1 2 3 4')''')
+    conn.execute('''CREATE TRIGGER users_fts_insert AFTER INSERT ON users BEGIN
+        INSERT INTO users_fts (rowid, username, name, email) VALUES (new.id, new.username, new.name, new.email);
+    END''')
+    conn.execute('''CREATE TRIGGER users_fts_delete AFTER DELETE ON users BEGIN
+        INSERT INTO users_fts (users_fts, rowid, username, name, email)
+        VALUES ('delete', old.id, old.username, old.name, old.email);
+    END''')
+    # Only the indexed columns: data_version bumps on every write must not touch the index
+    conn.execute('''CREATE TRIGGER users_fts_update AFTER UPDATE OF username, name, email ON users BEGIN
+        INSERT INTO users_fts (users_fts, rowid, username, name, email)
+        VALUES ('delete', old.id, old.username, old.name, old.email);
+        INSERT INTO users_fts (rowid, username, name, email) VALUES (new.id, new.username, new.name, new.email);
+    END''')
+    conn.execute("INSERT INTO users_fts (users_fts) VALUES ('rebuild')")
+
+
+# Unix time in milliseconds, for last-writer-wins ordering of user edits
+NOW_MS = "CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER)"
+# Set while sync applies pulled changes, so they are not logged as local edits
+NOT_APPLYING = "NOT EXISTS (SELECT 1 FROM sync_state WHERE key='applying')"
+
+
+def _sync_tracking(conn: sqlite3.Connection) -> None:
+    # Pulled readings remember the device that recorded them and their id there; local readings leave both NULL
+    conn.execute("ALTER TABLE readings ADD COLUMN origin TEXT")
+    conn.execute("ALTER TABLE readings ADD COLUMN origin_id INTEGER")
+    conn.execute("CREATE UNIQUE INDEX idx_readings_origin ON readings (origin, origin_id) WHERE origin IS NOT NULL")
+    # Last edit of each account and the device that made it (NULL: this one)
+    conn.execute("ALTER TABLE users ADD COLUMN updated_at INTEGER NOT NULL DEFAULT 0")
+    conn.execute("ALTER TABLE users ADD COLUMN updated_by TEXT")
+
+    conn.execute("CREATE TABLE sync_state (key TEXT PRIMARY KEY, value) WITHOUT ROWID")
+    conn.executemany("INSERT INTO sync_state (key, value) VALUES (?, ?)",
+                     [("device_id", uuid.uuid4().hex), ("pushed_change", 0), ("pushed_reading_id", 0),
+                      ("pulled_users", 0), ("pulled_readings", 0)])
+
+    # Readings are append-only, so their id is their change sequence number; accounts change in place and
+    # get a row here per edit. previous is the old username of a rename.
+    conn.execute('''CREATE TABLE change_log (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT NOT NULL,
+        previous TEXT,
+        op TEXT NOT NULL,
+        changed_at INTEGER NOT NULL)''')
+    conn.execute(f'''CREATE TRIGGER users_sync_insert AFTER INSERT ON users WHEN {NOT_APPLYING} BEGIN
+        UPDATE users SET updated_at = {NOW_MS}, updated_by = NULL WHERE id = new.id;
+        INSERT INTO change_log (username, op, changed_at) VALUES (new.username, 'upsert', {NOW_MS});
+    END''')
+    conn.execute(f'''CREATE TRIGGER users_sync_update AFTER UPDATE OF username, password, name, email, is_admin ON users
+    WHEN {NOT_APPLYING} BEGIN
+        UPDATE users SET updated_at = {NOW_MS}, updated_by = NULL WHERE id = new.id;
+        INSERT INTO change_log (username, previous, op, changed_at)
+        VALUES (new.username, NULLIF(old.username, new.username), 'upsert', {NOW_MS});
+    END''')
+    conn.execute(f'''CREATE TRIGGER users_sync_delete AFTER DELETE ON users WHEN {NOT_APPLYING} BEGIN
+        INSERT INTO change_log (username, op, changed_at) VALUES (old.username, 'delete', {NOW_MS});
+    END''')
+    # A user's readings are deleted before the user. Without AUTOINCREMENT the highest ids can then be handed
+    # out again, so pull the push mark back below them or the new readings would be skipped.
+    conn.execute('''CREATE TRIGGER users_sync_reading_mark AFTER DELETE ON users BEGIN
+        UPDATE sync_state SET value = MIN(value, (SELECT COALESCE(MAX(id), 0) FROM readings))
+        WHERE key = 'pushed_reading_id';
+    END''')
+
+    # Existing accounts go out with the first push
+    conn.execute(f"UPDATE users SET updated_at = {NOW_MS}")
+    conn.execute(f"INSERT INTO change_log (username, op, changed_at) SELECT username, 'upsert', {NOW_MS} "
+                 "FROM users ORDER BY id")
+
+
+MIGRATIONS = [
+    (1, _initial_schema),
+    (2, _readings_table),
+    (3, _rollups_table),
+    (4, _anomaly_tables),
+    (5, _user_data_version),
+    (6, _recommendations_table),
+    (7, _history_index),
+    (8, _hourly_extremes),
+    (9, _user_admin_search),
+    (10, _sync_tracking),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+# 🔁 Derived data
+#
+# Tables that only summarise readings are filled by the live code that maintains them, after the last pending
+# step, when the schema is the one that code is written for. Steps themselves never call into that code, so a
+# shipped step behaves the same however the code changes later.
+
+def _rebuild_rollups(conn: sqlite3.Connection) -> None:
+    rollup_readings(conn)
+
+
+def _rebuild_extremes(conn: sqlite3.Connection) -> None:
+    rollup_extremes(conn)
+
+
+def _rebuild_baselines(conn: sqlite3.Connection) -> None:
+    # Seed baselines from existing history in reading order
+    observe(conn, conn.execute("SELECT id, user_id, resource_id, ts, value FROM readings ORDER BY id").fetchall())
+
+
+def _rebuild_tips(conn: sqlite3.Connection) -> None:
+    for (user_id,) in conn.execute("SELECT DISTINCT user_id FROM rollups").fetchall():
+        generate_tips(conn, user_id)
+
+
+# (version that created the table, rebuild), in dependency order: tips read the rollups
+REBUILDS = [
+    (3, _rebuild_rollups),
+    (8, _rebuild_extremes),
+    (4, _rebuild_baselines),
+    (6, _rebuild_tips),
+]
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection) -> List[int]:
+    """Apply pending migrations and return the versions that ran.
+
+    ``conn`` must be in autocommit mode (``isolation_level=None``) so the
+    whole upgrade, including the version bump, commits or rolls back as one.
+    """
+    if schema_version(conn) >= LATEST_VERSION:
+        return []
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # Re-read under the write lock in case another process just migrated
+        current = schema_version(conn)
+        applied = []
+        for version, step in MIGRATIONS:
+            if version > current:
+                step(conn)
+                applied.append(version)
+        for version, rebuild in REBUILDS:
+            if version > current:
+                rebuild(conn)
+        if applied:
+            conn.execute(f"PRAGMA user_version = {LATEST_VERSION}")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+    return applied
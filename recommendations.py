@@ -0,0 +1,112 @@
+"""Rule-based saving tips (the ``Recommendation`` class from the UML).
+
+``RULES`` is a table of conditions over a user's aggregated consumption for
+one resource, read from the ``day`` rollups: the last 7 days against the
+average of the 4 weeks before, and the direction of the last three weeks.
+:func:`generate_tips` re-evaluates only the rules for resources that just
+received data, inside the writing transaction, and stores the tips that
+hold in ``recommendations``; rules that stop holding drop their tip. The
+home screen reads the stored tips and never evaluates rules itself.
+"""
+import sqlite3
+import time
+from collections import namedtuple
+from typing import Iterable, List, Optional
+
+from rollups import bucket_sql
+
+HIGH, MEDIUM, LOW = 1, 2, 3
+PRIORITY_NAMES = {HIGH: "High", MEDIUM: "Medium", LOW: "Low"}
+
+WEEK = 7 * 86400
+
+# Aggregates a rule looks at; weeks are rolling 7-day windows ending today
+Usage = namedtuple("Usage", "last_week baseline weeks")
+
+Rule = namedtuple("Rule", "rule_id resource category priority condition message")
+
+
+def above_baseline(ratio):
+    def condition(usage):
+        return usage.baseline > 0 and usage.last_week > usage.baseline * ratio
+    return condition
+
+
+def rising(usage):
+    first, middle, last = usage.weeks
+    return first > 0 and first < middle < last and last > first * 1.15
+
+
+RULES = (
+    Rule("electricity_high", "electricity", "Energy", HIGH, above_baseline(1.25),
+         "Electricity use is {pct:.0f}% above your usual week. Check for appliances left on standby."),
+    Rule("electricity_rising", "electricity", "Energy", LOW, rising,
+         "Electricity use has gone up three weeks running. LED bulbs and efficient settings can reverse it."),
+    Rule("water_high", "water", "Water", HIGH, above_baseline(1.3),
+         "Water use is {pct:.0f}% above normal. Look for leaking taps or a running toilet."),
+    Rule("gas_high", "gas", "Gas", MEDIUM, above_baseline(1.25),
+         "Gas use is {pct:.0f}% above your usual week. Lowering the thermostat by 1°C saves around 10%."),
+    Rule("oil_high", "oil", "Energy", MEDIUM, above_baseline(1.3),
+         "Heating oil use is {pct:.0f}% above normal. Check insulation and boiler servicing."),
+    Rule("petrol_rising", "petrol", "Fuel", MEDIUM, rising,
+         "Petrol use has risen three weeks in a row. Combining trips or car-pooling could cut it."),
+    Rule("cng_rising", "cng", "Fuel", LOW, rising,
+         "CNG use has risen three weeks in a row. Check tyre pressure and plan routes to save fuel."),
+)
+
+
+def usage_for(conn: sqlite3.Connection, user_id: int, resource_id: int, now: int) -> Usage:
+    """Rolling weekly aggregates for one resource from the last 35 daily buckets."""
+    today = conn.execute(f"SELECT {bucket_sql('day', '?')}", (now,)).fetchone()[0]
+    weeks = [0.0] * 5  # index 0 = the 7 days ending today, 4 = five weeks ago
+    for bucket, total in conn.execute('''
+            SELECT bucket, total FROM rollups
+            WHERE user_id=? AND period='day' AND bucket > ? AND bucket <= ? AND resource_id=?
+            ''', (user_id, today - 5 * WEEK, today, resource_id)):
+        weeks[min(int((today - bucket) // WEEK), 4)] += total
+    return Usage(weeks[0], sum(weeks[1:]) / 4, (weeks[2], weeks[1], weeks[0]))
+
+
+def generate_tips(conn: sqlite3.Connection, user_id: int, resource_ids: Optional[Iterable[int]] = None,
+                  now: Optional[int] = None) -> int:
+    """Re-evaluate the rules for ``resource_ids`` (default: all) and store the tips that hold.
+
+    Call inside a write transaction; returns how many tips are active for those resources.
+    """
+    now = int(time.time()) if now is None else now
+    names = {name: resource_id for resource_id, name in conn.execute("SELECT id, name FROM resources")}
+    wanted = set(names.values()) if resource_ids is None else set(resource_ids)
+    active = 0
+    usage_cache = {}
+    for rule in RULES:
+        resource_id = names.get(rule.resource)
+        if resource_id not in wanted:
+            continue
+        if resource_id not in usage_cache:
+            usage_cache[resource_id] = usage_for(conn, user_id, resource_id, now)
+        usage = usage_cache[resource_id]
+        if rule.condition(usage):
+            pct = (usage.last_week / usage.baseline - 1) * 100 if usage.baseline else 0.0
+            # A tip that is already stored keeps its read state and creation time
+            conn.execute('''
+                INSERT INTO recommendations (user_id, rule_id, category, message, priority, created_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (user_id, rule_id) DO UPDATE SET message = excluded.message
+            ''', (user_id, rule.rule_id, rule.category, rule.message.format(pct=pct), rule.priority, now))
+            active += 1
+        else:
+            conn.execute("DELETE FROM recommendations WHERE user_id=? AND rule_id=?", (user_id, rule.rule_id))
+    return active
+
+
+def get_user_tips(conn: sqlite3.Connection, user_id: int, limit: int = 3) -> List[tuple]:
+    """Unread ``(id, category, message, priority)`` tips, most important first."""
+    return conn.execute('''
+        SELECT id, category, message, priority FROM recommendations
+        WHERE user_id=? AND is_read=0 ORDER BY priority, created_at DESC LIMIT ?
+    ''', (user_id, limit)).fetchall()
+
+
+def mark_as_read(conn: sqlite3.Connection, user_id: int, recommendation_id: int) -> bool:
+    return conn.execute("UPDATE recommendations SET is_read=1 WHERE id=? AND user_id=?",
+                        (recommendation_id, user_id)).rowcount > 0
@@ -0,0 +1,221 @@
+"""Streaming export of a user's readings or rollups to CSV, Parquet or Arrow.
+
+Rows come from one query on a separate read-only connection, so the export
+reads a consistent snapshot without holding the app's connections, and are
+pulled ``BATCH_SIZE`` at a time through a generator. Each batch is written
+out before the next is fetched: memory stays at one batch however many years
+of readings are exported. Parquet and Arrow (IPC file) output need the
+optional ``pyarrow`` package; CSV has no dependencies.
+
+The CSV header for readings (``timestamp,resource,value,unit``) is one that
+importer.py accepts, so an export can be imported again.
+
+    python reports.py --user 1 readings.csv
+    python reports.py --user 1 --kind rollups --period month --format parquet monthly.parquet
+"""
+import argparse
+import csv
+import os
+import sqlite3
+from collections import namedtuple
+from pathlib import Path
+from typing import Callable, Iterator, List, Optional
+
+import instrumentation
+from database import Database, get_database
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+HAS_PYARROW = pa is not None
+
+# Rows fetched and written at a time
+BATCH_SIZE = 50000
+
+FORMATS = ("csv", "parquet", "arrow")
+KINDS = ("readings", "rollups")
+
+ExportResult = namedtuple("ExportResult", "path rows format")
+
+# CSV gets ISO 8601 times formatted by SQLite; the columnar formats keep unix seconds as a timestamp column
+ISO_TS = "strftime('%Y-%m-%dT%H:%M:%SZ', {column}, 'unixepoch')"
+
+COLUMNS = {
+    "readings": ("timestamp", "resource", "value", "unit"),
+    "rollups": ("period", "bucket", "resource", "total", "count", "unit"),
+}
+
+
+class ExportError(ValueError):
+    pass
+
+
+# 🔎 Query
+
+def _query(kind: str, user_id: int, resource_id: Optional[int], start: Optional[int], end: Optional[int],
+           period: str, iso: bool):
+    if kind == "readings":
+        ts = ISO_TS.format(column="r.ts") if iso else "r.ts"
+        # Same order as the (user_id, ts) index, so SQLite streams rows without sorting them
+        sql = f'''SELECT {ts}, s.name, r.value, s.unit FROM readings r JOIN resources s ON s.id = r.resource_id
+                  WHERE r.user_id=?'''
+        params = [user_id]
+        alias, column = "r", "r.ts"
+    else:
+        bucket = ISO_TS.format(column="u.bucket") if iso else "u.bucket"
+        sql = f'''SELECT u.period, {bucket}, s.name, u.total, u.count, s.unit
+                  FROM rollups u JOIN resources s ON s.id = u.resource_id
+                  WHERE u.user_id=? AND u.period=?'''
+        params = [user_id, period]
+        alias, column = "u", "u.bucket"
+    if resource_id is not None:
+        sql += f" AND {alias}.resource_id=?"
+        params.append(resource_id)
+    if start is not None:
+        sql += f" AND {column} >= ?"
+        params.append(start)
+    if end is not None:
+        sql += f" AND {column} < ?"
+        params.append(end)
+    order = "r.ts, r.id" if kind == "readings" else "u.bucket, u.resource_id"
+    return sql + f" ORDER BY {order}", params
+
+
+def _read_connection(path: str) -> sqlite3.Connection:
+    """A read-only connection of its own; in WAL mode its snapshot never blocks writers."""
+    return sqlite3.connect(Path(path).resolve().as_uri() + "?mode=ro", uri=True,
+                           **instrumentation.connect_kwargs())
+
+
+def iter_batches(db: Database, user_id: int, kind: str = "readings", resource: Optional[str] = None,
+                 start: Optional[int] = None, end: Optional[int] = None, period: str = "day",
+                 iso: bool = True, batch_size: int = BATCH_SIZE) -> Iterator[List[tuple]]:
+    """Rows of ``COLUMNS[kind]`` in time order, ``batch_size`` at a time."""
+    if kind not in KINDS:
+        raise ExportError(f"Unknown export kind: {kind!r}")
+    resource_id = db.resource_id(resource) if resource is not None else None
+    sql, params = _query(kind, user_id, resource_id, start, end, period, iso)
+    conn = _read_connection(db.path)
+    try:
+        cursor = conn.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        conn.close()
+
+
+# 💾 Writers
+
+def _write_csv(path: str, kind: str, batches: Iterator[List[tuple]], written: Callable[[int], None]) -> None:
+    with open(path, "w", newline="", encoding="utf-8") as handle:
+        writer = csv.writer(handle)
+        writer.writerow(COLUMNS[kind])
+        for rows in batches:
+            writer.writerows(rows)
+            written(len(rows))
+
+
+def _arrow_schema(kind: str):
+    ts = pa.timestamp("s", tz="UTC")
+    if kind == "readings":
+        return pa.schema([("timestamp", ts), ("resource", pa.string()), ("value", pa.float64()),
+                          ("unit", pa.string())])
+    return pa.schema([("period", pa.string()), ("bucket", ts), ("resource", pa.string()),
+                      ("total", pa.float64()), ("count", pa.int64()), ("unit", pa.string())])
+
+
+def _write_arrow(path: str, kind: str, fmt: str, batches: Iterator[List[tuple]],
+                 written: Callable[[int], None]) -> None:
+    schema = _arrow_schema(kind)
+    if fmt == "parquet":
+        writer = pq.ParquetWriter(path, schema, compression="zstd")
+    else:
+        writer = pa.ipc.new_file(path, schema)
+    try:
+        for rows in batches:
+            columns = [pa.array(values, type=field.type) for values, field in zip(zip(*rows), schema)]
+            writer.write_batch(pa.RecordBatch.from_arrays(columns, schema=schema))
+            written(len(rows))
+    finally:
+        writer.close()
+
+
+# 📤 Export
+
+def export(path: str, user_id: int, db: Optional[Database] = None, fmt: Optional[str] = None,
+           kind: str = "readings", resource: Optional[str] = None, start: Optional[int] = None,
+           end: Optional[int] = None, period: str = "day", batch_size: int = BATCH_SIZE,
+           progress: Optional[Callable[[int], None]] = None) -> ExportResult:
+    """Stream ``user_id``'s data with ``start <= ts < end`` to ``path``.
+
+    The format follows the extension unless ``fmt`` is given. The file is
+    written next to ``path`` and moved into place once complete, so a failed
+    export never leaves a truncated file behind. ``progress(rows_written)``
+    is called after every batch, from the exporting thread.
+    """
+    db = db or get_database()
+    fmt = fmt or {".parquet": "parquet", ".arrow": "arrow", ".feather": "arrow"}.get(
+        os.path.splitext(path)[1].lower(), "csv")
+    if fmt not in FORMATS:
+        raise ExportError(f"Unknown export format: {fmt!r}")
+    if fmt != "csv" and not HAS_PYARROW:
+        raise ExportError(f"{fmt.title()} export needs pyarrow (pip install pyarrow)")
+
+    batches = iter_batches(db, user_id, kind, resource, start, end, period, iso=fmt == "csv",
+                           batch_size=batch_size)
+    count = [0]
+
+    def written(rows):
+        count[0] += rows
+        if progress:
+            progress(count[0])
+
+    partial = path + ".part"
+    try:
+        if fmt == "csv":
+            _write_csv(partial, kind, batches, written)
+        else:
+            _write_arrow(partial, kind, fmt, batches, written)
+    except BaseException:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+    os.replace(partial, path)
+    return ExportResult(path, count[0], fmt)
+
+
+def main():
+    from datetime import datetime
+
+    parser = argparse.ArgumentParser(description="Export a user's readings or rollups.")
+    parser.add_argument("path")
+    parser.add_argument("--user", type=int, required=True, help="user id to export")
+    parser.add_argument("--format", choices=FORMATS, help="default: from the file extension, else csv")
+    parser.add_argument("--kind", choices=KINDS, default="readings")
+    parser.add_argument("--period", choices=("day", "week", "month"), default="day", help="rollup period")
+    parser.add_argument("--resource")
+    parser.add_argument("--start", help="first day to include, YYYY-MM-DD")
+    parser.add_argument("--end", help="first day to leave out, YYYY-MM-DD")
+    args = parser.parse_args()
+
+    def day(text):
+        return int(datetime.strptime(text, "%Y-%m-%d").timestamp()) if text else None
+
+    try:
+        result = export(args.path, args.user, fmt=args.format, kind=args.kind, resource=args.resource,
+                        start=day(args.start), end=day(args.end), period=args.period,
+                        progress=lambda rows: print(f"\r{rows:,} rows", end=""))
+    except ValueError as exc:
+        parser.error(str(exc))
+    print(f"\nExported {result.rows:,} rows to {result.path}.")
+
+
+if __name__ == "__main__":
+    main()
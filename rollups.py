@@ -0,0 +1,57 @@
+"""Pre-aggregated daily/weekly/monthly totals per user and resource.
+
+``rollups`` holds one row per (user, period, bucket, resource), where a
+bucket is the unix time of the local start of that day, week (Monday) or
+month. Writers call :func:`rollup_readings` in the same transaction as
+their insert, so the table never drifts from ``readings``; readers look up
+a bucket by primary key instead of summing raw readings.
+
+``hourly_extremes`` is the same idea for charts: the lowest and highest
+reading per (user, resource, UTC hour), maintained by :func:`rollup_extremes`.
+"""
+import sqlite3
+
+# SQL expression mapping a unix-seconds value to the start of its bucket
+_BUCKET_MODIFIERS = {
+    "day": "'start of day'",
+    "week": "'start of day', '-6 days', 'weekday 1'",
+    "month": "'start of month'",
+}
+
+PERIODS = tuple(_BUCKET_MODIFIERS)
+
+
+def bucket_sql(period: str, value: str = "ts") -> str:
+    """SQL expression for the bucket of ``value`` (a column name or ``?``)."""
+    modifiers = _BUCKET_MODIFIERS[period]
+    return f"CAST(strftime('%s', {value}, 'unixepoch', 'localtime', {modifiers}, 'utc') AS INTEGER)"
+
+
+def rollup_readings(conn: sqlite3.Connection, after_id: int = 0) -> None:
+    """Fold every reading with ``id > after_id`` into the rollups.
+
+    Must run inside the transaction that inserted those readings.
+    """
+    # NOT INDEXED: without it the planner scans the whole covering index for the GROUP BY instead of
+    # seeking to the new rowids, which made every insert cost O(all readings)
+    for period in PERIODS:
+        conn.execute(f'''
+            INSERT INTO rollups (user_id, period, bucket, resource_id, total, count)
+            SELECT user_id, '{period}', {bucket_sql(period)} AS bucket, resource_id, SUM(value), COUNT(*)
+            FROM readings NOT INDEXED WHERE id > ?
+            GROUP BY user_id, bucket, resource_id
+            ON CONFLICT (user_id, period, bucket, resource_id)
+            DO UPDATE SET total = total + excluded.total, count = count + excluded.count
+        ''', (after_id,))
+
+
+def rollup_extremes(conn: sqlite3.Connection, after_id: int = 0) -> None:
+    """Fold every reading with ``id > after_id`` into the hourly minimum and maximum."""
+    conn.execute('''
+        INSERT INTO hourly_extremes (user_id, resource_id, hour, low, high)
+        SELECT user_id, resource_id, ts / 3600 * 3600 AS hour, MIN(value), MAX(value)
+        FROM readings NOT INDEXED WHERE id > ?
+        GROUP BY user_id, resource_id, hour
+        ON CONFLICT (user_id, resource_id, hour)
+        DO UPDATE SET low = MIN(low, excluded.low), high = MAX(high, excluded.high)
+    ''', (after_id,))
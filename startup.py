@@ -0,0 +1,106 @@
+"""Startup profiling, enabled by setting ``ECOSTAR_PROFILE_STARTUP``.
+
+Set it to a file path (or ``1`` for ``startup_profile.json``) and the app
+writes a JSON report with the time each module took to import, the
+splash's warm-up stages (database open and migrations, fonts, modules) and
+the time to the first drawn frame, all in milliseconds since :func:`enable`.
+The report is rewritten whenever a stage finishes after the first frame.
+
+main.py calls :func:`enable_from_env` before importing anything else; with
+the variable unset every function here is a no-op.
+"""
+import builtins
+import json
+import os
+import sys
+import threading
+import time
+from typing import Optional
+
+DEFAULT_REPORT = "startup_profile.json"
+
+_report_path: Optional[str] = None
+_started = 0.0
+_original_import = builtins.__import__
+_local = threading.local()
+_imports = []
+_stages = {}
+_first_frame: Optional[float] = None
+
+
+def _ms(seconds: float) -> float:
+    return round(seconds * 1000, 3)
+
+
+def _timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+    if level or name in sys.modules:
+        return _original_import(name, globals, locals, fromlist, level)
+    # Nested imports add their time to the parent's children so self time can be split out
+    stack = _local.__dict__.setdefault("stack", [])
+    stack.append(0.0)
+    started = time.perf_counter()
+    try:
+        return _original_import(name, globals, locals, fromlist, level)
+    finally:
+        elapsed = time.perf_counter() - started
+        children = stack.pop()
+        if stack:
+            stack[-1] += elapsed
+        _imports.append({"module": name, "thread": threading.current_thread().name,
+                         "cumulative_ms": _ms(elapsed), "self_ms": _ms(elapsed - children)})
+
+
+def enabled() -> bool:
+    return _report_path is not None
+
+
+def enable(path: str = DEFAULT_REPORT) -> None:
+    global _report_path, _started
+    if enabled():
+        return
+    _report_path = path
+    _started = time.perf_counter()
+    builtins.__import__ = _timed_import
+
+
+def enable_from_env() -> None:
+    value = os.environ.get("ECOSTAR_PROFILE_STARTUP")
+    if value:
+        enable(DEFAULT_REPORT if value == "1" else value)
+
+
+def record(stage: str, seconds: float) -> None:
+    """Store a named stage's duration."""
+    if not enabled():
+        return
+    _stages[stage] = _ms(seconds)
+    if _first_frame is not None:
+        write_report()
+
+
+def watch_first_frame() -> None:
+    """Record the time of the first frame the window draws."""
+    if not enabled():
+        return
+    from kivy.core.window import Window
+
+    def on_flip(window):
+        global _first_frame
+        Window.unbind(on_flip=on_flip)
+        _first_frame = time.perf_counter() - _started
+        write_report()
+
+    Window.bind(on_flip=on_flip)
+
+
+def write_report() -> None:
+    imports = sorted(list(_imports), key=lambda item: item["cumulative_ms"], reverse=True)
+    report = {
+        "first_frame_ms": _ms(_first_frame) if _first_frame is not None else None,
+        "stages_ms": dict(_stages),
+        "import_total_ms": round(sum(item["self_ms"] for item in imports), 3),
+        "imports": imports,
+    }
+    with open(_report_path + ".tmp", "w") as handle:
+        json.dump(report, handle, indent=2)
+    os.replace(_report_path + ".tmp", _report_path)
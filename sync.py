@@ -0,0 +1,344 @@
+"""Delta sync between installs through a sync server (see sync_server.py).
+
+Only changes since the last sync travel, in both directions:
+
+* Readings are append-only, so a reading's id is its change sequence number:
+  a push sends local readings above the ``pushed_reading_id`` mark. Pulled
+  readings keep the device that recorded them and their id there
+  (``origin``/``origin_id``), are never pushed back and are never inserted
+  twice. Restoring a backup gives the install a new device id (see
+  :func:`rebase_after_restore`), so reused ids never clash with pushed ones.
+* Account edits are logged to ``change_log`` by triggers and pushed with
+  their timestamp. Accounts are matched by username and merged
+  last-writer-wins on ``(updated_at, device)``, everywhere the same way, so
+  every device converges on the same account data. Deleting an account
+  deletes its readings on every device.
+
+Payloads are JSON compressed with zlib. Readings are grouped per device,
+user and resource, with ids and timestamps delta-encoded, so a week of
+readings costs kilobytes. Pushes and pulls go in batches of ``BATCH_SIZE``
+readings, and each batch is acknowledged before its mark moves, so an
+interrupted sync resumes where it stopped.
+
+    python sync.py [--url http://127.0.0.1:8765]
+"""
+import argparse
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+import zlib
+from collections import defaultdict, namedtuple
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from database import Database, get_database
+
+SYNC_URL = os.environ.get("ECOSTAR_SYNC_URL", "http://127.0.0.1:8765")
+# Readings per request in either direction
+BATCH_SIZE = 20000
+TIMEOUT = 30
+
+USER_FIELDS = ("password", "name", "email", "is_admin")
+
+SyncResult = namedtuple("SyncResult", "pushed pulled bytes_sent bytes_received seconds")
+
+
+class SyncError(RuntimeError):
+    pass
+
+
+# 📦 Wire format
+
+def encode(payload: dict) -> bytes:
+    return zlib.compress(json.dumps(payload, separators=(",", ":")).encode("utf-8"), 6)
+
+
+def decode(body: bytes) -> dict:
+    try:
+        return json.loads(zlib.decompress(body))
+    except zlib.error as exc:
+        raise ValueError(f"Bad sync payload: {exc}") from None
+
+
+def _deltas(values: List[int]) -> List[int]:
+    return [values[0]] + [b - a for a, b in zip(values, values[1:])] if values else []
+
+
+def _undeltas(deltas: List[int]) -> Iterator[int]:
+    total = 0
+    for delta in deltas:
+        total += delta
+        yield total
+
+
+def pack_readings(rows: Iterable[tuple]) -> List[dict]:
+    """Group ``(origin, origin_id, username, resource, ts, value)`` rows into delta-encoded columns."""
+    groups = defaultdict(lambda: ([], [], []))
+    for origin, origin_id, username, resource, ts, value in rows:
+        ids, stamps, values = groups[(origin, username, resource)]
+        ids.append(origin_id)
+        stamps.append(ts)
+        values.append(value)
+    return [{"origin": origin, "user": username, "resource": resource,
+             "ids": _deltas(ids), "ts": _deltas(stamps), "values": values}
+            for (origin, username, resource), (ids, stamps, values) in groups.items()]
+
+
+def unpack_readings(groups: Iterable[dict]) -> Iterator[tuple]:
+    """The rows :func:`pack_readings` was given, group by group."""
+    for group in groups:
+        for origin_id, ts, value in zip(_undeltas(group["ids"]), _undeltas(group["ts"]), group["values"]):
+            yield group["origin"], origin_id, group["user"], group["resource"], ts, value
+
+
+# 🔄 Client
+
+class SyncClient:
+    def __init__(self, db: Optional[Database] = None, url: str = SYNC_URL, batch_size: int = BATCH_SIZE,
+                 timeout: float = TIMEOUT):
+        self.db = db or get_database()
+        self.url = url.rstrip("/")
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    def post(self, path: str, payload: dict) -> dict:
+        body = encode(payload)
+        request = urllib.request.Request(self.url + path, data=body,
+                                         headers={"Content-Type": "application/octet-stream"})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                reply = response.read()
+        except (urllib.error.URLError, OSError) as exc:
+            raise SyncError(f"Sync server unreachable: {exc}") from None
+        self.bytes_sent += len(body)
+        self.bytes_received += len(reply)
+        return decode(reply)
+
+    def state(self, key: str):
+        row = self.db.conn.execute("SELECT value FROM sync_state WHERE key=?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_state(self, conn, key: str, value) -> None:
+        conn.execute("INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)", (key, value))
+
+    @property
+    def device_id(self) -> str:
+        return self.state("device_id")
+
+    # ⬆️ Push
+
+    def user_changes(self) -> Tuple[int, List[dict]]:
+        """``(last change_log seq, changes)``: the current state of every account edited since the last push."""
+        conn = self.db.conn
+        last = self.state("pushed_change")
+        changes: Dict[str, dict] = {}
+        for seq, username, previous, op, changed_at in conn.execute(
+                "SELECT seq, username, previous, op, changed_at FROM change_log WHERE seq > ? ORDER BY seq",
+                (last,)).fetchall():
+            last = seq
+            if op == "delete":
+                change = {"username": username, "updated_at": changed_at, "deleted": 1}
+            else:
+                row = conn.execute("SELECT password, name, email, is_admin, updated_at FROM users WHERE username=?",
+                                   (username,)).fetchone()
+                if row is None:
+                    continue  # renamed or deleted later; that entry follows
+                change = dict(zip(USER_FIELDS + ("updated_at",), row), username=username)
+                if previous:
+                    # A rename of an account the server may not have seen yet
+                    changes.pop(previous, None)
+                    change["previous"] = previous
+            changes.pop(username, None)
+            changes[username] = change
+        return last, list(changes.values())
+
+    def push(self) -> int:
+        conn = self.db.conn
+        device = self.device_id
+        last_change, users = self.user_changes()
+        mark = self.state("pushed_reading_id")
+        pushed = 0
+        while True:
+            # Readings committed after this point wait for the next push
+            end = conn.execute("SELECT COALESCE(MAX(id), 0) FROM readings").fetchone()[0]
+            # Readings recorded under an identity this install had before a restore go out under that identity
+            rows = conn.execute('''
+                SELECT r.id, COALESCE(r.origin, ?), COALESCE(r.origin_id, r.id), u.username, s.name, r.ts, r.value
+                FROM readings r JOIN users u ON u.id = r.user_id JOIN resources s ON s.id = r.resource_id
+                WHERE r.id > ? AND r.id <= ?
+                  AND (r.origin IS NULL OR r.origin IN (SELECT value FROM sync_state WHERE key LIKE 'former_device:%'))
+                ORDER BY r.id LIMIT ?
+            ''', (device, mark, end, self.batch_size)).fetchall()
+            if rows or users:
+                self.post("/push", {"device": device, "users": users,
+                                    "readings": pack_readings(row[1:] for row in rows)})
+            # Pulled readings above the mark are skipped for good once no local ones are left below them
+            new_mark = rows[-1][0] if len(rows) == self.batch_size else end
+            with self.db.transaction() as tx:
+                # Compare-and-set: deleting an account may have pulled the mark back meanwhile
+                tx.execute("UPDATE sync_state SET value=? WHERE key='pushed_reading_id' AND value=?", (new_mark, mark))
+                if users:
+                    self.set_state(tx, "pushed_change", last_change)
+                    tx.execute("DELETE FROM change_log WHERE seq <= ?", (last_change,))
+            pushed += len(rows) + len(users)
+            users = []
+            mark = new_mark
+            if len(rows) < self.batch_size:
+                return pushed
+
+    # ⬇️ Pull
+
+    def apply_user(self, conn, change: dict) -> None:
+        row = conn.execute("SELECT id, updated_at, COALESCE(updated_by, ?) FROM users WHERE username=?",
+                           (self.device_id, change["username"])).fetchone()
+        if row is not None and (row[1], row[2]) >= (change["updated_at"], change["updated_by"]):
+            return
+        if change.get("deleted"):
+            if row is not None:
+                from admin import delete_user
+
+                delete_user(self.db, row[0])
+            return
+        values = [change["username"], *(change[field] for field in USER_FIELDS),
+                  change["updated_at"], change["updated_by"]]
+        if row is None:
+            conn.execute("INSERT INTO users (username, password, name, email, is_admin, updated_at, updated_by) "
+                         "VALUES (?, ?, ?, ?, ?, ?, ?)", values)
+        else:
+            conn.execute("UPDATE users SET username=?, password=?, name=?, email=?, is_admin=?, updated_at=?, "
+                         "updated_by=? WHERE id=?", values + [row[0]])
+            self.db.touch(row[0])
+
+    def apply(self, reply: dict) -> int:
+        """Apply one pulled page and move the pull marks, in one transaction."""
+        with self.db.transaction() as conn:
+            # Keeps the change-log triggers from recording these as local edits
+            self.set_state(conn, "applying", 1)
+            # Follow renames made elsewhere in order, so the changes below find their accounts
+            for old, new in reply["renames"]:
+                conn.execute("UPDATE users SET username=? WHERE username=? "
+                             "AND NOT EXISTS (SELECT 1 FROM users WHERE username=?)", (new, old, new))
+            for change in reply["users"]:
+                self.apply_user(conn, change)
+            user_ids = dict(conn.execute("SELECT username, id FROM users").fetchall())
+            resources = self.db.resources()
+            by_origin = defaultdict(list)
+            for origin, origin_id, username, resource, ts, value in unpack_readings(reply["readings"]):
+                if username not in user_ids:
+                    continue  # deleted here, or by a later change
+                if resource not in resources:
+                    self.db.add_resource(resource, "")
+                    resources = self.db.resources()
+                by_origin[origin].append((user_ids[username], resource, value, ts, origin_id))
+            added = 0
+            for origin, rows in by_origin.items():
+                # Skip anything already here, e.g. from a pull that was retried
+                seen = {row[0] for row in conn.execute(
+                    "SELECT origin_id FROM readings WHERE origin=? AND origin_id IN (SELECT value FROM json_each(?))",
+                    (origin, json.dumps([row[4] for row in rows])))}
+                rows = [row for row in rows if row[4] not in seen]
+                if rows:
+                    added += self.db.add_readings(rows, origin=origin)
+            self.set_state(conn, "pulled_users", reply["users_next"])
+            self.set_state(conn, "pulled_readings", reply["readings_next"])
+            conn.execute("DELETE FROM sync_state WHERE key='applying'")
+        return added + len(reply["users"])
+
+    def pull(self) -> int:
+        pulled = 0
+        while True:
+            reply = self.post("/pull", {"device": self.device_id, "users_since": self.state("pulled_users"),
+                                        "readings_since": self.state("pulled_readings"), "limit": self.batch_size})
+            pulled += self.apply(reply)
+            if not reply["more"]:
+                return pulled
+
+    def sync(self) -> SyncResult:
+        """Push local changes, then pull everyone else's."""
+        started = time.perf_counter()
+        sent, received = self.bytes_sent, self.bytes_received
+        pushed = self.push()
+        pulled = self.pull()
+        with self.db.transaction() as conn:
+            self.set_state(conn, "last_sync", int(time.time()))
+        return SyncResult(pushed, pulled, self.bytes_sent - sent, self.bytes_received - received,
+                          time.perf_counter() - started)
+
+
+def last_sync(db: Optional[Database] = None) -> Optional[int]:
+    """Unix time of the last successful sync, or None."""
+    return SyncClient(db).state("last_sync")
+
+
+def rebase_after_restore(conn, former_device: Optional[str] = None) -> None:
+    """Give a database just restored from a snapshot a new device id.
+
+    A restore rolls back reading ids and the push mark, so new readings
+    would reuse ids already pushed under the old identity. Instead, every
+    local reading is relabelled as coming from ``former_device`` (the id the
+    install had before the restore, by default the snapshot's) and new ones
+    are recorded under a fresh id. Relabelled readings above the push mark
+    are pushed once more under their old identity, which the server ignores
+    for any it already has.
+    """
+    if former_device is None:
+        former_device = conn.execute("SELECT value FROM sync_state WHERE key='device_id'").fetchone()[0]
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute("UPDATE readings SET origin=?, origin_id=id WHERE origin IS NULL", (former_device,))
+        conn.execute("INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)",
+                     ("former_device:" + former_device, former_device))
+        conn.execute("UPDATE sync_state SET value=? WHERE key='device_id'", (uuid.uuid4().hex,))
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+_running = threading.Lock()
+
+
+def sync_in_background(on_done: Optional[Callable[[Optional[SyncResult], Optional[BaseException]], None]] = None,
+                       url: str = SYNC_URL) -> bool:
+    """Start a sync thread unless one is running; ``on_done(result, error)`` is called from that thread."""
+    if not _running.acquire(blocking=False):
+        return False
+
+    def run():
+        try:
+            result = SyncClient(url=url).sync()
+        except Exception as exc:
+            if on_done:
+                on_done(None, exc)
+        else:
+            if on_done:
+                on_done(result, None)
+        finally:
+            get_database().close()
+            _running.release()
+
+    threading.Thread(target=run, name="ecostar-sync", daemon=True).start()
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync this install with the sync server.")
+    parser.add_argument("--url", default=SYNC_URL)
+    args = parser.parse_args()
+
+    try:
+        result = SyncClient(url=args.url).sync()
+    except SyncError as exc:
+        parser.error(str(exc))
+    print(f"Pushed {result.pushed:,} and pulled {result.pulled:,} changes "
+          f"({result.bytes_sent / 1024:.1f} KB up, {result.bytes_received / 1024:.1f} KB down) "
+          f"in {result.seconds:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""Stand-in sync server for multi-device households, for local use and testing.
+
+Devices push their changes and pull everyone else's through two endpoints.
+Both take and return zlib-compressed JSON (see :mod:`sync`):
+
+* ``POST /push``: ``{"device", "users": [...], "readings": [...]}``
+* ``POST /pull``: ``{"device", "users_since", "readings_since", "limit"}``,
+  answered with the changes after those sequence numbers that came from other
+  devices, the renames to replay first, and the numbers to ask from next time.
+
+Every stored user and reading carries the sequence number of its last change,
+so a pull is one range scan. Accounts are matched by username and merged
+last-writer-wins on ``(updated_at, device)``; deletions are kept as
+tombstones so a late, older edit cannot bring an account back. Readings are
+append-only and keyed by the device that recorded them and their id there.
+
+    python sync_server.py --port 8765 --db sync_server.db
+"""
+import argparse
+import sqlite3
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+from sync import decode, encode, pack_readings, unpack_readings
+
+SCHEMA = (
+    '''CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY,
+        seq INTEGER NOT NULL UNIQUE,
+        username TEXT UNIQUE NOT NULL,
+        password TEXT,
+        name TEXT,
+        email TEXT,
+        is_admin INTEGER NOT NULL DEFAULT 0,
+        updated_at INTEGER NOT NULL,
+        updated_by TEXT NOT NULL,
+        deleted INTEGER NOT NULL DEFAULT 0)''',
+    '''CREATE TABLE IF NOT EXISTS readings (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        origin TEXT NOT NULL,
+        origin_id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL REFERENCES users(id),
+        resource TEXT NOT NULL,
+        ts INTEGER NOT NULL,
+        value REAL NOT NULL,
+        UNIQUE (origin, origin_id))''',
+    "CREATE INDEX IF NOT EXISTS idx_readings_user ON readings (user_id)",
+    # Every rename, so devices that knew an account by an older name can follow it
+    '''CREATE TABLE IF NOT EXISTS renames (
+        seq INTEGER NOT NULL,
+        old TEXT NOT NULL,
+        new TEXT NOT NULL)''',
+    "CREATE INDEX IF NOT EXISTS idx_renames_seq ON renames (seq)",
+)
+
+USER_FIELDS = ("password", "name", "email", "is_admin")
+
+# Readings returned per pull at most
+MAX_PULL = 20000
+
+
+class SyncStore:
+    """The server's own SQLite database; one lock serialises requests."""
+
+    def __init__(self, path: str = "sync_server.db"):
+        self.conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        for statement in SCHEMA:
+            self.conn.execute(statement)
+        self.lock = threading.Lock()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def _next_user_seq(self) -> int:
+        return self.conn.execute("SELECT COALESCE(MAX(seq), 0) + 1 FROM users").fetchone()[0]
+
+    def apply_user(self, device: str, change: dict) -> None:
+        """Merge one account change, last writer wins."""
+        row = self.conn.execute("SELECT id, updated_at, updated_by, deleted FROM users WHERE username=?",
+                                (change["username"],)).fetchone()
+        if row is None and change.get("previous"):
+            # A rename: carry the account and its readings over if the new name is free
+            row = self.conn.execute("SELECT id, updated_at, updated_by, deleted FROM users WHERE username=?",
+                                    (change["previous"],)).fetchone()
+        if row is not None and (row[1], row[2]) >= (change["updated_at"], device):
+            return
+        # Tombstones keep only the username
+        values = [None, None, None, 0] if change.get("deleted") else [change[field] for field in USER_FIELDS]
+        stamp = (change["updated_at"], device, int(bool(change.get("deleted"))), self._next_user_seq())
+        if row is None:
+            self.conn.execute("INSERT INTO users (username, password, name, email, is_admin, updated_at, "
+                              "updated_by, deleted, seq) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                              [change["username"], *values, *stamp])
+            return
+        if change.get("previous") and change["previous"] != change["username"]:
+            self.conn.execute("INSERT INTO renames (seq, old, new) VALUES (?, ?, ?)",
+                              (stamp[-1], change["previous"], change["username"]))
+        self.conn.execute("UPDATE users SET username=?, password=?, name=?, email=?, is_admin=?, updated_at=?, "
+                          "updated_by=?, deleted=?, seq=? WHERE id=?", [change["username"], *values, *stamp, row[0]])
+        if change.get("deleted"):
+            self.conn.execute("DELETE FROM readings WHERE user_id=?", (row[0],))
+
+    def push(self, payload: dict) -> dict:
+        device = payload["device"]
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                for change in payload.get("users", ()):
+                    self.apply_user(device, change)
+                user_ids = dict(self.conn.execute("SELECT username, id FROM users WHERE deleted=0").fetchall())
+                rows = [(origin, origin_id, user_ids[username], resource, ts, value)
+                        for origin, origin_id, username, resource, ts, value in unpack_readings(payload.get("readings", ()))
+                        if username in user_ids]
+                # A reading is never changed once stored: re-sent ones (a retried push, or a push after a
+                # restore) are ignored
+                self.conn.executemany("INSERT OR IGNORE INTO readings (origin, origin_id, user_id, resource, ts, "
+                                      "value) VALUES (?, ?, ?, ?, ?, ?)", rows)
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+        return {"users": len(payload.get("users", ())), "readings": len(rows)}
+
+    def pull(self, payload: dict) -> dict:
+        device = payload["device"]
+        limit = min(int(payload.get("limit", MAX_PULL)), MAX_PULL)
+        with self.lock:
+            users_next = self.conn.execute("SELECT COALESCE(MAX(seq), 0) FROM users").fetchone()[0]
+            users = [dict(zip(("username",) + USER_FIELDS + ("updated_at", "updated_by", "deleted"), row))
+                     for row in self.conn.execute(
+                         "SELECT username, password, name, email, is_admin, updated_at, updated_by, deleted "
+                         "FROM users WHERE seq > ? AND updated_by != ? ORDER BY seq",
+                         (payload.get("users_since", 0), device))]
+            renames = self.conn.execute("SELECT old, new FROM renames WHERE seq > ? ORDER BY seq",
+                                        (payload.get("users_since", 0),)).fetchall()
+            readings_end = self.conn.execute("SELECT COALESCE(MAX(seq), 0) FROM readings").fetchone()[0]
+            rows = self.conn.execute('''
+                SELECT r.seq, r.origin, r.origin_id, u.username, r.resource, r.ts, r.value
+                FROM readings r JOIN users u ON u.id = r.user_id
+                WHERE r.seq > ? AND r.seq <= ? AND r.origin != ?
+                ORDER BY r.seq LIMIT ?
+            ''', (payload.get("readings_since", 0), readings_end, device, limit)).fetchall()
+        more = len(rows) == limit
+        return {
+            "renames": renames,
+            "users": users,
+            "users_next": users_next,
+            "readings": pack_readings(row[1:] for row in rows),
+            # Our own readings are skipped, so a short page means everything up to the end has been seen
+            "readings_next": rows[-1][0] if more else readings_end,
+            "more": more,
+        }
+
+
+class SyncHandler(BaseHTTPRequestHandler):
+    store: Optional[SyncStore] = None
+
+    def do_POST(self):
+        routes = {"/push": self.store.push, "/pull": self.store.pull}
+        if self.path not in routes:
+            self.send_error(404)
+            return
+        try:
+            payload = decode(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            body = encode(routes[self.path](payload))
+        except (ValueError, KeyError, TypeError) as exc:
+            self.send_error(400, str(exc))
+            return
+        except sqlite3.Error as exc:
+            self.send_error(500, str(exc))
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(host: str = "127.0.0.1", port: int = 8765, path: str = "sync_server.db") -> ThreadingHTTPServer:
+    """A server ready for ``serve_forever``; port 0 picks a free one (see ``server_address``)."""
+    handler = type("Handler", (SyncHandler,), {"store": SyncStore(path)})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the stand-in EcoStar sync server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--db", default="sync_server.db")
+    args = parser.parse_args()
+
+    server = serve(args.host, args.port, args.db)
+    print(f"Sync server on http://{args.host}:{server.server_address[1]} ({args.db})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
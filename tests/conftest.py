@@ -0,0 +1,38 @@
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Cheap hashes keep registration fast; the stored cost still round-trips through needs_rehash
+os.environ.setdefault("ECOSTAR_SCRYPT_N", str(2 ** 10))
+os.environ.setdefault("ECOSTAR_PBKDF2_ITERATIONS", "1000")
+os.environ.setdefault("KIVY_NO_CONSOLELOG", "1")
+os.environ.setdefault("KIVY_NO_ARGS", "1")
+
+from database import Database  # noqa: E402
+from sync_server import serve  # noqa: E402
+
+
+@pytest.fixture
+def make_db(tmp_path):
+    opened = []
+
+    def make(name="ecostar.db"):
+        db = Database(str(tmp_path / name))
+        opened.append(db)
+        return db
+
+    yield make
+    for db in opened:
+        db.close()
+
+
+@pytest.fixture
+def sync_url(tmp_path):
+    server = serve(port=0, path=str(tmp_path / "server.db"))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,29 @@
+import auth
+
+
+def test_hashes_are_salted_and_verify():
+    first, second = auth.hash_password("pw12345678"), auth.hash_password("pw12345678")
+    assert first != second
+    assert auth.verify_password("pw12345678", first)
+    assert not auth.verify_password("wrong", first)
+    assert not auth.needs_rehash(first)
+
+
+def test_weaker_hash_needs_rehash():
+    weak = auth.hash_password("pw12345678", n=auth.SCRYPT_N // 2, iterations=auth.PBKDF2_ITERATIONS // 2)
+    assert auth.verify_password("pw12345678", weak)
+    assert auth.needs_rehash(weak)
+
+
+def test_plaintext_password_is_rehashed_on_login(make_db):
+    db = make_db()
+    db.register_user("old", "unused", "Old", "o@x.io")
+    # A row as versions before hashing stored it
+    db.conn.execute("UPDATE users SET password='secret' WHERE username='old'")
+
+    assert db.get_user_id("old", "wrong") is None
+    assert db.get_user_id("old", "secret") == 1
+    stored = db.conn.execute("SELECT password FROM users WHERE id=1").fetchone()[0]
+    assert stored != "secret" and not auth.needs_rehash(stored)
+    assert db.get_user_id("old", "secret") == 1
+    assert db.get_user_id("nobody", "secret") is None
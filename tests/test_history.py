@@ -0,0 +1,22 @@
+DAY = 86400
+
+
+def test_history_pages_by_keyset(make_db):
+    db = make_db()
+    assert db.register_user("alice", "pw12345678", "Alice", "a@x.io")
+    db.add_readings([(1, "water", float(i), 1700000000 + (i // 2) * DAY) for i in range(25)])
+
+    pages, before = [], None
+    while True:
+        page = db.get_history(1, before=before, limit=10)
+        if not page:
+            break
+        pages.append(page)
+        before = (page[-1][1], page[-1][0])
+    rows = [row for page in pages for row in page]
+    assert [len(page) for page in pages] == [10, 10, 5]
+    assert sorted(rows, key=lambda row: (row[1], row[0]), reverse=True) == rows
+    assert len({row[0] for row in rows}) == 25
+
+    # The page above the second one is the first one
+    assert db.get_history(1, after=(pages[1][0][1], pages[1][0][0]), limit=10) == pages[0]
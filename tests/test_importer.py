@@ -0,0 +1,27 @@
+import json
+
+from importer import import_file
+
+GOOD = json.dumps({"ts": 1700000000, "resource": "water", "value": 1})
+
+
+def test_bad_json_lines_are_skipped(make_db, tmp_path):
+    db = make_db()
+    db.register_user("alice", "pw12345678", "Alice", "a@x.io")
+    path = tmp_path / "export.jsonl"
+    path.write_text("\n".join([GOOD, "{bad", GOOD, "42", GOOD]) + "\n")
+
+    result = import_file(str(path), 1, db=db)
+    assert (result.imported, result.skipped) == (3, 2)
+    assert [error.split(":")[0] for error in result.errors] == ["row 2", "row 4"]
+
+
+def test_truncated_file_keeps_earlier_rows(make_db, tmp_path):
+    db = make_db()
+    db.register_user("alice", "pw12345678", "Alice", "a@x.io")
+    path = tmp_path / "export.json"
+    path.write_text("[" + GOOD + ", " + GOOD[:20])
+
+    result = import_file(str(path), 1, db=db)
+    assert result.imported == 1
+    assert result.errors[0].startswith("after row 1: Truncated JSON")
@@ -0,0 +1,69 @@
+import sqlite3
+
+import migrations
+
+
+def baseline(path):
+    """A database as the app created it before schema versioning: wide rows, no oil/cng/petrol."""
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute('''CREATE TABLE users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT UNIQUE NOT NULL,
+        password TEXT NOT NULL,
+        name TEXT,
+        email TEXT)''')
+    conn.execute('''CREATE TABLE consumption (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        electricity REAL DEFAULT 0,
+        water REAL DEFAULT 0,
+        gas REAL DEFAULT 0,
+        entry_date DATE DEFAULT (DATE('now')),
+        FOREIGN KEY(user_id) REFERENCES users(id))''')
+    conn.execute("INSERT INTO users (username, password, name, email) VALUES ('old', 'secret', 'Old', 'o@x.io')")
+    for day in range(30):
+        conn.execute("INSERT INTO consumption (user_id, electricity, water, gas, entry_date) "
+                     "VALUES (1, ?, ?, 0, date('now', ?))", (1.0 + day % 5, 100.0, f"-{day} days"))
+    return conn
+
+
+def test_baseline_database_migrates_to_latest(tmp_path):
+    path = str(tmp_path / "old.db")
+    conn = baseline(path)
+
+    assert migrations.migrate(conn) == [version for version, _step in migrations.MIGRATIONS]
+    assert migrations.schema_version(conn) == migrations.LATEST_VERSION
+    tables = {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+    assert "consumption" not in tables
+    assert {"resources", "readings", "rollups", "reading_stats", "recommendations", "hourly_extremes",
+            "change_log", "sync_state"} <= tables
+
+    # One reading per non-zero column: the gas column was all zeros
+    counts = dict(conn.execute('''SELECT s.name, COUNT(*) FROM readings r
+                                  JOIN resources s ON s.id = r.resource_id GROUP BY s.name'''))
+    assert counts == {"electricity": 30, "water": 30}
+    assert conn.execute("SELECT SUM(value) FROM readings").fetchone()[0] == 30 * 100 + 6 * (1 + 2 + 3 + 4 + 5)
+
+    # Every rollup period adds up to the readings it summarises
+    for period, total, count in conn.execute("SELECT period, SUM(total), SUM(count) FROM rollups GROUP BY period"):
+        assert (total, count) == (3090.0, 60), period
+    assert conn.execute("SELECT COUNT(*) FROM reading_stats").fetchone()[0] == 2
+    assert migrations.migrate(conn) == []
+    conn.close()
+
+
+def test_failed_step_rolls_back_everything(tmp_path, monkeypatch):
+    path = str(tmp_path / "old.db")
+    conn = baseline(path)
+
+    def broken(_conn):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(migrations, "MIGRATIONS", migrations.MIGRATIONS[:-1] + [(migrations.LATEST_VERSION, broken)])
+    try:
+        migrations.migrate(conn)
+    except RuntimeError:
+        pass
+    assert migrations.schema_version(conn) == 0
+    assert conn.execute("SELECT COUNT(*) FROM consumption").fetchone()[0] == 30
+    conn.close()
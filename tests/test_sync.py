@@ -0,0 +1,70 @@
+import time
+
+from admin import delete_user, update_user
+from sync import SyncClient
+
+
+def snapshot(db):
+    users = db.conn.execute("SELECT username, name, email, is_admin FROM users ORDER BY username").fetchall()
+    readings = db.conn.execute('''
+        SELECT u.username, s.name, r.ts, r.value FROM readings r
+        JOIN users u ON u.id = r.user_id JOIN resources s ON s.id = r.resource_id
+        ORDER BY 1, 2, 3
+    ''').fetchall()
+    return users, readings
+
+
+def user_id(db, username):
+    return db.conn.execute("SELECT id FROM users WHERE username=?", (username,)).fetchone()[0]
+
+
+def test_two_devices_converge(make_db, sync_url):
+    a, b = make_db("a.db"), make_db("b.db")
+    # A small batch size makes every push and pull take several round trips
+    client_a, client_b = SyncClient(a, sync_url, batch_size=3), SyncClient(b, sync_url, batch_size=3)
+
+    a.register_user("alice", "pw12345678", "Alice", "a@x.io")
+    a.add_readings([(user_id(a, "alice"), "electricity", 1.0 + i, 1700000000 + i * 3600) for i in range(10)])
+    client_a.sync()
+    client_b.sync()
+    assert snapshot(a) == snapshot(b)
+    assert len(snapshot(b)[1]) == 10
+
+    # B renames the account and records a reading; A sees both
+    update_user(b, user_id(b, "alice"), "alice2", "Alice B", "a@x.io", False)
+    b.add_readings([(user_id(b, "alice2"), "water", 5.0, 1700100000)])
+    client_b.sync()
+    client_a.sync()
+    assert snapshot(a) == snapshot(b)
+    assert snapshot(a)[0] == [("alice2", "Alice B", "a@x.io", 0)]
+
+    # A deletes the account and registers another; B follows
+    delete_user(a, user_id(a, "alice2"))
+    a.register_user("bob", "pw12345678", "Bob", "b@x.io")
+    a.add_readings([(user_id(a, "bob"), "gas", 2.0, 1700000000)])
+    client_a.sync()
+    client_b.sync()
+    assert snapshot(a) == snapshot(b)
+    assert [row[0] for row in snapshot(b)[0]] == ["bob"]
+
+    # Nothing new: nothing moves
+    result = client_a.sync()
+    assert (result.pushed, result.pulled) == (0, 0)
+
+
+def test_concurrent_edits_last_writer_wins(make_db, sync_url):
+    a, b = make_db("a.db"), make_db("b.db")
+    client_a, client_b = SyncClient(a, sync_url), SyncClient(b, sync_url)
+    a.register_user("carol", "pw12345678", "Carol", "c@x.io")
+    client_a.sync()
+    client_b.sync()
+
+    b.conn.execute("UPDATE users SET name='Renamed on B' WHERE username='carol'")
+    # Edit times are in milliseconds; equal times are settled by a tie-break, not by order
+    time.sleep(0.01)
+    a.conn.execute("UPDATE users SET name='Renamed on A' WHERE username='carol'")
+    client_a.sync()
+    client_b.sync()
+    client_a.sync()
+    assert snapshot(a) == snapshot(b)
+    assert snapshot(a)[0][0][1] == "Renamed on A"
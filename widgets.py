@@ -0,0 +1,154 @@
+"""Shared widgets for the splash, login and register pages.
+
+The pages' background gradient used to run its own 20 Hz Python callback per
+widget for the life of the app. Now every :class:`AnimatedGradient` of a
+palette is painted by one :class:`GradientDriver`, whose colour phase is a
+single Kivy ``Animation``. The driver only runs while at least one of its
+gradients is on the current screen and the window is visible and focused.
+"""
+from typing import Dict, Tuple
+
+from kivy.animation import Animation
+from kivy.event import EventDispatcher
+from kivy.graphics import Color, Rectangle
+from kivy.graphics.texture import Texture
+from kivy.properties import NumericProperty
+from kivy.uix.relativelayout import RelativeLayout
+
+RGB = Tuple[float, float, float]
+
+# Colours at the two ends of the cycle and the seconds for a full cycle
+PALETTES: Dict[str, Tuple[RGB, RGB, float]] = {
+    "login": ((0.05, 0.4, 0.1), (0.2, 0.8, 0.25), 20.0),
+    "register": ((0.0, 0.4, 0.1), (0.18, 0.75, 0.25), 12.5),
+}
+
+# Seconds between animation updates. The slowest channel only moves about ten
+# 8-bit levels a second, so faster steps would redraw without a visible change
+STEP = 1 / 10.0
+
+
+# 🎞️ One animation per palette, shared by every gradient using it
+class GradientDriver(EventDispatcher):
+    phase = NumericProperty(1.0)
+
+    def __init__(self, palette: str, **kwargs):
+        super().__init__(**kwargs)
+        self.low, self.high, self.period = PALETTES[palette]
+        self.gradients = set()
+        self.running = False
+        self.window_visible = True
+        self.window_bound = False
+        self.bind(phase=self.paint)
+
+    def color(self):
+        return tuple(a + (b - a) * self.phase for a, b in zip(self.low, self.high)) + (1,)
+
+    def paint(self, *args):
+        rgba = self.color()
+        for gradient in self.gradients:
+            gradient.color_instruction.rgba = rgba
+
+    def attach(self, gradient):
+        self.bind_window()
+        self.gradients.add(gradient)
+        gradient.color_instruction.rgba = self.color()
+        self.update()
+
+    def detach(self, gradient):
+        self.gradients.discard(gradient)
+        self.update()
+
+    def bind_window(self):
+        if self.window_bound:
+            return
+        from kivy.core.window import Window
+
+        Window.bind(on_minimize=self.on_window_hidden, on_hide=self.on_window_hidden,
+                    on_restore=self.on_window_shown, on_show=self.on_window_shown,
+                    focus=lambda window, focus: self.update())
+        self.window_bound = True
+
+    def on_window_hidden(self, *args):
+        self.window_visible = False
+        self.update()
+
+    def on_window_shown(self, *args):
+        self.window_visible = True
+        self.update()
+
+    def should_run(self):
+        from kivy.core.window import Window
+
+        return bool(self.gradients) and self.window_visible and Window.focus
+
+    def update(self):
+        if self.should_run() and not self.running:
+            self.running = True
+            # Finish the current leg from wherever the phase was paused, then cycle
+            half = self.period / 2
+            first = Animation(phase=0, d=max(half * self.phase, STEP), s=STEP)
+            first.bind(on_complete=self.start_cycle)
+            first.start(self)
+        elif not self.should_run() and self.running:
+            self.running = False
+            Animation.cancel_all(self, "phase")
+
+    def start_cycle(self, *args):
+        if not self.running:
+            return
+        half = self.period / 2
+        cycle = Animation(phase=1, d=half, s=STEP) + Animation(phase=0, d=half, s=STEP)
+        cycle.repeat = True
+        cycle.start(self)
+
+
+_drivers: Dict[str, GradientDriver] = {}
+
+
+def get_driver(palette: str) -> GradientDriver:
+    if palette not in _drivers:
+        _drivers[palette] = GradientDriver(palette)
+    return _drivers[palette]
+
+
+# 🌈 Animated eco-gradient background
+class AnimatedGradient(RelativeLayout):
+    def __init__(self, palette="login", **kwargs):
+        super().__init__(**kwargs)
+        self.driver = get_driver(palette)
+        with self.canvas:
+            self.color_instruction = Color(*self.driver.color())
+            self.rect = Rectangle(pos=self.pos, size=self.size)
+        self.bind(pos=self.update_rect, size=self.update_rect)
+
+    def update_rect(self, *args):
+        self.rect.pos = self.pos
+        self.rect.size = self.size
+
+    def resume(self):
+        self.driver.attach(self)
+
+    def pause(self):
+        self.driver.detach(self)
+
+
+def set_backgrounds_active(root, active: bool) -> None:
+    """Resume or pause every animated background under ``root``; pausing also releases them."""
+    for widget in root.walk(restrict=True):
+        if isinstance(widget, AnimatedGradient):
+            if active:
+                widget.resume()
+            else:
+                widget.pause()
+
+
+def gradient_texture(bottom: RGB, top: RGB, steps: int = 64) -> Texture:
+    """A 1-pixel-wide vertical gradient; stretch it over a Rectangle to fill any size."""
+    pixels = bytearray()
+    for i in range(steps):
+        t = i / (steps - 1)
+        pixels.extend(int(255 * (a + (b - a) * t)) for a, b in zip(bottom, top))
+    texture = Texture.create(size=(1, steps), colorfmt="rgb")
+    texture.blit_buffer(bytes(pixels), colorfmt="rgb", bufferfmt="ubyte")
+    return texture
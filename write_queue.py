@@ -0,0 +1,141 @@
+"""Group commit for readings saved from the UI, meter feeds and scripts.
+
+:meth:`WriteQueue.add` queues a reading and returns a
+:class:`concurrent.futures.Future`. One writer thread takes whatever arrives
+within ``FLUSH_INTERVAL`` of the first pending reading, until ``MAX_ROWS``
+are pending or arrivals pause for ``QUIET``, and commits it with a single
+:meth:`database.Database.add_readings` call. The batch shares one
+transaction and one WAL sync, and rollups, anomaly checks and tips are
+updated once for the batch rather than once per row.
+
+A Future resolves only after its batch is committed. The writer's
+connection runs with ``synchronous=FULL``, so a save that has been
+acknowledged survives a power cut. A bad row fails only its own Future and
+the rest of its batch is still committed.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Iterable, List, Optional, Tuple
+
+import instrumentation
+from database import Database, get_database
+from db_worker import deliver_on_main_loop
+
+# Longest a queued reading waits for others to share its commit
+FLUSH_INTERVAL = 0.005
+# A batch is flushed early once nothing new has arrived for this long
+QUIET = 0.001
+# Readings committed together at most
+MAX_ROWS = 1000
+
+
+class WriteQueue:
+    def __init__(self, db: Optional[Database] = None, interval: float = FLUSH_INTERVAL, quiet: float = QUIET,
+                 max_rows: int = MAX_ROWS, durable: bool = True, name: str = "ecostar-writes"):
+        self.db = db
+        self.interval = interval
+        self.quiet = quiet
+        self.max_rows = max_rows
+        self.durable = durable
+        self.name = name
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def stop(self, wait: bool = True) -> None:
+        """Commit everything queued so far, then end the writer thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            if wait:
+                thread.join()
+
+    def add(self, user_id: int, resource: str, value: float, ts: Optional[int] = None,
+            on_result: Optional[Callable] = None, on_error: Optional[Callable] = None) -> Future:
+        """Queue one reading; ``ts=None`` means now."""
+        return self.add_many([(user_id, resource, value, ts)], on_result=on_result, on_error=on_error)
+
+    def add_many(self, rows: Iterable[Tuple[int, str, float, Optional[int]]],
+                 on_result: Optional[Callable] = None, on_error: Optional[Callable] = None) -> Future:
+        """Queue ``(user_id, resource, value, ts)`` rows that succeed or fail together."""
+        now = int(time.time())
+        # Stamped when queued, not when the batch happens to be flushed
+        rows = [(user_id, resource, value, now if ts is None else ts) for user_id, resource, value, ts in rows]
+        future = deliver_on_main_loop(Future(), on_result, on_error)
+        self.start()
+        self._queue.put((future, rows))
+        return future
+
+    def flush(self) -> None:
+        """Block until everything queued so far is committed."""
+        self.add_many([]).result()
+
+    def _run(self) -> None:
+        db = self.db or get_database()
+        if self.durable:
+            db.conn.execute("PRAGMA synchronous=FULL")
+        stopping = False
+        while not stopping:
+            job = self._queue.get()
+            if job is None:
+                break
+            batch = [job]
+            rows = len(job[1])
+            deadline = time.monotonic() + self.interval
+            while rows < self.max_rows:
+                try:
+                    job = self._queue.get(timeout=max(0.0, min(self.quiet, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+                if job is None:
+                    stopping = True
+                    break
+                batch.append(job)
+                rows += len(job[1])
+            self._commit(db, batch)
+        db.close()
+
+    def _commit(self, db: Database, batch: List[tuple]) -> None:
+        started = time.perf_counter()
+        live = [(future, rows) for future, rows in batch if future.set_running_or_notify_cancel()]
+        rows = [row for _future, job_rows in live for row in job_rows]
+        try:
+            if rows:
+                db.add_readings(rows)
+        except Exception:
+            # Retry each save on its own so only the bad one fails
+            for future, job_rows in live:
+                try:
+                    if job_rows:
+                        db.add_readings(job_rows)
+                except Exception as exc:
+                    future.set_exception(exc)
+                else:
+                    future.set_result(None)
+        else:
+            for future, _rows in live:
+                future.set_result(None)
+        if instrumentation.ENABLED:
+            instrumentation.record("job", "WriteQueue.flush", time.perf_counter() - started, len(rows))
+
+
+_write_queue = WriteQueue()
+
+
+def get_write_queue() -> WriteQueue:
+    return _write_queue
+
+
+def save_reading(user_id: int, resource: str, value: float, ts: Optional[int] = None,
+                 on_result: Optional[Callable] = None, on_error: Optional[Callable] = None) -> Future:
+    """Queue a reading on the shared write queue; callbacks fire on the main loop once it is committed."""
+    return _write_queue.add(user_id, resource, value, ts, on_result=on_result, on_error=on_error)